@@ -0,0 +1,86 @@
+import argparse
+import os
+import tempfile
+import time
+
+from emerald_message.containers.avro_data_file_writer import AvroCodecConfigurationRecord, get_available_avro_codecs
+from emerald_message.containers.container_batch_writer import ContainerBatchWriterConfigurationRecord
+from emerald_message.containers.email.email_container import EmailContainer
+
+from benchmarks.synthetic_email_corpus import make_email_corpus, get_file_size
+
+'''
+File size and write / read throughput of EmailContainer batch files for each AVRO block codec available in this
+environment (snappy and zstandard only appear when their packages are installed), at the default level and,
+where the codec has levels, the fastest and the strongest level
+'''
+
+_LEVELS_BY_CODEC = {
+    'deflate': [None, 1, 9],
+    'bzip2': [None, 1],
+    'xz': [None, 0, 6],
+    'zstandard': [None, 1, 3, 19]
+}
+
+
+def run_codec(container_list, codec_configuration_record: AvroCodecConfigurationRecord, working_directory: str):
+    avro_container_uri = os.path.join(working_directory, codec_configuration_record.codec + '-' +
+                                      str(codec_configuration_record.compression_level) + '.avro')
+
+    start = time.perf_counter()
+    EmailContainer.write_avro_batch(container_list,
+                                    avro_container_uri=avro_container_uri,
+                                    batch_writer_configuration_record=ContainerBatchWriterConfigurationRecord(
+                                        codec_configuration_record=codec_configuration_record))
+    elapsed_write = time.perf_counter() - start
+
+    start = time.perf_counter()
+    read_count = sum(1 for _ in EmailContainer.iter_from_avro(avro_container_uri))
+    elapsed_read = time.perf_counter() - start
+    if read_count != len(container_list):
+        raise RuntimeError('Read back ' + str(read_count) + ' containers from ' + avro_container_uri +
+                           ', expected ' + str(len(container_list)))
+
+    return get_file_size(avro_container_uri), elapsed_write, elapsed_read
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--attachments', type=int, default=0)
+    parser.add_argument('--attachment_size', type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    container_list = make_email_corpus(message_count=args.messages,
+                                       attachment_count=args.attachments,
+                                       attachment_size_bytes=args.attachment_size)
+
+    codec_configuration_record_list = [AvroCodecConfigurationRecord()]
+    for codec in sorted(get_available_avro_codecs()):
+        for compression_level in _LEVELS_BY_CODEC.get(codec, [None]):
+            if codec != 'null':
+                codec_configuration_record_list.append(
+                    AvroCodecConfigurationRecord(codec=codec, compression_level=compression_level))
+
+    print('Messages: ' + str(args.messages) + ' (' + str(args.attachments) + ' attachment(s) of ' +
+          str(args.attachment_size) + ' bytes each)')
+    print('codec        level   file bytes   ratio   write msg/s   read msg/s')
+    null_file_size = None
+    with tempfile.TemporaryDirectory() as working_directory:
+        for codec_configuration_record in codec_configuration_record_list:
+            file_size, elapsed_write, elapsed_read = run_codec(container_list,
+                                                               codec_configuration_record,
+                                                               working_directory)
+            if null_file_size is None:
+                null_file_size = file_size
+            print(codec_configuration_record.codec.ljust(12) + ' ' +
+                  ('def' if codec_configuration_record.compression_level is None
+                   else str(codec_configuration_record.compression_level)).rjust(5) + ' ' +
+                  str(file_size).rjust(12) + ' ' +
+                  str(round(null_file_size / file_size, 2)).rjust(7) + ' ' +
+                  str(round(args.messages / elapsed_write, 1)).rjust(13) + ' ' +
+                  str(round(args.messages / elapsed_read, 1)).rjust(12))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+import argparse
+import os
+import time
+from contextlib import contextmanager
+
+from emerald_message.containers.abstract_container import AbstractContainer, ContainerParameters, \
+    ContainerSchemaMatchingIdentifier
+from emerald_message.containers.email.email_body import EmailBody
+from emerald_message.containers.email.email_container import EmailContainer, EmailContainerParameters
+from emerald_message.containers.email import email_message_metadata
+from emerald_message.containers.email.email_envelope import EmailEnvelope
+from emerald_message.containers.email.email_message_metadata import EmailMessageMetadata
+from emerald_message.error import EmeraldMessageContainerInitializationError
+from netaddr import IPAddress
+
+from benchmarks.synthetic_email_corpus import make_email_corpus
+
+'''
+EmailContainers built per second (each with its metadata, envelope and body containers) before and after the
+class contract checks were cached and deserialization was given a trusted constructor.  Before is the previous
+AbstractContainer constructor, reproduced below, with deserialization going through the public constructors and
+parsing the sender IP of every datum as it did; both run in this tree so only the construction path differs.
+Rows are the public constructors from parameters already in hand, the constructors deserialization uses, and the
+whole of EmailContainer.from_avro_as_dict (which also builds the parameter objects from the datum).  Rates are from
+the best of the repeated passes
+'''
+
+
+# AbstractContainer.__init__ as it was: every check repeated for every instance
+def _reference_container_init(self,
+                              container_parameters: ContainerParameters,
+                              debug: bool = False):
+    if not isinstance(container_parameters, ContainerParameters):
+        raise EmeraldMessageContainerInitializationError(
+            'Caller must provide value for container_parameters ' +
+            'as an object extending the class "' +
+            ContainerParameters.__name__ + os.linesep +
+            '" Type provided was ' +
+            type(container_parameters).__name__)
+    if type(container_parameters) != type(self)._get_container_parameters_required_subclass_type():
+        raise EmeraldMessageContainerInitializationError(
+            'Initialization parameter container_parameters is ' +
+            'of wrong type for class ' + type(self).__name__)
+
+    self._container_parameters = container_parameters
+
+    if not isinstance(type(self).get_container_schema_matching_identifier(), ContainerSchemaMatchingIdentifier):
+        raise EmeraldMessageContainerInitializationError(
+            'Caller must provide the value for ' + ContainerSchemaMatchingIdentifier.__name__ +
+            ' in order to identify the proper AVRO schema for the container')
+
+    if type(type(self).get_container_schema_matching_identifier().container_avro_schema_name) is not str or \
+            len(type(self).get_container_schema_matching_identifier().container_avro_schema_name) == 0:
+        raise EmeraldMessageContainerInitializationError(
+            'Caller must provide a valid name corresponding to a name property in a defined AVRO' +
+            ' schema that corresponds to this container')
+
+    container_logger = type(self).get_logger()
+    if container_logger.is_debug_enabled:
+        container_logger.logger.debug('initializing with ' + str(container_parameters))
+        container_logger.logger.debug('Initialized the avro schema record to ' +
+                                      str(type(self).get_avro_schema_record()))
+    self._debug = debug
+    # state added to containers since - set here so the containers built are complete
+    self._canonical_key = None
+    self._canonical_digest = None
+
+
+# deserialization used the public constructors
+def _reference_from_trusted_container_parameters(cls,
+                                                 container_parameters: ContainerParameters,
+                                                 debug: bool = False):
+    return cls(container_parameters=container_parameters)
+
+
+@contextmanager
+def reference_construction():
+    container_init = AbstractContainer.__init__
+    from_trusted_container_parameters = AbstractContainer.__dict__['_from_trusted_container_parameters']
+    get_email_sender_ip = email_message_metadata._get_email_sender_ip
+    AbstractContainer.__init__ = _reference_container_init
+    AbstractContainer._from_trusted_container_parameters = classmethod(_reference_from_trusted_container_parameters)
+    email_message_metadata._get_email_sender_ip = IPAddress
+    try:
+        yield
+    finally:
+        AbstractContainer.__init__ = container_init
+        AbstractContainer._from_trusted_container_parameters = from_trusted_container_parameters
+        email_message_metadata._get_email_sender_ip = get_email_sender_ip
+
+
+def build_validated(parameters_list):
+    return [EmailContainer(container_parameters=EmailContainerParameters(
+        email_message_metadata=EmailMessageMetadata(container_parameters=metadata_parameters),
+        email_envelope=EmailEnvelope(container_parameters=envelope_parameters),
+        email_body=EmailBody(container_parameters=body_parameters),
+        email_attachment_collection=frozenset()))
+        for metadata_parameters, envelope_parameters, body_parameters in parameters_list]
+
+
+def build_trusted(parameters_list):
+    return [EmailContainer._from_trusted_container_parameters(container_parameters=EmailContainerParameters(
+        email_message_metadata=EmailMessageMetadata._from_trusted_container_parameters(metadata_parameters),
+        email_envelope=EmailEnvelope._from_trusted_container_parameters(envelope_parameters),
+        email_body=EmailBody._from_trusted_container_parameters(body_parameters),
+        email_attachment_collection=frozenset()))
+        for metadata_parameters, envelope_parameters, body_parameters in parameters_list]
+
+
+def build_from_avro_as_dict(container_dict_list):
+    return [EmailContainer.from_avro_as_dict(x) for x in container_dict_list]
+
+
+def time_build(build, build_input) -> float:
+    start = time.perf_counter()
+    build(build_input)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    email_container_list = make_email_corpus(message_count=args.messages)
+    parameters_list = [(x.email_message_metadata._container_parameters, x.email_envelope._container_parameters,
+                        x.email_body._container_parameters) for x in email_container_list]
+    container_dict_list = [x.get_as_dict() for x in email_container_list]
+    build_list = (('public constructors', build_validated, parameters_list),
+                  ('deserialization constructors', build_trusted, parameters_list),
+                  ('from_avro_as_dict', build_from_avro_as_dict, container_dict_list))
+
+    with reference_construction():
+        for build_name, build, build_input in build_list:
+            if build(build_input) != email_container_list:
+                raise RuntimeError('Reference ' + build_name + ' do not build the same containers')
+    for build_name, build, build_input in build_list:
+        if build(build_input) != email_container_list:
+            raise RuntimeError(build_name + ' do not build the same containers')
+
+    # before and after passes alternate so both see the same machine load - the best pass of each is reported
+    elapsed_before_by_name = {x[0]: float('inf') for x in build_list}
+    elapsed_after_by_name = {x[0]: float('inf') for x in build_list}
+    for _ in range(args.repeat):
+        with reference_construction():
+            for build_name, build, build_input in build_list:
+                elapsed_before_by_name[build_name] = min(elapsed_before_by_name[build_name],
+                                                         time_build(build, build_input))
+        for build_name, build, build_input in build_list:
+            elapsed_after_by_name[build_name] = min(elapsed_after_by_name[build_name],
+                                                    time_build(build, build_input))
+
+    print('Messages: ' + str(args.messages) + ', best of ' + str(args.repeat) + ' passes')
+    print('construction path               before msg/s   after msg/s   speedup')
+    for build_name, _, _ in build_list:
+        print(build_name.ljust(29) + ' ' +
+              str(round(args.messages / elapsed_before_by_name[build_name], 1)).rjust(14) + ' ' +
+              str(round(args.messages / elapsed_after_by_name[build_name], 1)).rjust(13) + ' ' +
+              str(round(elapsed_before_by_name[build_name] / elapsed_after_by_name[build_name], 2)).rjust(9))
+
+
+if __name__ == '__main__':
+    main()
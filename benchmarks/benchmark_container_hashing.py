@@ -0,0 +1,41 @@
+import argparse
+import time
+
+from benchmarks.synthetic_email_corpus import make_email_corpus
+
+'''
+Microseconds per container to deduplicate (build a set of) and to sort email containers and their envelope and
+metadata parts.  "first pass" runs on containers just built, "repeat" on the same containers again - the case of
+containers held in a cache and compared or hashed many times
+'''
+
+
+def time_per_container_us(operation, containers) -> float:
+    start = time.perf_counter()
+    operation(containers)
+    return (time.perf_counter() - start) / len(containers) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--attachments', type=int, default=1)
+    args = parser.parse_args()
+
+    email_container_list = make_email_corpus(message_count=args.messages, attachment_count=args.attachments)
+    print('Messages: ' + str(args.messages) + ', attachments per message: ' + str(args.attachments))
+    print('operation                        first pass us   repeat us')
+    for part_name, get_part in (('email_envelope', lambda x: x.email_envelope),
+                                ('email_message_metadata', lambda x: x.email_message_metadata),
+                                ('email_container', lambda x: x)):
+        for operation_name, operation in (('set', set), ('sort', sorted)):
+            # rebuilt from the dictionaries so nothing computed by an earlier pass is reused
+            containers = [get_part(type(x).from_avro_as_dict(x.get_as_dict())) for x in email_container_list]
+            first_pass_us = time_per_container_us(operation, containers)
+            repeat_us = time_per_container_us(operation, containers)
+            print((part_name + ' ' + operation_name).ljust(32) + ' ' + str(round(first_pass_us, 2)).rjust(13) +
+                  ' ' + str(round(repeat_us, 2)).rjust(11))
+
+
+if __name__ == '__main__':
+    main()
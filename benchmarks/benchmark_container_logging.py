@@ -0,0 +1,74 @@
+import argparse
+import logging
+import os
+import time
+
+from emerald_message.containers.email.email_attachment import EmailAttachment
+from emerald_message.containers.email.email_body import EmailBody
+from emerald_message.containers.email.email_container import EmailContainer
+from emerald_message.containers.email.email_envelope import EmailEnvelope
+from emerald_message.containers.email.email_message_metadata import EmailMessageMetadata
+from emerald_message.logging.logger import EmeraldLogger, EmeraldLoggerLevel
+
+from benchmarks.synthetic_email_corpus import make_email_corpus
+
+'''
+Throughput of rebuilding EmailContainers from their dictionary form (the deserialization path) with container
+debug logging disabled (the default) versus enabled.  With DEBUG enabled every container logs its parameters,
+which is what the unconditional print() calls used to cost - the output goes to os.devnull so the console
+itself is not measured
+'''
+
+CONTAINER_CLASS_LIST = [EmailContainer, EmailEnvelope, EmailBody, EmailMessageMetadata, EmailAttachment]
+
+
+def set_container_debug_logging(enabled: bool, devnull_stream):
+    level = EmeraldLoggerLevel.DEBUG if enabled else EmeraldLoggerLevel.INFO
+    for container_class in CONTAINER_CLASS_LIST:
+        container_logger = container_class.get_logger()
+        # re-initializing by name reuses the handler and just resets the levels
+        EmeraldLogger(logging_module_name=container_class.__name__,
+                      console_logging_level=level,
+                      global_logging_level=level)
+        for this_handler in container_logger.logger.handlers:
+            if isinstance(this_handler, logging.StreamHandler):
+                this_handler.setStream(devnull_stream)
+
+
+def run_round_trips(container_dict_list, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for container_dict in container_dict_list:
+            EmailContainer.from_avro_as_dict(container_dict).get_as_dict()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--attachments', type=int, default=2)
+    parser.add_argument('--attachment_size', type=int, default=256 * 1024)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    container_dict_list = [x.get_as_dict() for x in make_email_corpus(message_count=args.messages,
+                                                                      attachment_count=args.attachments,
+                                                                      attachment_size_bytes=args.attachment_size)]
+    message_total = args.messages * args.repeat
+
+    with open(os.devnull, 'w') as devnull_stream:
+        set_container_debug_logging(enabled=True, devnull_stream=devnull_stream)
+        elapsed_debug = run_round_trips(container_dict_list, args.repeat)
+
+        set_container_debug_logging(enabled=False, devnull_stream=devnull_stream)
+        elapsed_quiet = run_round_trips(container_dict_list, args.repeat)
+
+    print('Messages per run: ' + str(message_total) + ' (' + str(args.attachments) + ' attachment(s) of ' +
+          str(args.attachment_size) + ' bytes each)')
+    print('DEBUG enabled (old always-print behaviour): ' + str(round(message_total / elapsed_debug, 1)) + ' msg/s')
+    print('DEBUG disabled (default):                   ' + str(round(message_total / elapsed_quiet, 1)) + ' msg/s')
+    print('Speedup: ' + str(round(elapsed_debug / elapsed_quiet, 2)) + 'x')
+
+
+if __name__ == '__main__':
+    main()
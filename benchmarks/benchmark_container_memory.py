@@ -0,0 +1,71 @@
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from emerald_message.containers.email.email_container import EmailContainer
+
+from benchmarks.synthetic_email_corpus import make_email_corpus
+
+'''
+Bytes held per EmailContainer read back from an archive, as in the dedup and routing caches that keep millions
+of them resident.  "total" is everything allocated for the containers (traced with tracemalloc, payload strings
+included); "structure" counts only the container objects, their parameter objects and any instance dictionaries -
+the part that does not depend on the size of the message
+'''
+
+
+def get_structure_size_bytes(container) -> int:
+    size_bytes = sys.getsizeof(container)
+    instance_dict = getattr(container, '__dict__', None)
+    if instance_dict is not None:
+        size_bytes += sys.getsizeof(instance_dict)
+    container_parameters = container._container_parameters
+    size_bytes += sys.getsizeof(container_parameters)
+    parameters_dict = getattr(container_parameters, '__dict__', None)
+    if parameters_dict is not None:
+        size_bytes += sys.getsizeof(parameters_dict)
+    return size_bytes
+
+
+def get_email_container_structure_size_bytes(email_container: EmailContainer) -> int:
+    return get_structure_size_bytes(email_container) + \
+        get_structure_size_bytes(email_container.email_message_metadata) + \
+        get_structure_size_bytes(email_container.email_envelope) + \
+        get_structure_size_bytes(email_container.email_body) + \
+        sum(get_structure_size_bytes(x) for x in email_container.email_attachment_collection)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=5000)
+    args = parser.parse_args()
+
+    print('Messages: ' + str(args.messages))
+    print('attachments   total bytes/container   structure bytes/container')
+    with tempfile.TemporaryDirectory() as benchmark_directory:
+        for attachment_count in (0, 1):
+            avro_container_uri = os.path.join(benchmark_directory, 'batch-' + str(attachment_count) + '.avro')
+            EmailContainer.write_avro_batch(make_email_corpus(message_count=args.messages,
+                                                              attachment_count=attachment_count,
+                                                              attachment_size_bytes=1024),
+                                            avro_container_uri)
+
+            gc.collect()
+            tracemalloc.start()
+            email_container_list = list(EmailContainer.iter_from_avro(avro_container_uri))
+            gc.collect()
+            traced_size_bytes, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            structure_size_bytes = sum(get_email_container_structure_size_bytes(x) for x in email_container_list)
+            print(str(attachment_count).rjust(11) + ' ' +
+                  str(round(traced_size_bytes / len(email_container_list))).rjust(23) + ' ' +
+                  str(round(structure_size_bytes / len(email_container_list))).rjust(27))
+            del email_container_list
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import tempfile
+import threading
+import time
+
+from emerald_message.containers.email.email_archive_sink import EmailArchiveSink, \
+    EmailArchiveSinkConfigurationRecord, EmailArchiveSinkFsyncPolicy
+
+from benchmarks.synthetic_email_corpus import make_email_corpus
+
+'''
+Containers per second archived through an EmailArchiveSink by several producer threads, for each fsync policy,
+until every file is finalized.  The queue is kept small so the producers run into backpressure, and the deepest
+queue seen is reported to show memory stays bounded
+'''
+
+
+def run_sink(email_container_list,
+             configuration_record: EmailArchiveSinkConfigurationRecord,
+             producer_count: int):
+    max_queued_count = 0
+    with tempfile.TemporaryDirectory() as root_directory:
+        start = time.perf_counter()
+        with EmailArchiveSink(root_directory, configuration_record) as archive_sink:
+            def produce(producer_index):
+                for email_container in email_container_list[producer_index::producer_count]:
+                    archive_sink.put(email_container)
+            producers = [threading.Thread(target=produce, args=(x,)) for x in range(producer_count)]
+            for producer in producers:
+                producer.start()
+            while any(x.is_alive() for x in producers):
+                max_queued_count = max(max_queued_count, archive_sink.queued_count)
+                time.sleep(0.001)
+            for producer in producers:
+                producer.join()
+        return time.perf_counter() - start, max_queued_count, archive_sink.finalized_file_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--attachments', type=int, default=1)
+    parser.add_argument('--attachment_size', type=int, default=16 * 1024)
+    parser.add_argument('--producers', type=int, default=4)
+    parser.add_argument('--queue_size', type=int, default=1000)
+    args = parser.parse_args()
+
+    email_container_list = make_email_corpus(message_count=args.messages, attachment_count=args.attachments,
+                                             attachment_size_bytes=args.attachment_size)
+    print('Messages: ' + str(args.messages) + ', producers: ' + str(args.producers) +
+          ', queue size: ' + str(args.queue_size))
+    print('fsync policy        msg/s   max queued   files')
+    for fsync_policy in EmailArchiveSinkFsyncPolicy:
+        elapsed_seconds, max_queued_count, finalized_file_count = run_sink(
+            email_container_list,
+            EmailArchiveSinkConfigurationRecord(max_queue_size=args.queue_size, fsync_policy=fsync_policy,
+                                                max_records_per_file=args.messages // 10),
+            producer_count=args.producers)
+        print(fsync_policy.name.ljust(16) + ' ' + str(round(args.messages / elapsed_seconds, 1)).rjust(8) + ' ' +
+              str(max_queued_count).rjust(12) + ' ' + str(finalized_file_count).rjust(7))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import os
+import tempfile
+import time
+
+from emerald_message.containers.abstract_container import AbstractContainer
+from emerald_message.containers.avro_projection_reader import iter_avro_projection
+from emerald_message.containers.avro_serialization_backend import StandardAvroSerializationBackend, \
+    CompiledAvroSerializationBackend
+from emerald_message.containers.email.email_container import EmailContainer
+
+from benchmarks.synthetic_email_corpus import make_email_corpus
+
+'''
+Messages per second reading a few envelope / metadata fields from a batch file of EmailContainer with attachments:
+rebuilding every container with iter_from_avro and reading the fields from it, against iter_avro_projection, which
+skips the attachments and bodies.  Both must return the same values before timing
+'''
+
+FIELD_PATHS = ['email_envelope.address_from', 'email_message_metadata.email_sender_ip']
+
+
+def read_full(avro_container_uri: str):
+    return [(x.email_envelope.address_from, str(x.email_message_metadata.email_sender_ip))
+            for x in EmailContainer.iter_from_avro(avro_container_uri)]
+
+
+def read_projection(avro_container_uri: str):
+    return list(iter_avro_projection(avro_container_uri, FIELD_PATHS,
+                                     avro_serialization_backend=AbstractContainer.get_serialization_backend()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--attachments', type=int, default=2)
+    parser.add_argument('--attachment_size', type=int, default=64 * 1024)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    email_container_list = make_email_corpus(message_count=args.messages,
+                                             attachment_count=args.attachments,
+                                             attachment_size_bytes=args.attachment_size)
+    with tempfile.TemporaryDirectory() as benchmark_directory:
+        avro_container_uri = os.path.join(benchmark_directory, 'batch.avro')
+        EmailContainer.write_avro_batch(email_container_list, avro_container_uri)
+        print('Messages: ' + str(args.messages) + ' (' + str(args.attachments) + ' attachment(s) of ' +
+              str(args.attachment_size) + ' bytes each), ' + str(os.path.getsize(avro_container_uri)) +
+              ' file bytes, fields: ' + ','.join(FIELD_PATHS))
+        print('backend                             full msg/s   projection msg/s   speedup')
+        for backend in (StandardAvroSerializationBackend(), CompiledAvroSerializationBackend()):
+            AbstractContainer.set_serialization_backend(backend)
+            if read_full(avro_container_uri) != read_projection(avro_container_uri):
+                raise RuntimeError(backend.backend_name + ' projection does not match the full read')
+
+            elapsed_by_reader = {}
+            for read_fields in (read_full, read_projection):
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    read_fields(avro_container_uri)
+                elapsed_by_reader[read_fields] = time.perf_counter() - start
+
+            message_total = args.messages * args.repeat
+            print(backend.backend_name.ljust(35) + ' ' +
+                  str(round(message_total / elapsed_by_reader[read_full], 1)).rjust(10) + ' ' +
+                  str(round(message_total / elapsed_by_reader[read_projection], 1)).rjust(18) + ' ' +
+                  str(round(elapsed_by_reader[read_full] / elapsed_by_reader[read_projection], 2)).rjust(9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import random
+import time
+
+from netaddr import IPAddress, AddrFormatError
+
+from emerald_message.parsers.email.sendgrid_metadata_parser import parse_sendgrid_form
+
+from benchmarks.synthetic_email_corpus import make_email_headers, make_email_text
+
+'''
+Forms per second through the SendGrid form field parsing done by ParsedEmail, before (the split / strip DKIM
+parsing and per field lookups it used to do inline, reproduced below) and after (parse_sendgrid_form), for header
+blocks of increasing size.  Both must agree on every form before timing
+'''
+
+
+# mail comes from a limited set of senders, each signing with the same domains every time
+def make_sendgrid_form(message_number: int,
+                       received_hop_count: int,
+                       dkim_signature_count: int,
+                       sender_count: int) -> dict:
+    rng = random.Random(message_number)
+    sender_number = message_number % sender_count
+    dkim_entries = ['@signer' + str(x) + '.sender' + str(sender_number) + '.example.com : ' +
+                    ('pass' if x != sender_number % 5 else 'fail')
+                    for x in range(dkim_signature_count)]
+    return {
+        'headers': make_email_headers(message_number, received_hop_count=received_hop_count),
+        'dkim': '{' + ', '.join(dkim_entries) + '}',
+        'to': 'inbox@ingestion.example.com',
+        'html': '<html><body>' + make_email_text(rng, 200) + '</body></html>',
+        'from': 'Box Office <orders@example.com>',
+        'text': make_email_text(rng, 200),
+        'sender_ip': '10.0.' + str(message_number % 250) + '.1',
+        'envelope': json.dumps({'to': ['inbox@ingestion.example.com'], 'from': 'orders@example.com'}),
+        'attachments': '0',
+        'subject': 'Your order ' + str(message_number),
+        'charsets': json.dumps({'to': 'UTF-8', 'html': 'UTF-8', 'subject': 'UTF-8', 'from': 'UTF-8',
+                                'text': 'UTF-8'}),
+        'SPF': 'pass'
+    }
+
+
+def parse_form_before(sendgrid_payload: dict):
+    email_data_dictionary = dict()
+    for kvpair in sendgrid_payload.items():
+        email_data_dictionary[kvpair[0]] = kvpair[1]
+    field_values = {}
+    for field_name in ('charsets', 'headers', 'sender_ip', 'attachments', 'envelope', 'subject', 'text'):
+        try:
+            field_values[field_name] = sendgrid_payload[field_name]
+        except KeyError:
+            raise ValueError('Unable to find ' + field_name + ' - keys found: ' +
+                             ','.join([str(x) for x in email_data_dictionary.keys()]))
+    attachment_count = int(field_values['attachments'])
+    try:
+        email_spf_passed = sendgrid_payload['spf'].casefold() == 'pass'
+    except KeyError:
+        email_spf_passed = None
+
+    # the split / strip parsing, with the early exit on failure corrected so the results can be compared
+    email_dkim_passed = None
+    try:
+        email_dkim_passed_dict_string = sendgrid_payload['dkim']
+        if not email_dkim_passed_dict_string.startswith('{') or not email_dkim_passed_dict_string.endswith('}'):
+            raise ValueError('Expected DKIM string in braces')
+        email_dkim_passed_dict_string = email_dkim_passed_dict_string.lstrip('{').rstrip('}').lstrip().rstrip()
+        email_dkim_passed = True
+        for this_entry in email_dkim_passed_dict_string.split(','):
+            this_entry_kv_pair = this_entry.split(':')
+            if len(this_entry_kv_pair) != 2:
+                raise ValueError('DKIM entry is not valid')
+            if this_entry_kv_pair[1].rstrip().lstrip().casefold() != 'pass':
+                email_dkim_passed = False
+                break
+    except KeyError:
+        pass
+    except ValueError:
+        email_dkim_passed = None
+    try:
+        email_sender_ip = IPAddress(field_values['sender_ip'])
+    except (AddrFormatError, TypeError, ValueError):
+        raise ValueError('Unable to parse sender_ip')
+    return field_values['headers'], email_sender_ip, attachment_count, email_spf_passed, email_dkim_passed
+
+
+def parse_form_after(sendgrid_payload: dict):
+    sendgrid_form_record = parse_sendgrid_form(sendgrid_payload)
+    return sendgrid_form_record.email_headers, sendgrid_form_record.email_sender_ip, \
+        sendgrid_form_record.attachment_count, sendgrid_form_record.email_spf_sender_passed, \
+        sendgrid_form_record.email_dkim_sender_passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--dkim_signatures', type=int, default=3)
+    parser.add_argument('--senders', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('Messages: ' + str(args.messages) + ' from ' + str(args.senders) + ' senders, DKIM signatures per ' +
+          'message: ' + str(args.dkim_signatures))
+    print('received hops   header bytes   before forms/s   after forms/s   speedup')
+    for received_hop_count in (2, 8, 32, 128):
+        form_list = [make_sendgrid_form(x, received_hop_count, args.dkim_signatures, args.senders)
+                     for x in range(args.messages)]
+        for sendgrid_payload in form_list:
+            # the old code read 'spf' while SendGrid sends 'SPF' - compare the rest
+            before_result = parse_form_before(dict(sendgrid_payload, spf=sendgrid_payload['SPF']))
+            if before_result != parse_form_after(sendgrid_payload):
+                raise RuntimeError('Parsers disagree on message with headers ' + os.linesep +
+                                   sendgrid_payload['headers'])
+
+        elapsed_by_parser = {}
+        for parse_form in (parse_form_before, parse_form_after):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for sendgrid_payload in form_list:
+                    parse_form(sendgrid_payload)
+            elapsed_by_parser[parse_form] = time.perf_counter() - start
+
+        form_total = args.messages * args.repeat
+        print(str(received_hop_count).rjust(13) + ' ' +
+              str(len(form_list[0]['headers'])).rjust(14) + ' ' +
+              str(round(form_total / elapsed_by_parser[parse_form_before], 1)).rjust(16) + ' ' +
+              str(round(form_total / elapsed_by_parser[parse_form_after], 1)).rjust(15) + ' ' +
+              str(round(elapsed_by_parser[parse_form_before] / elapsed_by_parser[parse_form_after], 2)).rjust(9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import io
+import time
+
+from avro.io import BinaryEncoder, BinaryDecoder
+
+from emerald_message.containers.avro_serialization_backend import StandardAvroSerializationBackend, \
+    CompiledAvroSerializationBackend, FastavroSerializationBackend
+from emerald_message.containers.email.email_container import EmailContainer
+
+from benchmarks.synthetic_email_corpus import make_email_corpus
+
+'''
+Messages per second encoding and decoding EmailContainer datums with each serialization backend (fastavro only
+when installed).  Only the datum encoding is timed - file framing is the same avro library code for every backend.
+The encoded bytes of every backend are checked against the standard avro.io encoding before timing
+'''
+
+
+def encode_all(backend, avro_schema, container_dict_list) -> bytes:
+    datum_writer = backend.get_datum_writer(avro_schema)
+    encoded_stream = io.BytesIO()
+    encoder = BinaryEncoder(encoded_stream)
+    for container_dict in container_dict_list:
+        datum_writer.write(container_dict, encoder)
+    return encoded_stream.getvalue()
+
+
+def decode_all(backend, avro_schema, encoded_bytes: bytes, message_count: int):
+    datum_reader = backend.get_datum_reader()
+    datum_reader.writer_schema = avro_schema
+    decoder = BinaryDecoder(io.BytesIO(encoded_bytes))
+    return [datum_reader.read(decoder) for _ in range(message_count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--attachments', type=int, default=0)
+    parser.add_argument('--attachment_size', type=int, default=16 * 1024)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    container_dict_list = [x.get_as_dict() for x in make_email_corpus(message_count=args.messages,
+                                                                      attachment_count=args.attachments,
+                                                                      attachment_size_bytes=args.attachment_size)]
+    avro_schema = EmailContainer.get_avro_schema_record().avro_schema
+
+    backend_list = [StandardAvroSerializationBackend(), CompiledAvroSerializationBackend()]
+    if FastavroSerializationBackend.is_available():
+        backend_list.append(FastavroSerializationBackend())
+
+    reference_bytes = encode_all(backend_list[0], avro_schema, container_dict_list)
+    print('Messages: ' + str(args.messages) + ' (' + str(args.attachments) + ' attachment(s) of ' +
+          str(args.attachment_size) + ' bytes each), ' + str(len(reference_bytes)) + ' encoded bytes')
+    print('backend                             encode msg/s   decode msg/s   identical bytes')
+    for backend in backend_list:
+        encoded_bytes = encode_all(backend, avro_schema, container_dict_list)
+        if decode_all(backend, avro_schema, encoded_bytes, args.messages) != container_dict_list:
+            raise RuntimeError(backend.backend_name + ' did not decode the datums it encoded')
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            encode_all(backend, avro_schema, container_dict_list)
+        elapsed_encode = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            decode_all(backend, avro_schema, reference_bytes, args.messages)
+        elapsed_decode = time.perf_counter() - start
+
+        message_total = args.messages * args.repeat
+        print(backend.backend_name.ljust(35) + ' ' +
+              str(round(message_total / elapsed_encode, 1)).rjust(12) + ' ' +
+              str(round(message_total / elapsed_decode, 1)).rjust(14) + ' ' +
+              str(encoded_bytes == reference_bytes).rjust(17))
+
+
+if __name__ == '__main__':
+    main()
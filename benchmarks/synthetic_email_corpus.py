@@ -0,0 +1,101 @@
+import os
+import random
+from typing import List
+
+from netaddr import IPAddress
+
+from emerald_message.containers.email.email_attachment import EmailAttachment, EmailAttachmentParameters
+from emerald_message.containers.email.email_body import EmailBody, EmailBodyParameters
+from emerald_message.containers.email.email_container import EmailContainer, EmailContainerParameters
+from emerald_message.containers.email.email_envelope import EmailEnvelope, EmailEnvelopeParameters
+from emerald_message.containers.email.email_message_metadata import EmailMessageMetadata, \
+    EmailMessageMetadataParameters
+
+'''
+Shared synthetic email corpus for the scripts in this folder.  Messages look like typical inbound ticketing
+mail: a routing header block of a couple of KB, a text and HTML body, and optionally attachments
+'''
+
+_WORDS = ['ticket', 'section', 'row', 'seat', 'order', 'confirmation', 'event', 'venue', 'price', 'total',
+          'delivery', 'transfer', 'barcode', 'mobile', 'entry', 'gate', 'parking', 'refund', 'policy', 'the',
+          'your', 'for', 'and', 'of', 'to', 'please', 'thank', 'you', 'purchase', 'account']
+
+
+def make_email_headers(message_number: int,
+                       received_hop_count: int = 6) -> str:
+    header_lines = []
+    for hop in range(received_hop_count):
+        header_lines.append('Received: from mx' + str(hop) + '.example.com (mx' + str(hop) +
+                            '.example.com [10.0.' + str(hop) + '.' + str(message_number % 250) + '])' + '\r\n' +
+                            '\tby mx.sendgrid.net with ESMTPS id ' + str(message_number * 31 + hop) +
+                            '; Mon, 01 Jan 2024 10:00:' + str(hop).zfill(2) + ' +0000')
+    header_lines.extend([
+        'DKIM-Signature: v=1; a=rsa-sha256; c=relaxed/relaxed; d=example.com; s=s1;' + '\r\n' +
+        '\th=from:to:subject:date:message-id; bh=' + 'A' * 44 + ';' + '\r\n' + '\tb=' + 'B' * 340,
+        'Message-ID: <' + str(message_number) + '.' + str(message_number * 7) + '@mail.example.com>',
+        'Date: Mon, 01 Jan 2024 10:00:00 +0000',
+        'From: Box Office <orders@example.com>',
+        'To: inbox' + str(message_number % 10) + '@ingestion.example.com',
+        'Subject: Your order ' + str(message_number),
+        'List-Id: <orders.example.com>',
+        'MIME-Version: 1.0',
+        'Content-Type: multipart/mixed; boundary="----=_Part_' + str(message_number) + '"',
+    ])
+    return '\r\n'.join(header_lines) + '\r\n'
+
+
+def make_email_text(rng: random.Random,
+                    word_count: int) -> str:
+    lines = []
+    for line_start in range(0, word_count, 12):
+        lines.append(' '.join(rng.choice(_WORDS) for _ in range(min(12, word_count - line_start))))
+    return '\n'.join(lines)
+
+
+def make_email_container(message_number: int,
+                         attachment_count: int = 0,
+                         attachment_size_bytes: int = 64 * 1024,
+                         body_word_count: int = 400) -> EmailContainer:
+    rng = random.Random(message_number)
+    body_text = make_email_text(rng, body_word_count)
+
+    attachments = []
+    for attachment_number in range(attachment_count):
+        attachments.append(EmailAttachment(container_parameters=EmailAttachmentParameters(
+            filename='ticket_' + str(message_number) + '_' + str(attachment_number) + '.pdf',
+            mimetype='application/pdf',
+            contents_base64=EmailAttachment.transform_base_64_encode(
+                element=make_email_text(rng, attachment_size_bytes // 8)[:attachment_size_bytes]))))
+
+    return EmailContainer(container_parameters=EmailContainerParameters(
+        email_message_metadata=EmailMessageMetadata(container_parameters=EmailMessageMetadataParameters(
+            router_source_tag='router-' + str(message_number % 4),
+            routed_timestamp_iso8601='20240101T10:' + str(message_number // 60 % 60).zfill(2) + ':' +
+                                     str(message_number % 60).zfill(2) + '+0000',
+            email_sender_ip=IPAddress('10.1.' + str(message_number // 250 % 250) + '.' + str(message_number % 250)),
+            attachment_count=attachment_count,
+            email_headers=make_email_headers(message_number),
+            email_spf_sender_passed=True,
+            email_dkim_sender_passed=True)),
+        email_envelope=EmailEnvelope(container_parameters=EmailEnvelopeParameters(
+            address_from='orders' + str(message_number % 50) + '@example.com',
+            address_to_collection=frozenset(['inbox' + str(message_number % 10) + '@ingestion.example.com']),
+            message_subject='Your order ' + str(message_number),
+            message_rx_timestamp_iso8601='20240101T10:00:00+0000')),
+        email_body=EmailBody(container_parameters=EmailBodyParameters(
+            message_body_text=body_text,
+            message_body_html='<html><body><p>' + body_text.replace('\n', '</p><p>') + '</p></body></html>')),
+        email_attachment_collection=frozenset(attachments)))
+
+
+def make_email_corpus(message_count: int,
+                      attachment_count: int = 0,
+                      attachment_size_bytes: int = 64 * 1024) -> List[EmailContainer]:
+    return [make_email_container(message_number=x,
+                                 attachment_count=attachment_count,
+                                 attachment_size_bytes=attachment_size_bytes)
+            for x in range(message_count)]
+
+
+def get_file_size(file_uri: str) -> int:
+    return os.stat(file_uri).st_size
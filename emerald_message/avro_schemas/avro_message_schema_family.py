@@ -1,10 +1,29 @@
 import os
 from enum import Enum, unique
+from functools import lru_cache
 from typing import FrozenSet
 # noinspection PyCompatibility
 from importlib.resources import path
 
 from emerald_message import avro_schemas
+from emerald_message.logging.logger import EmeraldLogger
+
+_schema_family_logger = EmeraldLogger(logging_module_name='AvroMessageSchemaFamily')
+
+
+#
+#  The folders under the avro_schemas package do not change while we run, so scan them once per process
+#  (the enum constructor below checks every member against this list)
+#
+@lru_cache(maxsize=None)
+def _scan_schema_family_names() -> FrozenSet[str]:
+    schema_subfolders = []
+    with path('emerald_message.avro_schemas', '') as schema_avro_path:
+        with os.scandir(schema_avro_path) as subfolder_iterator:
+            for entry in subfolder_iterator:
+                if not entry.name.startswith('.') and not entry.name.startswith('__') and entry.is_dir():
+                    schema_subfolders.append(entry.name)
+    return frozenset(schema_subfolders)
 
 
 @unique
@@ -17,13 +36,7 @@ class AvroMessageSchemaFamily(Enum):
 
     @classmethod
     def enumerate_schema_family_names(cls) -> FrozenSet[str]:
-        schema_subfolders = []
-        with path('emerald_message.avro_schemas', '') as schema_avro_path:
-            with os.scandir(schema_avro_path) as subfolder_iterator:
-                for entry in subfolder_iterator:
-                    if not entry.name.startswith('.') and not entry.name.startswith('__') and entry.is_dir():
-                        schema_subfolders.append(entry.name)
-        return frozenset(schema_subfolders)
+        return _scan_schema_family_names()
 
     #
     # use a check in the constructor to be sure that the values we set here actually match the folder names
@@ -32,7 +45,8 @@ class AvroMessageSchemaFamily(Enum):
     # can use to figure out what schemas are available and how to get the namespace identifiers
     #
     def __new__(cls, value):
-        print('Initializing schema family value = ' + str(value))
+        if _schema_family_logger.is_debug_enabled:
+            _schema_family_logger.logger.debug('Initializing schema family value = ' + str(value))
         path_names = cls.enumerate_schema_family_names()
         # halt if we have a mismatch in the names
         if value not in path_names:
@@ -48,7 +62,8 @@ class AvroMessageSchemaFamily(Enum):
                                'how to reference the available schemas' + os.linesep +
                                'There is likely a typo or spelling error in one of the two')
 
-        print('Will be initializing ' + cls.__name__ + ' with value ' + str(value))
+        if _schema_family_logger.is_debug_enabled:
+            _schema_family_logger.logger.debug('Will be initializing ' + cls.__name__ + ' with value ' + str(value))
         obj = object.__new__(cls)
         obj._value_ = value
         return obj
@@ -4,11 +4,20 @@ import json
 from dataclasses import dataclass
 # noinspection PyCompatibility
 from importlib.resources import path
-from typing import FrozenSet, List, Set, Union, Optional
+import threading
+from typing import Any, Dict, FrozenSet, List, Set, Tuple, Union, Optional
 from emerald_message import avro_schemas
 from emerald_message.avro_schemas.avro_message_schema_family import AvroMessageSchemaFamily
+from emerald_message.avro_schemas.avro_schema_fingerprint import get_avro_schema_fingerprint
 from emerald_message.logging.logger import EmeraldLogger, EmeraldLoggerLevel
 from emerald_message.error import EmeraldSchemaParsingException
+from emerald_message.version import __version__
+
+# bump this if the layout written by AvroMessageSchemas.write_schema_bundle changes
+AVRO_SCHEMA_BUNDLE_FORMAT_VERSION = 1
+
+# set this to the path of a precompiled schema bundle to have AvroMessageSchemaFrozen load from it
+AVRO_SCHEMA_BUNDLE_ENVIRONMENT_VARIABLE = 'EMERALD_MESSAGE_AVRO_SCHEMA_BUNDLE'
 
 
 #
@@ -27,6 +36,7 @@ class AvroMessageSchemaConfigurationRecord:
     debug: bool
     schema_subfolders: Optional[Union[List[str], Set[str]]] = None
     schema_extension: str = 'avsc'
+    schema_bundle_uri: Optional[str] = None
 
 
 #
@@ -71,21 +81,22 @@ class AvroMessageSchemas:
 
     def get_schema_by_full_namespace(self,
                                      namespace: str) -> avro.schema.Schema:
-        for this_namespace, this_schema in self.known_avro_schema_dot_names.names.items():
-            if this_namespace == namespace:
-                return this_schema
+        try:
+            return self._avro_schema_by_full_namespace_index[namespace]
+        except KeyError:
+            pass
 
         raise EmeraldSchemaParsingException('Unable to locate schema with namespace "' + str(namespace))
 
     def get_matching_schema_record_by_family_and_name(self,
                                                       schema_family: AvroMessageSchemaFamily,
                                                       schema_name: str) -> AvroMessageSchemaRecord:
-        # iterate through and find our record - it is a kind of compound key (we won't have multiple names
-        # in the same family
-        for this_schema_record in self._avro_schema_list:
-            if this_schema_record.avro_schema_family_name == schema_family and \
-                    this_schema_record.avro_schema_name == schema_name:
-                return this_schema_record
+        # the index is keyed by the compound key of family and name (we won't have multiple names
+        # in the same family) and is built once when the schemas are loaded
+        try:
+            return self._avro_schema_record_by_family_and_name_index[(schema_family, schema_name)]
+        except (KeyError, TypeError):
+            pass
 
         raise EmeraldSchemaParsingException(
             'Unable to match schema entry against the matching criteria' +
@@ -96,6 +107,36 @@ class AvroMessageSchemas:
                 [x.avro_schema_family_name.name + ': ' + x.avro_schema_name
                  for x in self._avro_schema_list]))
 
+    #
+    #  Every loaded schema is fingerprinted (CRC-64-AVRO of its Parsing Canonical Form) once at load, so a message
+    #  framed with only the fingerprint (Avro single object encoding) can be resolved to its writer schema locally
+    #  instead of carrying the full JSON schema the way an AVRO file does
+    #
+    @property
+    def avro_schema_fingerprints(self) -> FrozenSet[bytes]:
+        return frozenset(self._avro_schema_record_by_fingerprint_index.keys())
+
+    def get_schema_fingerprint_by_family_and_name(self,
+                                                  schema_family: AvroMessageSchemaFamily,
+                                                  schema_name: str) -> bytes:
+        return get_avro_schema_fingerprint(
+            self.get_matching_schema_record_by_family_and_name(schema_family=schema_family,
+                                                               schema_name=schema_name).avro_schema)
+
+    def get_matching_schema_record_by_fingerprint(self,
+                                                  avro_schema_fingerprint: bytes) -> AvroMessageSchemaRecord:
+        try:
+            return self._avro_schema_record_by_fingerprint_index[avro_schema_fingerprint]
+        except (KeyError, TypeError):
+            pass
+
+        raise EmeraldSchemaParsingException(
+            'Unable to match schema fingerprint ' +
+            (avro_schema_fingerprint.hex() if isinstance(avro_schema_fingerprint, (bytes, bytearray))
+             else str(avro_schema_fingerprint)) +
+            ' against any loaded schema - the writer used a schema this process does not know' +
+            os.linesep + 'Loaded schema count = ' + str(len(self._avro_schema_record_by_fingerprint_index)))
+
     def get_schema_by_family_and_name(self,
                                       schema_family: AvroMessageSchemaFamily,
                                       schema_name: str) -> avro.schema.Schema:
@@ -103,6 +144,77 @@ class AvroMessageSchemas:
         return self.get_matching_schema_record_by_family_and_name(schema_family=schema_family,
                                                                   schema_name=schema_name).avro_schema
 
+    #
+    #  A schema bundle is a single JSON file holding every schema (with its family) in the order it must be parsed
+    #  Generate it at build time from a directory scan (see the launcher --compile_avro_schema_bundle option) and
+    #  point short lived processes at it to avoid walking and parsing the schema folders on every start
+    #
+    def write_schema_bundle(self,
+                            schema_bundle_uri: str):
+        schema_bundle = {
+            'bundle_format_version': AVRO_SCHEMA_BUNDLE_FORMAT_VERSION,
+            'emerald_message_version': __version__,
+            'schemas': [{'schema_family_name': schema_family_name,
+                         'schema_json': schema_json}
+                        for schema_family_name, schema_json in self._avro_schema_json_list]
+        }
+        with open(schema_bundle_uri, encoding='utf-8', mode='w') as schema_bundle_fp:
+            json.dump(schema_bundle, schema_bundle_fp, separators=(',', ':'))
+
+    def _load_schema_bundle(self,
+                            schema_bundle_uri: str,
+                            schema_subfolders: Optional[Union[List[str], Set[str]]]) -> List[AvroMessageSchemaRecord]:
+        self.logger.logger.debug('Loading AVRO schemas from precompiled bundle ' + str(schema_bundle_uri))
+        try:
+            with open(schema_bundle_uri, encoding='utf-8', mode='r') as schema_bundle_fp:
+                schema_bundle = json.load(schema_bundle_fp)
+        except OSError as oex:
+            raise EmeraldSchemaParsingException('Schema bundle "' + str(schema_bundle_uri) + '" cannot be opened' +
+                                                os.linesep + 'Exception info: ' + str(oex.args))
+        except json.JSONDecodeError as jdex:
+            raise EmeraldSchemaParsingException('Schema bundle "' + str(schema_bundle_uri) +
+                                                '" cannot be read as valid JSON' +
+                                                os.linesep + 'Exception  info: ' + str(jdex.args))
+
+        if not isinstance(schema_bundle, dict) or \
+                schema_bundle.get('bundle_format_version') != AVRO_SCHEMA_BUNDLE_FORMAT_VERSION:
+            raise EmeraldSchemaParsingException('Schema bundle "' + str(schema_bundle_uri) +
+                                                '" is not a supported bundle - expected bundle_format_version ' +
+                                                str(AVRO_SCHEMA_BUNDLE_FORMAT_VERSION))
+        if schema_bundle.get('emerald_message_version') != __version__:
+            self.logger.logger.warning('Schema bundle "' + str(schema_bundle_uri) + '" was built by version ' +
+                                       str(schema_bundle.get('emerald_message_version')) +
+                                       ' but this package is version ' + __version__ +
+                                       ' - regenerate the bundle if the schemas have changed')
+
+        avro_schema_list: List[AvroMessageSchemaRecord] = []
+        for schema_counter, schema_entry in enumerate(schema_bundle.get('schemas', []), start=1):
+            try:
+                schema_family_name = schema_entry['schema_family_name']
+                schema_json = schema_entry['schema_json']
+            except (KeyError, TypeError):
+                raise EmeraldSchemaParsingException('Schema bundle "' + str(schema_bundle_uri) + '" entry #' +
+                                                    str(schema_counter) + ' is missing schema_family_name or ' +
+                                                    'schema_json')
+            if schema_subfolders is not None and len(schema_subfolders) > 0 and \
+                    schema_family_name not in schema_subfolders:
+                continue
+            try:
+                avro_schema = avro.schema.SchemaFromJSONData(json_data=schema_json,
+                                                             names=self._known_avro_schema_dot_names)
+            except avro.schema.SchemaParseException as spex:
+                raise EmeraldSchemaParsingException('Schema bundle "' + str(schema_bundle_uri) + '" entry #' +
+                                                    str(schema_counter) + ' cannot be parsed as a valid AVRO schema' +
+                                                    os.linesep + 'Exception info: ' + str(spex.args))
+            avro_schema_list.append(
+                AvroMessageSchemaRecord(avro_schema_family_name=AvroMessageSchemaFamily(schema_family_name),
+                                        avro_schema_name=avro_schema.name,
+                                        avro_schema=avro_schema)
+            )
+            self._avro_schema_json_list.append((schema_family_name, schema_json))
+
+        return avro_schema_list
+
     def __init__(self,
                  schema_configuration_record: AvroMessageSchemaConfigurationRecord
                  ):
@@ -133,11 +245,6 @@ class AvroMessageSchemas:
                 'Caller must provide schema_subfolders parameter as None or initialize with a list or set of strings'
             )
 
-        # if caller specifies None as the schema_subfolders parameter, we will search through every directory
-        if schema_subfolders is None or len(schema_subfolders) == 0:
-            schema_subfolders = sorted(AvroMessageSchemaFamily.enumerate_schema_family_names())
-            print('Scanning all subfolders: ' + os.linesep + ','.join([x for x in schema_subfolders]))
-
         self._logger = EmeraldLogger(logging_module_name=type(self).__name__,
                                      global_logging_level=EmeraldLoggerLevel.DEBUG
                                      if self._debug
@@ -154,8 +261,22 @@ class AvroMessageSchemas:
         #  first by the schema folder as text and then by the schema Name property from in the properly validated file
         avro_schema_list: List[AvroMessageSchemaRecord] = []
 
+        # keep the raw JSON of each schema (with its family) in load order so we can write out a precompiled bundle
+        self._avro_schema_json_list: List[Tuple[str, Any]] = []
+
+        if schema_configuration_record.schema_bundle_uri is not None:
+            # a precompiled bundle replaces the directory walk completely
+            avro_schema_list = self._load_schema_bundle(schema_bundle_uri=schema_configuration_record.schema_bundle_uri,
+                                                        schema_subfolders=schema_subfolders)
+            schema_subfolders = []
+        elif schema_subfolders is None or len(schema_subfolders) == 0:
+            # if caller specifies None as the schema_subfolders parameter, we will search through every directory
+            schema_subfolders = sorted(AvroMessageSchemaFamily.enumerate_schema_family_names())
+            self._logger.logger.debug('Scanning all subfolders: ' + os.linesep +
+                                      ','.join([x for x in schema_subfolders]))
+
         for schema_type_counter, this_schema_subfolder in enumerate(schema_subfolders, start=1):
-            self._logger.logger.info('Starting scan of AVRO schema subfolder "' + this_schema_subfolder + '"')
+            self._logger.logger.debug('Starting scan of AVRO schema subfolder "' + this_schema_subfolder + '"')
             schema_base_import_path = avro_schemas
             try:
                 # pep erroneously complains  about this syntax if you use avro_schemas without being in string
@@ -178,8 +299,8 @@ class AvroMessageSchemas:
 
                     # sort the list alphabetically
                     subdirectory_list = sorted(subdirectory_list, reverse=False)
-                    self._logger.logger.info('For schema subfolder "' + schema_subfolder.name +
-                                             '", the list of subfolders: ' + str(subdirectory_list))
+                    self._logger.logger.debug('For schema subfolder "' + schema_subfolder.name +
+                                              '", the list of subfolders: ' + str(subdirectory_list))
 
                     # now build the list of paths to search starting with all subfolders
                     # (sorted alphabetically) and then
@@ -212,7 +333,7 @@ class AvroMessageSchemas:
                                                              self.schema_extension + '"')
                                     continue
 
-                                self.logger.logger.info(
+                                self.logger.logger.debug(
                                     'Scanning file ' + schema_file.name + ' in path ' + this_search_path)
 
                                 # now try to parse the avro schema.  Read json first and then
@@ -255,6 +376,7 @@ class AvroMessageSchemas:
                                                             avro_schema_name=avro_schema.name,
                                                             avro_schema=avro_schema)
                                 )
+                                self._avro_schema_json_list.append((this_schema_subfolder, schema_file_json))
 
             except (ModuleNotFoundError, AttributeError) as mfex:
                 raise EmeraldSchemaParsingException('Unable to locate module / attribute "' +
@@ -262,27 +384,91 @@ class AvroMessageSchemas:
                                                     '" of type "' + type(schema_base_import_path).__name__ + '"' +
                                                     os.linesep + 'Exception type: ' + type(mfex).__name__)
 
-            self.logger.logger.info('Total schema count deserialized: ' + str(len(avro_schema_list)))
-            self._avro_schema_list = avro_schema_list
-            self.logger.logger.info('Namespaces (based on our collection instance): ' + os.linesep +
-                                    os.linesep.join([x for x in self.avro_schema_base_namespaces]))
-            self.logger.logger.info('Known schema names (based on avro.schema.Names registry: ' + os.linesep +
-                                    str(self.known_avro_schema_dot_names.names))
+        self.logger.logger.info('Total schema count deserialized: ' + str(len(avro_schema_list)))
+        self._avro_schema_list = avro_schema_list
+        self.logger.logger.debug('Namespaces (based on our collection instance): ' + os.linesep +
+                                 os.linesep.join([x for x in self.avro_schema_base_namespaces]))
+        self.logger.logger.debug('Known schema names (based on avro.schema.Names registry: ' + os.linesep +
+                                 str(self.known_avro_schema_dot_names.names))
+
+        # build the lookup indexes once here so per-message lookups do not scan the lists
+        self._avro_schema_record_by_family_and_name_index: Dict[Tuple[AvroMessageSchemaFamily, str],
+                                                                AvroMessageSchemaRecord] = \
+            {(x.avro_schema_family_name, x.avro_schema_name): x for x in avro_schema_list}
+        self._avro_schema_by_full_namespace_index: Dict[str, avro.schema.Schema] = \
+            dict(self._known_avro_schema_dot_names.names)
+        self._avro_schema_record_by_fingerprint_index: Dict[bytes, AvroMessageSchemaRecord] = {}
+        for avro_schema_record in avro_schema_list:
+            avro_schema_fingerprint = get_avro_schema_fingerprint(avro_schema_record.avro_schema)
+            if avro_schema_fingerprint in self._avro_schema_record_by_fingerprint_index:
+                # identical canonical forms under two names cannot be told apart on the wire
+                raise EmeraldSchemaParsingException(
+                    'Schemas "' + self._avro_schema_record_by_fingerprint_index[
+                        avro_schema_fingerprint].avro_schema.fullname + '" and "' +
+                    avro_schema_record.avro_schema.fullname + '" share the fingerprint ' +
+                    avro_schema_fingerprint.hex())
+            self._avro_schema_record_by_fingerprint_index[avro_schema_fingerprint] = avro_schema_record
 
         return
 
 
 #
-#  Design note - by wrapping the schema in this dataclass, we are allowing users to create their
+#  The shared schema collection is built the first time it is used rather than at import, so importing a container
+#  does not walk and parse the schema folders.  Access stays the same for callers:
+#       AvroMessageSchemaFrozen.avro_schema_collection
+#
+class _LazyAvroMessageSchemas:
+    def __get__(self, instance, owner) -> AvroMessageSchemas:
+        avro_schema_collection = self._avro_schema_collection
+        if avro_schema_collection is None:
+            with self._lock:
+                if self._avro_schema_collection is None:
+                    self._avro_schema_collection = AvroMessageSchemas(owner.get_schema_configuration_record())
+                avro_schema_collection = self._avro_schema_collection
+        return avro_schema_collection
+
+    def is_loaded(self) -> bool:
+        return self._avro_schema_collection is not None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._avro_schema_collection: Optional[AvroMessageSchemas] = None
+
+
+#
+#  Design note - by wrapping the schema in this class, we are allowing users to create their
 #  own (still essentially immutable in concept) avro schemas that vary the parameters of the config
 #  record.  IN this case, though we are giving ourselves the set that we will use for real work
 #  in any container
 #
-@dataclass(frozen=True)
+#  Processes can load the collection from a precompiled bundle by setting the environment variable named in
+#  AVRO_SCHEMA_BUNDLE_ENVIRONMENT_VARIABLE, or by calling configure() before the collection is first used
+#
 class AvroMessageSchemaFrozen:
-    avro_schema_collection: AvroMessageSchemas = \
-        AvroMessageSchemas(AvroMessageSchemaConfigurationRecord(
+    _schema_configuration_record: Optional[AvroMessageSchemaConfigurationRecord] = None
+
+    avro_schema_collection: AvroMessageSchemas = _LazyAvroMessageSchemas()
+
+    @classmethod
+    def get_schema_configuration_record(cls) -> AvroMessageSchemaConfigurationRecord:
+        if cls._schema_configuration_record is not None:
+            return cls._schema_configuration_record
+
+        schema_bundle_uri = os.environ.get(AVRO_SCHEMA_BUNDLE_ENVIRONMENT_VARIABLE)
+        return AvroMessageSchemaConfigurationRecord(
             schema_subfolders=None,
             debug=False,
-            schema_extension='.avsc')
-        )
+            schema_extension='.avsc',
+            schema_bundle_uri=schema_bundle_uri if schema_bundle_uri else None)
+
+    @classmethod
+    def configure(cls,
+                  schema_configuration_record: AvroMessageSchemaConfigurationRecord):
+        if not isinstance(schema_configuration_record, AvroMessageSchemaConfigurationRecord):
+            raise RuntimeError('Caller must provide valid ' + AvroMessageSchemaConfigurationRecord.__name__ +
+                               ' to configure ' + cls.__name__ + os.linesep +
+                               'Type provided = ' + type(schema_configuration_record).__name__)
+        if cls.__dict__['avro_schema_collection'].is_loaded():
+            raise RuntimeError('Unable to configure ' + cls.__name__ + ' - the schema collection has already ' +
+                               'been loaded.  Configure before any container is used')
+        cls._schema_configuration_record = schema_configuration_record
@@ -0,0 +1,41 @@
+from typing import Dict, Tuple
+
+import avro.schema
+from avro.schemanormalization import ToParsingCanonicalForm, Fingerprint
+
+#
+#  Avro single object encoding (see the Avro specification): a two byte marker, the 8 byte little-endian
+#  CRC-64-AVRO (Rabin) fingerprint of the writer schema's Parsing Canonical Form, then the encoded datum.
+#  Readers must already know the schema behind the fingerprint - no schema travels with the datum
+#
+AVRO_SINGLE_OBJECT_ENCODING_MARKER = b'\xc3\x01'
+AVRO_SCHEMA_FINGERPRINT_SIZE_BYTES = 8
+AVRO_SINGLE_OBJECT_ENCODING_HEADER_SIZE_BYTES = \
+    len(AVRO_SINGLE_OBJECT_ENCODING_MARKER) + AVRO_SCHEMA_FINGERPRINT_SIZE_BYTES
+
+# magic bytes at the start of an AVRO object container file
+AVRO_DATA_FILE_MAGIC = b'Obj\x01'
+
+# the fingerprint never changes for a schema object - keyed by id, holding the schema so the id is not reused
+_avro_schema_fingerprint_by_schema_id: Dict[int, Tuple[avro.schema.Schema, bytes]] = {}
+
+
+def get_avro_schema_canonical_form(avro_schema: avro.schema.Schema) -> str:
+    return ToParsingCanonicalForm(avro_schema)
+
+
+def get_avro_schema_fingerprint(avro_schema: avro.schema.Schema) -> bytes:
+    try:
+        cached_schema, avro_schema_fingerprint = _avro_schema_fingerprint_by_schema_id[id(avro_schema)]
+        if cached_schema is avro_schema:
+            return avro_schema_fingerprint
+    except KeyError:
+        pass
+
+    avro_schema_fingerprint = Fingerprint(get_avro_schema_canonical_form(avro_schema), 'CRC-64-AVRO')
+    _avro_schema_fingerprint_by_schema_id[id(avro_schema)] = (avro_schema, avro_schema_fingerprint)
+    return avro_schema_fingerprint
+
+
+def get_avro_single_object_encoding_header(avro_schema: avro.schema.Schema) -> bytes:
+    return AVRO_SINGLE_OBJECT_ENCODING_MARKER + get_avro_schema_fingerprint(avro_schema)
@@ -1,16 +1,28 @@
+import io
 import os
 import base64
+import itertools
 from dataclasses import dataclass
 from abc import ABCMeta, abstractmethod
-from typing import Dict, Any
-from avro.datafile import DataFileWriter, DataFileException, DataFileReader
-from avro.io import DatumReader, DatumWriter, AvroTypeException
+from functools import total_ordering
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from avro.datafile import DataFileException, DataFileReader
+from avro.io import AvroTypeException, BinaryEncoder, BinaryDecoder
 
 from emerald_message.avro_schemas.avro_message_schema_family import AvroMessageSchemaFamily
 from emerald_message.avro_schemas.avro_message_schemas import AvroMessageSchemas, \
     AvroMessageSchemaFrozen, AvroMessageSchemaRecord
+from emerald_message.avro_schemas.avro_schema_fingerprint import get_avro_single_object_encoding_header, \
+    AVRO_SINGLE_OBJECT_ENCODING_MARKER, AVRO_DATA_FILE_MAGIC, AVRO_SINGLE_OBJECT_ENCODING_HEADER_SIZE_BYTES
+from emerald_message.containers.avro_bytes_reader import AvroBytesReader
+from emerald_message.containers.avro_data_file_writer import AvroDataFileWriter, AvroCodecConfigurationRecord
+from emerald_message.containers.avro_projection_reader import iter_avro_projection
+from emerald_message.containers.avro_serialization_backend import AbstractAvroSerializationBackend, \
+    StandardAvroSerializationBackend
+from emerald_message.containers.container_canonical_key import compute_canonical_key_digest
 from emerald_message.error import EmeraldMessageContainerInitializationError, \
-    EmeraldMessageSerializationError, EmeraldMessageDeserializationError
+    EmeraldMessageSerializationError, EmeraldMessageDeserializationError, EmeraldSchemaParsingException
+from emerald_message.logging.logger import EmeraldLogger
 
 '''
 Use this matching identifiere as a way of providing configuration parameters to the classes implementing
@@ -28,19 +40,101 @@ class ContainerSchemaMatchingIdentifier:
 Use this as a base class to hold immutable parameters for each class implementing AbstractContainer
 Remember the MRO scheme in dataclasses - ok to have parameters with and without defaults in the child
 classes so long as you do not have default values here
+Declare the child classes with slots=True as well - a single class in the chain without slots gives every
+instance a __dict__ again
 '''
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ContainerParameters:
     pass
 
 
+# resolved schema record per implementing class - see AbstractContainer.get_avro_schema_record
+_avro_schema_record_by_container_class: Dict[type, AvroMessageSchemaRecord] = {}
+
+# one logger per implementing class - see AbstractContainer.get_logger
+_emerald_logger_by_container_class: Dict[type, EmeraldLogger] = {}
+
+# parameters type required by each implementing class whose class contract has been checked - see
+#  AbstractContainer._get_validated_container_parameters_type
+_container_parameters_type_by_container_class: Dict[type, type] = {}
+
+# datum encoding used by every container for reading and writing - see AbstractContainer.set_serialization_backend
+_avro_serialization_backend: AbstractAvroSerializationBackend = StandardAvroSerializationBackend()
+
+
+#
+#  Containers are held by the million in dedup and routing caches, so they carry no instance __dict__: every class
+#  in the hierarchy declares __slots__, listing only the attributes it adds itself (an empty tuple if none).
+#  Properties read the parameters through the _container_parameters slot directly
+#
+#  Equality, ordering and hashing all come from the canonical key (see container_canonical_key), computed on first
+#  use and kept with the 128 bit digest of it - sorting, deduplicating or hashing a container never rebuilds its
+#  string form or walks its fields again.  total_ordering supplies >, <= and >= from == and <
+#
+@total_ordering
 class AbstractContainer(metaclass=ABCMeta):
+    __slots__ = ('_container_parameters', '_debug', '_canonical_key', '_canonical_digest')
+
     @property
     def debug(self) -> bool:
         return self._debug
 
+    @property
+    def canonical_key(self) -> Tuple:
+        canonical_key = self._canonical_key
+        if canonical_key is None:
+            canonical_key = self._canonical_key = self._get_canonical_key()
+        return canonical_key
+
+    # 128 bit spooky hash of the canonical key - stable across processes, so it may be stored or sent
+    @property
+    def canonical_digest(self) -> int:
+        canonical_digest = self._canonical_digest
+        if canonical_digest is None:
+            canonical_digest = self._canonical_digest = self._compute_canonical_digest()
+        return canonical_digest
+
+    #
+    #  The implementing class lists its content as a canonical key tuple, in the order instances should sort.
+    #  Collections are sorted into tuples so members compare the same whatever order they were given in
+    #
+    @abstractmethod
+    def _get_canonical_key(self) -> Tuple:
+        pass
+
+    #  containers holding other containers can override this to digest their children's digests rather than
+    #  encoding the children's content a second time
+    def _compute_canonical_digest(self) -> int:
+        return compute_canonical_key_digest(self.canonical_key)
+
+    #  instances compare with instances of this class and its subclasses - override where versions of a container
+    #  (same content, different schema) should compare equal
+    @classmethod
+    def _get_canonical_comparison_class(cls) -> type:
+        return cls
+
+    def __hash__(self):
+        return hash(self.canonical_digest)
+
+    # keys, not digests, decide equality - a digest collision can never make two different containers equal
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, type(self)._get_canonical_comparison_class()):
+            return False
+        return self.canonical_key == other.canonical_key
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __lt__(self, other):
+        if not isinstance(other, type(self)._get_canonical_comparison_class()):
+            raise TypeError('Cannot compare object of type "' + type(other).__name__ + '" to ' +
+                            type(self)._get_canonical_comparison_class().__name__)
+        return self.canonical_key < other.canonical_key
+
     #  define utility function that do base 64 encoding -  if string will encode.  if bytes, assumes it is already done
     @classmethod
     def transform_base_64_encode(cls,
@@ -61,17 +155,57 @@ class AbstractContainer(metaclass=ABCMeta):
             raise TypeError('Caller must provide element as type bytes to use base64 encoding for ' +
                             'base 64 decoder in ' + cls.__name__ +
                             os.linesep + 'Type provided = ' + type(element).__name__)
-        return base64.b64decode(bytes).decode(encoding)
+        return base64.b64decode(element).decode(encoding)
 
     # we define in one place the mechanism for getting the AvroMessageSchemaRecord but note
     #  how it depends on the abstract methods implemented by the implementing classes
     #  Because the classes implementing this abstract class are dataclasses, you can't set properties in init
+    #  The record for a class never changes once the schemas are loaded, so it is resolved once per class and cached
     @classmethod
     def get_avro_schema_record(cls) -> AvroMessageSchemaRecord:
-        return AvroMessageSchemaFrozen.avro_schema_collection.get_matching_schema_record_by_family_and_name(
-            schema_family=
-            cls.get_container_schema_matching_identifier().container_avro_schema_family_name,
-            schema_name=cls.get_container_schema_matching_identifier().container_avro_schema_name)
+        try:
+            return _avro_schema_record_by_container_class[cls]
+        except KeyError:
+            pass
+
+        container_schema_matching_identifier = cls.get_container_schema_matching_identifier()
+        avro_schema_record = \
+            AvroMessageSchemaFrozen.avro_schema_collection.get_matching_schema_record_by_family_and_name(
+                schema_family=container_schema_matching_identifier.container_avro_schema_family_name,
+                schema_name=container_schema_matching_identifier.container_avro_schema_name)
+        _avro_schema_record_by_container_class[cls] = avro_schema_record
+        return avro_schema_record
+
+    #  Containers are built per message, so the logger is created once per class rather than per instance
+    #  Always guard debug output with is_debug_enabled - it is off by default and formatting a container
+    #  (especially one with attachments) is expensive
+    @classmethod
+    def get_logger(cls) -> EmeraldLogger:
+        try:
+            return _emerald_logger_by_container_class[cls]
+        except KeyError:
+            pass
+
+        container_logger = EmeraldLogger(logging_module_name=cls.__name__)
+        _emerald_logger_by_container_class[cls] = container_logger
+        return container_logger
+
+    #
+    #  The backend encoding and decoding each datum - all backends produce identical bytes, so this only affects
+    #  speed.  It applies to all container classes, for both writing and reading
+    #
+    @staticmethod
+    def get_serialization_backend() -> AbstractAvroSerializationBackend:
+        return _avro_serialization_backend
+
+    @staticmethod
+    def set_serialization_backend(avro_serialization_backend: AbstractAvroSerializationBackend):
+        global _avro_serialization_backend
+        if not isinstance(avro_serialization_backend, AbstractAvroSerializationBackend):
+            raise TypeError('Caller must provide an object extending ' + AbstractAvroSerializationBackend.__name__ +
+                            ' to set the serialization backend' +
+                            os.linesep + 'Type provided = ' + type(avro_serialization_backend).__name__)
+        _avro_serialization_backend = avro_serialization_backend
 
     def _get_container_parameters(self):
         return self._container_parameters
@@ -85,42 +219,154 @@ class AbstractContainer(metaclass=ABCMeta):
 
     # The implementing classes will use this write_avro and set their data_dictionary based on parameters
     #  Then they will call _write_avro_data to keep one implementation
+    #  codec_configuration_record selects block compression - None writes uncompressed as before
     @abstractmethod
     def write_avro(self,
-                   avro_container_uri: str):
+                   avro_container_uri: str,
+                   codec_configuration_record: Optional[AvroCodecConfigurationRecord] = None):
         pass
 
+    #  the schema this container's get_as_dict data follows - override only where it depends on the instance
+    def get_avro_schema_record_for_data(self) -> AvroMessageSchemaRecord:
+        return type(self).get_avro_schema_record()
+
+    #  every schema a serialized instance of this class may have been written with (used to match fingerprints)
+    @classmethod
+    def get_avro_schema_record_candidates(cls) -> List[AvroMessageSchemaRecord]:
+        return [cls.get_avro_schema_record()]
+
+    def _check_avro_data_to_write(self,
+                                  data_as_dictionary: Dict[str, Any],
+                                  avro_schema_record: Optional[AvroMessageSchemaRecord],
+                                  codec_configuration_record: Optional[AvroCodecConfigurationRecord]) \
+            -> AvroMessageSchemaRecord:
+        if type(data_as_dictionary) is not dict:
+            raise EmeraldMessageSerializationError(
+                'Unable to write avro - data_dictionary parameter is incorrect type ("' +
+                type(data_as_dictionary).__name__ + os.linesep + 'Should be a dictionary of k,v data pairs'
+            )
+        if codec_configuration_record is not None:
+            try:
+                AvroDataFileWriter.validate_codec_configuration_record(codec_configuration_record)
+            except ValueError as vex:
+                raise EmeraldMessageSerializationError('Unable to write avro - ' + str(vex))
+        if avro_schema_record is None:
+            avro_schema_record = self.get_avro_schema_record_for_data()
+
+        container_logger = type(self).get_logger()
+        if container_logger.is_debug_enabled:
+            container_logger.logger.debug('Avro schema type = ' + str(type(avro_schema_record.avro_schema)))
+            container_logger.logger.debug('Avro schema = ' + str(avro_schema_record.avro_schema))
+        return avro_schema_record
+
+    def _raise_avro_type_error(self,
+                               iex: AvroTypeException):
+        raise EmeraldMessageSerializationError(
+            'Unable to serialize object of type ' +
+            type(self).__name__ + ' due to data mismatch in Avro schema' +
+            os.linesep + 'Error info: ' + str(iex.args[0]))
+
+    # writes one complete AVRO object container file (header and a single datum) to the open binary stream
+    def _write_avro_data_file(self,
+                              writer_fp,
+                              data_as_dictionary: Dict[str, Any],
+                              avro_schema_record: AvroMessageSchemaRecord,
+                              codec_configuration_record: Optional[AvroCodecConfigurationRecord]):
+        writer = AvroDataFileWriter(writer_fp,
+                                    _avro_serialization_backend.get_datum_writer(avro_schema_record.avro_schema),
+                                    avro_schema_record.avro_schema,
+                                    codec_configuration_record=codec_configuration_record)
+        if type(self).get_logger().is_debug_enabled:
+            type(self).get_logger().logger.debug('Opened data file write')
+        try:
+            writer.append(data_as_dictionary)
+        except AvroTypeException as iex:
+            self._raise_avro_type_error(iex)
+        # flushes the block without closing the stream, so in-memory streams can still be read
+        writer.flush()
+
+    #  avro_schema_record defaults to the record for this class - pass one only if the data follows another schema
     def _write_avro_data(self,
                          avro_container_uri: str,
-                         data_as_dictionary: Dict[str, Any]):
+                         data_as_dictionary: Dict[str, Any],
+                         avro_schema_record: Optional[AvroMessageSchemaRecord] = None,
+                         codec_configuration_record: Optional[AvroCodecConfigurationRecord] = None):
         if type(avro_container_uri) is not str or len(avro_container_uri) == 0:
             raise EmeraldMessageSerializationError(
                 'Unable to write avro - avro_container_uri parameter' +
                 ' must be a string specifying container location in writable form')
-        if type(data_as_dictionary) is not dict:
-            raise EmeraldMessageSerializationError(
-                'Unable to write avro - data_dictionary parameter is incorrect type ("' +
-                type(data_as_dictionary).__name__ + os.linesep + 'Should be a dictionary of k,v data pairs'
-            )
-        if self.debug:
-            print('Avro schema type = ' + str(type(type(self).get_avro_schema_record().avro_schema)))
-            print('Avro schema = ' + str(type(self).get_avro_schema_record().avro_schema))
+        avro_schema_record = self._check_avro_data_to_write(data_as_dictionary=data_as_dictionary,
+                                                            avro_schema_record=avro_schema_record,
+                                                            codec_configuration_record=codec_configuration_record)
 
         with open(avro_container_uri, "wb") as writer_fp:
-            with DataFileWriter(writer_fp,
-                                DatumWriter(),
-                                type(self).get_avro_schema_record().avro_schema) as writer:
-                if self.debug:
-                    print('Opened data file write')
-                try:
-                    writer.append(data_as_dictionary)
-                except AvroTypeException as iex:
-                    raise EmeraldMessageSerializationError(
-                        'Unable to serialize object of type ' +
-                        type(self).__name__ + ' due to data mismatch in Avro schema' +
-                        os.linesep + 'Error info: ' + str(iex.args[0]))
+            self._write_avro_data_file(writer_fp,
+                                       data_as_dictionary=data_as_dictionary,
+                                       avro_schema_record=avro_schema_record,
+                                       codec_configuration_record=codec_configuration_record)
         return
 
+    #
+    #  Serialize to bytes in memory rather than to a file, for example to put a container on a message queue
+    #   single_object_encoding False - the bytes are exactly what write_avro would put in a file (schema included)
+    #   single_object_encoding True - Avro single object encoding: a 10 byte header carrying the schema
+    #       fingerprint, then the datum.  Much smaller, but the reader must know the schema (see from_avro_bytes)
+    #  Compression applies only to the file layout, which is the only one with blocks
+    #
+    def _to_avro_bytes_for_data(self,
+                                data_as_dictionary: Dict[str, Any],
+                                avro_schema_record: Optional[AvroMessageSchemaRecord] = None,
+                                single_object_encoding: bool = False,
+                                codec_configuration_record: Optional[AvroCodecConfigurationRecord] = None) -> bytes:
+        if single_object_encoding and codec_configuration_record is not None:
+            raise EmeraldMessageSerializationError(
+                'Unable to write avro - compression is not available with single object encoding')
+        avro_schema_record = self._check_avro_data_to_write(data_as_dictionary=data_as_dictionary,
+                                                            avro_schema_record=avro_schema_record,
+                                                            codec_configuration_record=codec_configuration_record)
+
+        avro_stream = io.BytesIO()
+        if not single_object_encoding:
+            self._write_avro_data_file(avro_stream,
+                                       data_as_dictionary=data_as_dictionary,
+                                       avro_schema_record=avro_schema_record,
+                                       codec_configuration_record=codec_configuration_record)
+            return avro_stream.getvalue()
+
+        avro_stream.write(get_avro_single_object_encoding_header(avro_schema_record.avro_schema))
+        try:
+            _avro_serialization_backend.get_datum_writer(avro_schema_record.avro_schema).write(
+                data_as_dictionary, BinaryEncoder(avro_stream))
+        except AvroTypeException as iex:
+            self._raise_avro_type_error(iex)
+        return avro_stream.getvalue()
+
+    def to_avro_bytes(self,
+                      single_object_encoding: bool = False,
+                      codec_configuration_record: Optional[AvroCodecConfigurationRecord] = None) -> bytes:
+        return self._to_avro_bytes_for_data(data_as_dictionary=self.get_as_dict(),
+                                            single_object_encoding=single_object_encoding,
+                                            codec_configuration_record=codec_configuration_record)
+
+    #
+    #  Write many containers of this class into a single AVRO file (or a rotating series of files) instead of
+    #  one file per container.  Returns the list of files written.  See ContainerBatchWriterConfigurationRecord
+    #  for block size and rotation options
+    #
+    @classmethod
+    def write_avro_batch(cls,
+                         container_iterable: Iterable['AbstractContainer'],
+                         avro_container_uri: str,
+                         batch_writer_configuration_record: Optional[Any] = None) -> List[str]:
+        # imported here as the batch writer module depends on this one
+        from emerald_message.containers.container_batch_writer import ContainerBatchWriter
+
+        with ContainerBatchWriter(container_class=cls,
+                                  avro_container_uri=avro_container_uri,
+                                  configuration_record=batch_writer_configuration_record) as batch_writer:
+            batch_writer.extend(container_iterable)
+        return batch_writer.written_avro_container_uri_list
+
     #
     # DET NOTE - implementing classes will get back the datum by calling _from_avro_generic and populating
     #  we could implement a more abstract version that initializes using getattr and setattr but
@@ -136,41 +382,156 @@ class AbstractContainer(metaclass=ABCMeta):
     def from_avro_as_dict(avro_parameter_dict: Dict):
         pass
 
+    #
+    #  Lazily yield the raw datum dictionaries from an AVRO file one at a time - the file is read block by block
+    #  so memory use does not depend on the size of the file.  skip / limit select a window of records
+    #  (skipped records still have to be decoded, but no containers are built for them)
+    #
+    @staticmethod
+    def _iter_avro_generic(avro_container_uri: str,
+                           skip: int = 0,
+                           limit: Optional[int] = None) -> Iterator[Dict]:
+        if type(avro_container_uri) is not str or len(avro_container_uri) == 0:
+            raise EmeraldMessageDeserializationError(
+                'Unable to read avro - avro_container_uri parameter' +
+                ' must be a string specifying container location in readable form')
+        if type(skip) is not int or skip < 0:
+            raise EmeraldMessageDeserializationError(
+                'Unable to read avro - skip must be a non-negative integer' +
+                os.linesep + 'Value provided = ' + str(skip))
+        if limit is not None and (type(limit) is not int or limit < 0):
+            raise EmeraldMessageDeserializationError(
+                'Unable to read avro - limit must be None or a non-negative integer' +
+                os.linesep + 'Value provided = ' + str(limit))
+
+        with open(avro_container_uri, "rb") as avro_fp:
+            with DataFileReader(avro_fp, _avro_serialization_backend.get_datum_reader()) as reader:
+                yield from itertools.islice(reader, skip, None if limit is None else skip + limit)
+
+    #
+    #  Generator returning one container per datum in the file - use this for multi-record files such as those
+    #  written by write_avro_batch
+    #
+    @classmethod
+    def iter_from_avro(cls,
+                       avro_container_uri: str,
+                       skip: int = 0,
+                       limit: Optional[int] = None) -> Iterator['AbstractContainer']:
+        for datum in cls._iter_avro_generic(avro_container_uri=avro_container_uri,
+                                            skip=skip,
+                                            limit=limit):
+            yield cls.from_avro_as_dict(datum)
+
+    #
+    #  Generator returning only the named fields of each datum, as tuples (or dictionaries with as_dict) - no
+    #  containers are built and fields off the paths, such as attachment contents, are skipped rather than decoded.
+    #  See avro_projection_reader for the field path syntax
+    #
+    @classmethod
+    def iter_projection_from_avro(cls,
+                                  avro_container_uri: str,
+                                  field_paths: List[str],
+                                  skip: int = 0,
+                                  limit: Optional[int] = None,
+                                  as_dict: bool = False) -> Iterator:
+        yield from iter_avro_projection(avro_container_uri=avro_container_uri,
+                                        field_paths=field_paths,
+                                        skip=skip,
+                                        limit=limit,
+                                        as_dict=as_dict,
+                                        avro_serialization_backend=_avro_serialization_backend)
+
     @staticmethod
     def _from_avro_generic(
             avro_container_uri: str,
     ):
-        datum_counter = 0
-        datum_to_return = None
-        # DET TODO add other exception handling around the double with clause
-        with open(avro_container_uri, "rb") as avro_fp:
-            with DataFileReader(avro_fp, DatumReader()) as reader:
-                #
-                #  This static meethod can only initialize one datum in the file - scan through and raise
-                #  error if more than one found
-                #  Not sure if there is lazy access to the datum - if so returning the datum to caller
-                #  for subsequent loading would be problematic
-                #
-                for datum_counter, datum in enumerate(reader, start=1):
-                    print('Reading datum #' + str(datum_counter))
-                    print('The message datum = ' + str(datum))
-                    if datum_counter == 1:
-                        datum_to_return = datum
-
-        if datum_counter > 1:
+        #
+        #  This static method can only initialize one datum in the file - we read at most two datums so
+        #  that we can raise an error if more than one is present without scanning the rest of the file
+        #  Use iter_from_avro for files holding many datums
+        #
+        datum_list = list(AbstractContainer._iter_avro_generic(avro_container_uri=avro_container_uri,
+                                                               limit=2))
+
+        if len(datum_list) > 1:
             raise EmeraldMessageDeserializationError(
                 'Unable to deserialize from AVRO container "' +
                 avro_container_uri + '" - this deserializer can only have one datum per file' +
-                os.linesep + 'Total element count in this file = ' + str(datum_counter))
+                os.linesep + 'Use iter_from_avro to read files containing more than one datum')
 
-        if datum_to_return is None:
+        if len(datum_list) == 0:
             raise EmeraldMessageDeserializationError(
                 'Data could not be loaded from AVRO file "' + str(avro_container_uri) +
-                '" using schema ' + AbstractContainer.get_avro_schema_record().avro_schema_name)
+                '" - no datum found in file')
+
+        return datum_list[0]
+
+    #
+    #  Reads the datum back from to_avro_bytes output in either layout (told apart by the leading magic bytes).
+    #  avro_bytes may be any bytes-like object - a memoryview or mmap is read in place, not copied
+    #  Single object encoded data must carry the fingerprint of one of get_avro_schema_record_candidates()
+    #
+    @classmethod
+    def _from_avro_bytes_generic(cls,
+                                 avro_bytes) -> Dict:
+        try:
+            avro_bytes_reader = AvroBytesReader(avro_bytes)
+        except TypeError:
+            raise EmeraldMessageDeserializationError(
+                'Unable to read avro - avro_bytes must be a bytes-like object' +
+                os.linesep + 'Type provided = ' + type(avro_bytes).__name__)
+
+        leading_bytes = avro_bytes_reader.read(len(AVRO_DATA_FILE_MAGIC))
+        if leading_bytes == AVRO_DATA_FILE_MAGIC:
+            avro_bytes_reader.seek(0)
+            with DataFileReader(avro_bytes_reader, _avro_serialization_backend.get_datum_reader()) as reader:
+                datum_list = list(itertools.islice(reader, 2))
+            if len(datum_list) != 1:
+                raise EmeraldMessageDeserializationError(
+                    'Unable to deserialize ' + cls.__name__ + ' from AVRO bytes - expected exactly one datum' +
+                    os.linesep + 'Datum count found = ' + (str(len(datum_list)) if len(datum_list) < 2 else '2+'))
+            return datum_list[0]
+
+        if leading_bytes[:len(AVRO_SINGLE_OBJECT_ENCODING_MARKER)] != AVRO_SINGLE_OBJECT_ENCODING_MARKER or \
+                avro_bytes_reader.length < AVRO_SINGLE_OBJECT_ENCODING_HEADER_SIZE_BYTES:
+            raise EmeraldMessageDeserializationError(
+                'Unable to deserialize ' + cls.__name__ + ' from AVRO bytes - data is neither an AVRO file ' +
+                'nor single object encoded' + os.linesep + 'Leading bytes = ' + leading_bytes.hex())
+
+        avro_bytes_reader.seek(len(AVRO_SINGLE_OBJECT_ENCODING_MARKER))
+        avro_schema_fingerprint = avro_bytes_reader.read(AVRO_SINGLE_OBJECT_ENCODING_HEADER_SIZE_BYTES -
+                                                         len(AVRO_SINGLE_OBJECT_ENCODING_MARKER))
+        try:
+            avro_schema_record = \
+                AvroMessageSchemaFrozen.avro_schema_collection.get_matching_schema_record_by_fingerprint(
+                    avro_schema_fingerprint)
+        except EmeraldSchemaParsingException as spex:
+            raise EmeraldMessageDeserializationError(
+                'Unable to deserialize ' + cls.__name__ + ' from AVRO bytes' + os.linesep + str(spex.args[0]))
+        if (avro_schema_record.avro_schema_family_name, avro_schema_record.avro_schema_name) not in \
+                [(x.avro_schema_family_name, x.avro_schema_name) for x in cls.get_avro_schema_record_candidates()]:
+            raise EmeraldMessageDeserializationError(
+                'Unable to deserialize ' + cls.__name__ + ' from AVRO bytes - data was written with schema "' +
+                avro_schema_record.avro_schema.fullname + '" which does not belong to the class')
+
+        datum_reader = _avro_serialization_backend.get_datum_reader()
+        datum_reader.writer_schema = avro_schema_record.avro_schema
+        try:
+            datum = datum_reader.read(BinaryDecoder(avro_bytes_reader))
+        except (AssertionError, IndexError, TypeError, ValueError, UnicodeDecodeError) as dex:
+            raise EmeraldMessageDeserializationError(
+                'Unable to deserialize ' + cls.__name__ + ' from AVRO bytes - datum is truncated or corrupt' +
+                os.linesep + 'Error info: ' + str(dex))
+        if avro_bytes_reader.position != avro_bytes_reader.length:
+            raise EmeraldMessageDeserializationError(
+                'Unable to deserialize ' + cls.__name__ + ' from AVRO bytes - ' +
+                str(avro_bytes_reader.length - avro_bytes_reader.position) + ' unread byte(s) follow the datum')
+        return datum
 
-        print('Length of datum to return = ' + str(datum_to_return))
-        print('Type of data  to return = ' + str(type(datum_to_return)))
-        return datum_to_return
+    @classmethod
+    def from_avro_bytes(cls,
+                        avro_bytes) -> 'AbstractContainer':
+        return cls.from_avro_as_dict(cls._from_avro_bytes_generic(avro_bytes))
 
     @classmethod
     @abstractmethod
@@ -182,54 +543,97 @@ class AbstractContainer(metaclass=ABCMeta):
     def _get_container_parameters_required_subclass_type(cls):
         pass
 
+    #
+    #  The checks on the class contract - a valid ContainerSchemaMatchingIdentifier and parameters type - depend only
+    #  on the class, so they run on the first construction of each class and the result is kept.  These checks
+    #  really happen after the fact but we provide just in case there are problems with a class not implementing
+    #  one of the required methods - if someone literally sets the wrong kind of object in the class contract such
+    #  as get_container_schema_matching_identifier, these errors will trip and halt further initialization
+    #
+    @classmethod
+    def _get_validated_container_parameters_type(cls) -> type:
+        try:
+            return _container_parameters_type_by_container_class[cls]
+        except KeyError:
+            pass
+
+        container_schema_matching_identifier = cls.get_container_schema_matching_identifier()
+        if not isinstance(container_schema_matching_identifier, ContainerSchemaMatchingIdentifier):
+            raise EmeraldMessageContainerInitializationError(
+                'Caller must provide the value for ' + ContainerSchemaMatchingIdentifier.__name__ +
+                ' in order to identify the proper AVRO schema for the container')
+
+        if type(container_schema_matching_identifier.container_avro_schema_name) is not str or \
+                len(container_schema_matching_identifier.container_avro_schema_name) == 0:
+            raise EmeraldMessageContainerInitializationError(
+                'Caller must provide a valid name corresponding to a name property in a defined AVRO' +
+                ' schema that corresponds to this container')
+
+        container_parameters_type = cls._get_container_parameters_required_subclass_type()
+        _container_parameters_type_by_container_class[cls] = container_parameters_type
+        return container_parameters_type
+
+    #  state the implementing class derives from its parameters (cached digests, lazily built indexes) - set up by
+    #  the implementing class's constructor once its own checks pass, and by _from_trusted_container_parameters
+    def _initialize_derived_state(self):
+        pass
+
+    #
+    #  Constructor for deserialization and other trusted paths: the parameters are known to be of the right type
+    #  and to hold valid values (AVRO data has already been checked against the schema), so none of the checks in
+    #  the constructors are repeated and nothing is logged - only the derived state is set up.  Never use it for
+    #  parameters that come from callers
+    #
+    @classmethod
+    def _from_trusted_container_parameters(cls,
+                                           container_parameters: ContainerParameters,
+                                           debug: bool = False) -> 'AbstractContainer':
+        container = cls.__new__(cls)
+        container._container_parameters = container_parameters
+        container._debug = debug
+        container._canonical_key = None
+        container._canonical_digest = None
+        container._initialize_derived_state()
+        return container
+
     def __init__(self,
                  container_parameters: ContainerParameters,
                  debug: bool = False):
-
-        # The implementing class must determine the namespace for the schema corresponding to this
-        #  This checking really happens after the fact but we provide just in case there are problems
-        #  with a class not implementing one of the required methods
-        #
-        #  There is still limited use for it - if someone literally sets the wrong kind of object in the
-        #  class contract such as get_container_schema_matching_identifier, these errors will trip and halt
-        #  further initialization
         #
-        #  For this container parameters, our implementation will be different in each class, but we at leeast
-        #  know it is a named tuple
+        #  For this container parameters, our implementation will be different in each class, but we at least
+        #  know it is a dataclass extending ContainerParameters.  Here we make sure that the container parameters
+        #  passed in is the correct type to avoid odd initialization errors
         #
-        if not isinstance(container_parameters, ContainerParameters):
-            raise EmeraldMessageContainerInitializationError(
-                'Caller must provide value for container_parameters ' +
-                'as an object extending the class "' +
-                ContainerParameters.__name__ + os.linesep +
-                '" Type provided was ' +
-                type(container_parameters).__name__)
-        # here we make sure that the container parameters passed in is the correct type to avoid odd
-        #  initialization errors
-        if type(container_parameters) != type(self)._get_container_parameters_required_subclass_type():
+        container_parameters_type = _container_parameters_type_by_container_class.get(type(self))
+        if container_parameters_type is None:
+            container_parameters_type = type(self)._get_validated_container_parameters_type()
+
+        if type(container_parameters) is not container_parameters_type:
+            if not isinstance(container_parameters, ContainerParameters):
+                raise EmeraldMessageContainerInitializationError(
+                    'Caller must provide value for container_parameters ' +
+                    'as an object extending the class "' +
+                    ContainerParameters.__name__ + os.linesep +
+                    '" Type provided was ' +
+                    type(container_parameters).__name__)
             raise EmeraldMessageContainerInitializationError(
                 'Initialization parameter container_parameters is ' +
                 'of wrong type for class ' + type(self).__name__ +
                 os.linesep + 'Parameter type = ' +
                 str(type(container_parameters)) +
                 os.linesep + 'Required type = ' +
-                str(type(self)._get_container_parameters_required_subclass_type()) +
+                str(container_parameters_type) +
                 os.linesep + 'Check implementation of method ' +
                 type(self)._get_container_parameters_required_subclass_type.__name__ +
                 os.linesep + 'and verify initialization in class ' + type(self).__name__ + ' is correct')
 
         self._container_parameters = container_parameters
-
-        if not isinstance(type(self).get_container_schema_matching_identifier(), ContainerSchemaMatchingIdentifier):
-            raise EmeraldMessageContainerInitializationError(
-                'Caller must provide the value for ' + ContainerSchemaMatchingIdentifier.__name__ +
-                ' in order to identify the proper AVRO schema for the container')
-
-        if type(type(self).get_container_schema_matching_identifier().container_avro_schema_name) is not str or \
-                len(type(self).get_container_schema_matching_identifier().container_avro_schema_name) == 0:
-            raise EmeraldMessageContainerInitializationError(
-                'Caller must provide a valid name corresponding to a name property in a defined AVRO' +
-                ' schema that corresponds to this container')
-
-        print('Initialized the avro schema record to ' + str(type(self).get_avro_schema_record()))
         self._debug = debug
+        self._canonical_key = None
+        self._canonical_digest = None
+
+        container_logger = type(self).get_logger()
+        if container_logger.is_debug_enabled:
+            container_logger.logger.debug('initializing with ' + str(container_parameters))
+            container_logger.logger.debug('Initialized the avro schema record to ' +
+                                          str(type(self).get_avro_schema_record()))
@@ -0,0 +1,93 @@
+import os
+from dataclasses import dataclass
+from typing import Iterator, Tuple
+
+from avro.datafile import DataFileReader, SYNC_SIZE
+
+from emerald_message.error import EmeraldMessageDeserializationError
+
+'''
+Where a datum sits in an AVRO object container file
+    block_offset: file offset of the block holding the datum - the byte just after the sync marker that precedes
+        it (the header ends with the sync marker as well, so every block is preceded by one)
+    record_position: index of the datum within its block
+'''
+
+
+@dataclass(frozen=True)
+class AvroRecordLocation:
+    block_offset: int
+    record_position: int
+
+
+#
+#  DataFileReader that reports the location of each datum it yields and can seek straight to a block:
+#       with AvroBlockDataFileReader(avro_fp, datum_reader) as reader:
+#           for record_location, datum in reader.iter_with_locations():
+#               ...
+#           datum = reader.read_record_at(record_location)
+#  Seeking checks the sync marker in front of the block, so a location from a different (or rewritten) file is
+#  rejected rather than decoded as garbage.  Only the datums of the one block are decoded, never the blocks before
+#
+#  DET NOTE - like AvroDataFileWriter this uses the internals of the avro library's DataFileReader (_block_count,
+#  _read_block_header) in avro-python3 1.9 and 1.10 - recheck this class if the avro dependency is upgraded
+#
+class AvroBlockDataFileReader(DataFileReader):
+    @property
+    def current_block_offset(self) -> int:
+        return self._current_block_offset
+
+    def _read_block_header(self):
+        self._current_block_offset = self.reader.tell()
+        self._next_record_position = 0
+        super(AvroBlockDataFileReader, self)._read_block_header()
+
+    def __next__(self):
+        datum = super(AvroBlockDataFileReader, self).__next__()
+        self._next_record_position += 1
+        return datum
+
+    def iter_with_locations(self) -> Iterator[Tuple[AvroRecordLocation, object]]:
+        for datum in self:
+            yield AvroRecordLocation(block_offset=self._current_block_offset,
+                                     record_position=self._next_record_position - 1), datum
+
+    def seek_to_block(self,
+                      block_offset: int):
+        if type(block_offset) is not int or block_offset < SYNC_SIZE or block_offset >= self.file_length:
+            raise EmeraldMessageDeserializationError(
+                'Unable to seek AVRO file - block offset ' + str(block_offset) + ' is outside the file' +
+                os.linesep + 'File length = ' + str(self.file_length))
+        self.reader.seek(block_offset - SYNC_SIZE)
+        if self.reader.read(SYNC_SIZE) != self.sync_marker:
+            raise EmeraldMessageDeserializationError(
+                'Unable to seek AVRO file - no sync marker precedes block offset ' + str(block_offset) +
+                os.linesep + 'The location does not belong to this file')
+        # the next read starts a new block - back up so the sync marker check in __next__ consumes the marker
+        self.reader.seek(block_offset - SYNC_SIZE)
+        self._block_count = 0
+
+    # locations given in file order are read without seeking back - later records of the current block are
+    #  reached by reading on
+    def read_record_at(self,
+                       record_location: AvroRecordLocation):
+        if self._current_block_offset != record_location.block_offset or \
+                self._next_record_position > record_location.record_position:
+            self.seek_to_block(record_location.block_offset)
+        while True:
+            try:
+                datum = next(self)
+            except StopIteration:
+                datum = None
+            # running out of the block means the record position does not exist
+            if datum is None or self._current_block_offset != record_location.block_offset:
+                raise EmeraldMessageDeserializationError(
+                    'Unable to read AVRO file - block at offset ' + str(record_location.block_offset) +
+                    ' has no record at position ' + str(record_location.record_position))
+            if self._next_record_position > record_location.record_position:
+                return datum
+
+    def __init__(self, reader, datum_reader):
+        self._current_block_offset = 0
+        self._next_record_position = 0
+        super(AvroBlockDataFileReader, self).__init__(reader, datum_reader)
@@ -0,0 +1,57 @@
+import io
+
+
+#
+#  Read-only file object over any bytes-like value (bytes, bytearray, memoryview, mmap) for the avro library's
+#  DataFileReader and BinaryDecoder.  io.BytesIO copies everything except a bytes object on construction; this
+#  keeps a memoryview instead, so only the pieces actually read are copied out
+#
+class AvroBytesReader(io.RawIOBase):
+    @property
+    def position(self) -> int:
+        return self._position
+
+    @property
+    def length(self) -> int:
+        return len(self._buffer)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        start = self._position
+        end = len(self._buffer) if size is None or size < 0 else min(start + size, len(self._buffer))
+        self._position = max(start, end)
+        return self._buffer[start:end].tobytes()
+
+    def readinto(self, target) -> int:
+        chunk = self.read(len(target))
+        target[:len(chunk)] = chunk
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            new_position = offset
+        elif whence == io.SEEK_CUR:
+            new_position = self._position + offset
+        elif whence == io.SEEK_END:
+            new_position = len(self._buffer) + offset
+        else:
+            raise ValueError('Invalid whence value ' + str(whence))
+        if new_position < 0:
+            raise ValueError('Negative seek position ' + str(new_position))
+        self._position = new_position
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def __init__(self,
+                 avro_bytes,
+                 position: int = 0):
+        super(AvroBytesReader, self).__init__()
+        self._buffer = memoryview(avro_bytes).cast('B')
+        self._position = position
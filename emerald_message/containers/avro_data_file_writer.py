@@ -0,0 +1,156 @@
+import bz2
+import lzma
+import zlib
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Tuple
+from avro.datafile import DataFileWriter, SYNC_INTERVAL, NULL_CODEC, DEFLATE_CODEC, BZIP2_CODEC, XZ_CODEC, \
+    VALID_CODECS
+
+# snappy and zstandard are only offered by the avro library when their packages are installed
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZSTANDARD_CODEC = 'zstandard'
+
+# inclusive range of compression_level accepted for each codec that supports levels
+_COMPRESSION_LEVEL_RANGE_BY_CODEC: Dict[str, Tuple[int, int]] = {
+    DEFLATE_CODEC: (0, 9),
+    BZIP2_CODEC: (1, 9),
+    XZ_CODEC: (0, 9),
+    ZSTANDARD_CODEC: (1, 22)
+}
+
+
+'''
+Block compression for AVRO object container files
+    codec: one of get_available_avro_codecs() - null, deflate, bzip2 and xz always, snappy and zstandard when the
+        python-snappy / zstandard packages are installed
+    compression_level: None for the library default, otherwise deflate 0-9, bzip2 1-9, xz 0-9, zstandard 1-22
+        (snappy and null have no levels)
+Readers need nothing extra - the codec is recorded in the file header
+'''
+
+
+@dataclass(frozen=True)
+class AvroCodecConfigurationRecord:
+    codec: str = NULL_CODEC
+    compression_level: Optional[int] = None
+
+
+def get_available_avro_codecs() -> FrozenSet[str]:
+    return frozenset(VALID_CODECS)
+
+
+#
+#  The stock DataFileWriter from the avro library only cuts a block when its in-memory buffer crosses the module
+#  level SYNC_INTERVAL constant, which we cannot vary per file, and always compresses at the default level of the
+#  codec.  This thin extension lets the caller choose the block size (in bytes of encoded data) and the compression
+#  level, and exposes the size of the file including anything still buffered so that callers can decide when to
+#  rotate to a new file.
+#
+#  DET NOTE - this relies on the same internal attributes (_block_count, _buffer_writer, _WriteBlock) used by
+#  DataFileWriter itself in avro-python3 1.9 and 1.10 - recheck this class if the avro dependency is upgraded
+#
+class AvroDataFileWriter(DataFileWriter):
+    @property
+    def block_size_bytes(self) -> int:
+        return self._block_size_bytes
+
+    @property
+    def codec_configuration_record(self) -> AvroCodecConfigurationRecord:
+        return self._codec_configuration_record
+
+    @property
+    def pending_block_size_bytes(self) -> int:
+        return self.buffer_encoder.writer.tell()
+
+    @property
+    def estimated_file_size_bytes(self) -> int:
+        # bytes already flushed to the underlying file plus the encoded (but uncompressed) pending block
+        return self.writer.tell() + self.pending_block_size_bytes
+
+    def _compress_block_at_level(self,
+                                 uncompressed_data: bytes) -> bytes:
+        codec = self._codec_configuration_record.codec
+        compression_level = self._codec_configuration_record.compression_level
+        if codec == DEFLATE_CODEC:
+            # raw deflate stream as the avro specification requires - no zlib header or trailer
+            compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+            return compressor.compress(uncompressed_data) + compressor.flush()
+        if codec == BZIP2_CODEC:
+            return bz2.compress(uncompressed_data, compresslevel=compression_level)
+        if codec == XZ_CODEC:
+            return lzma.compress(uncompressed_data, preset=compression_level)
+        return zstandard.ZstdCompressor(level=compression_level).compress(uncompressed_data)
+
+    # same block layout as DataFileWriter._WriteBlock - only the compressor call differs
+    def _WriteBlock(self):
+        if self._codec_configuration_record.compression_level is None:
+            super(AvroDataFileWriter, self)._WriteBlock()
+            return
+
+        if not self._header_written:
+            self._WriteHeader()
+
+        if self.block_count <= 0:
+            return
+
+        self.encoder.write_long(self.block_count)
+        compressed_data = self._compress_block_at_level(self._buffer_writer.getvalue())
+        self.encoder.write_long(len(compressed_data))
+        self.writer.write(compressed_data)
+        self.writer.write(self.sync_marker)
+
+        self._buffer_writer.seek(0)
+        self._buffer_writer.truncate()
+        self._block_count = 0
+
+    def append(self, datum):
+        self.datum_writer.write(datum, self.buffer_encoder)
+        self._block_count += 1
+
+        if self.pending_block_size_bytes >= self._block_size_bytes:
+            self._WriteBlock()
+
+    @staticmethod
+    def validate_codec_configuration_record(codec_configuration_record: AvroCodecConfigurationRecord):
+        if not isinstance(codec_configuration_record, AvroCodecConfigurationRecord):
+            raise ValueError('Caller must provide codec_configuration_record as ' +
+                             AvroCodecConfigurationRecord.__name__ +
+                             ' - type provided = ' + type(codec_configuration_record).__name__)
+        codec = codec_configuration_record.codec
+        if codec not in VALID_CODECS:
+            raise ValueError('Codec "' + str(codec) + '" is not available - choose from ' +
+                             ','.join(sorted(VALID_CODECS)))
+        compression_level = codec_configuration_record.compression_level
+        if compression_level is None:
+            return
+        if codec not in _COMPRESSION_LEVEL_RANGE_BY_CODEC:
+            raise ValueError('Codec "' + codec + '" does not support a compression level' +
+                             ' - value provided = ' + str(compression_level))
+        level_minimum, level_maximum = _COMPRESSION_LEVEL_RANGE_BY_CODEC[codec]
+        if type(compression_level) is not int or not level_minimum <= compression_level <= level_maximum:
+            raise ValueError('Compression level for codec "' + codec + '" must be an integer from ' +
+                             str(level_minimum) + ' to ' + str(level_maximum) +
+                             ' - value provided = ' + str(compression_level))
+
+    def __init__(self,
+                 writer,
+                 datum_writer,
+                 writer_schema=None,
+                 codec_configuration_record: Optional[AvroCodecConfigurationRecord] = None,
+                 block_size_bytes: int = SYNC_INTERVAL):
+        if type(block_size_bytes) is not int or block_size_bytes <= 0:
+            raise ValueError('Caller must provide block_size_bytes as a positive integer' +
+                             ' - value provided = ' + str(block_size_bytes))
+        if codec_configuration_record is None:
+            codec_configuration_record = AvroCodecConfigurationRecord()
+        type(self).validate_codec_configuration_record(codec_configuration_record)
+        self._block_size_bytes = block_size_bytes
+        self._codec_configuration_record = codec_configuration_record
+        super(AvroDataFileWriter, self).__init__(writer,
+                                                 datum_writer,
+                                                 writer_schema=writer_schema,
+                                                 codec=codec_configuration_record.codec)
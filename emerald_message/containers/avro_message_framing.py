@@ -0,0 +1,100 @@
+import os
+import inspect
+from typing import Dict, Type
+
+from emerald_message.avro_schemas.avro_message_schemas import AvroMessageSchemaFrozen
+from emerald_message.avro_schemas.avro_schema_fingerprint import get_avro_schema_fingerprint, \
+    AVRO_SINGLE_OBJECT_ENCODING_MARKER, AVRO_SINGLE_OBJECT_ENCODING_HEADER_SIZE_BYTES
+from emerald_message.containers.abstract_container import AbstractContainer
+from emerald_message.error import EmeraldMessageDeserializationError, EmeraldSchemaParsingException
+# imported so the email containers are known below without the caller importing each one
+# noinspection PyUnresolvedReferences
+import emerald_message.containers.email.email_container_v4
+
+#
+#  Schema-less framing for queue messages.  An AVRO file carries the full JSON schema of the container and every
+#  nested record, which for a small message is often bigger than the message.  A framed message carries only the
+#  8 byte fingerprint of the writer schema (Avro single object encoding, 10 bytes of header in all) and the reader
+#  resolves the schema - and the container class - from the fingerprints of the schemas this process loaded:
+#       framed_bytes = write_avro_message(email_container)
+#       email_container = read_avro_message(framed_bytes)
+#  Both sides must have the schema; a message written with a schema the reader does not have is rejected
+#
+
+# fingerprint to the container class that reads it - rebuilt when a fingerprint is missing, in case more container
+#  classes have been imported since
+_container_class_by_avro_schema_fingerprint: Dict[bytes, Type[AbstractContainer]] = {}
+
+
+def _get_concrete_container_classes():
+    container_class_list = []
+    pending_class_list = [AbstractContainer]
+    while len(pending_class_list) > 0:
+        container_class = pending_class_list.pop(0)
+        pending_class_list.extend(container_class.__subclasses__())
+        if not inspect.isabstract(container_class):
+            container_class_list.append(container_class)
+    return container_class_list
+
+
+def _build_container_class_by_avro_schema_fingerprint_index() -> Dict[bytes, Type[AbstractContainer]]:
+    container_class_list = _get_concrete_container_classes()
+    container_class_by_avro_schema_fingerprint = {}
+    # a class's own schema wins over one it only reads (an EmailAttachment stored as RAW is still an attachment)
+    for container_class in container_class_list:
+        container_class_by_avro_schema_fingerprint.setdefault(
+            get_avro_schema_fingerprint(container_class.get_avro_schema_record().avro_schema), container_class)
+    for container_class in container_class_list:
+        for avro_schema_record in container_class.get_avro_schema_record_candidates():
+            container_class_by_avro_schema_fingerprint.setdefault(
+                get_avro_schema_fingerprint(avro_schema_record.avro_schema), container_class)
+    return container_class_by_avro_schema_fingerprint
+
+
+def get_avro_message_fingerprint(avro_message_bytes) -> bytes:
+    avro_message_header = \
+        bytes(memoryview(avro_message_bytes).cast('B')[:AVRO_SINGLE_OBJECT_ENCODING_HEADER_SIZE_BYTES])
+    if len(avro_message_header) < AVRO_SINGLE_OBJECT_ENCODING_HEADER_SIZE_BYTES or \
+            not avro_message_header.startswith(AVRO_SINGLE_OBJECT_ENCODING_MARKER):
+        raise EmeraldMessageDeserializationError(
+            'Unable to read framed AVRO message - data does not start with the single object encoding header' +
+            os.linesep + 'Leading bytes = ' + avro_message_header.hex())
+    return avro_message_header[len(AVRO_SINGLE_OBJECT_ENCODING_MARKER):]
+
+
+def get_container_class_by_avro_schema_fingerprint(avro_schema_fingerprint: bytes) -> Type[AbstractContainer]:
+    global _container_class_by_avro_schema_fingerprint
+    try:
+        return _container_class_by_avro_schema_fingerprint[avro_schema_fingerprint]
+    except KeyError:
+        pass
+
+    _container_class_by_avro_schema_fingerprint = _build_container_class_by_avro_schema_fingerprint_index()
+    try:
+        return _container_class_by_avro_schema_fingerprint[avro_schema_fingerprint]
+    except KeyError:
+        pass
+
+    # say whether the schema is unknown altogether or just has no container
+    try:
+        avro_schema_record = \
+            AvroMessageSchemaFrozen.avro_schema_collection.get_matching_schema_record_by_fingerprint(
+                avro_schema_fingerprint)
+    except EmeraldSchemaParsingException as spex:
+        raise EmeraldMessageDeserializationError('Unable to read framed AVRO message' + os.linesep +
+                                                 str(spex.args[0]))
+    raise EmeraldMessageDeserializationError(
+        'Unable to read framed AVRO message - schema "' + avro_schema_record.avro_schema.fullname +
+        '" (fingerprint ' + avro_schema_fingerprint.hex() + ') is not read by any container class')
+
+
+def write_avro_message(container: AbstractContainer) -> bytes:
+    return container.to_avro_bytes(single_object_encoding=True)
+
+
+# keyword arguments go to the container's from_avro_bytes (for example attachment_store for EmailContainerV3)
+def read_avro_message(avro_message_bytes,
+                      **from_avro_bytes_kwargs) -> AbstractContainer:
+    container_class = get_container_class_by_avro_schema_fingerprint(
+        get_avro_message_fingerprint(avro_message_bytes))
+    return container_class.from_avro_bytes(avro_message_bytes, **from_avro_bytes_kwargs)
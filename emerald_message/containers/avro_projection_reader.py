@@ -0,0 +1,179 @@
+import os
+import itertools
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import avro.schema
+from avro.datafile import DataFileReader
+
+from emerald_message.containers.avro_serialization_backend import AbstractAvroSerializationBackend
+from emerald_message.error import EmeraldMessageDeserializationError
+
+'''
+A field path names one field of the datum by its record field names joined with '.', for example
+    email_envelope.address_from
+    email_message_metadata.email_sender_ip
+    email_attachment_collection.filename
+A path may run through unions (the branches that are records with that field; null stays null) and arrays of
+records (the value is then a list with one entry per array item).  A path ending on a record or array returns it
+whole
+'''
+FIELD_PATH_SEPARATOR = '.'
+
+_PROJECTION_RECORD_TYPES = frozenset(['record', 'error'])
+_PROJECTION_UNION_TYPES = frozenset(['union', 'error_union'])
+
+
+def _split_field_path(field_path: str) -> Tuple[str, ...]:
+    if type(field_path) is not str or len(field_path) == 0:
+        raise EmeraldMessageDeserializationError('Field paths must be non-empty strings' +
+                                                 os.linesep + 'Value provided = ' + str(field_path))
+    field_path_components = tuple(field_path.split(FIELD_PATH_SEPARATOR))
+    if any(len(x) == 0 for x in field_path_components):
+        raise EmeraldMessageDeserializationError('Field path "' + field_path + '" has an empty component')
+    return field_path_components
+
+
+def _schema_has_field_path(avro_schema: avro.schema.Schema,
+                           field_path_components: Tuple[str, ...]) -> bool:
+    if len(field_path_components) == 0:
+        return True
+    if avro_schema.type in _PROJECTION_RECORD_TYPES:
+        field = avro_schema.field_map.get(field_path_components[0])
+        return field is not None and _schema_has_field_path(field.type, field_path_components[1:])
+    if avro_schema.type in _PROJECTION_UNION_TYPES:
+        return any(_schema_has_field_path(x, field_path_components) for x in avro_schema.schemas)
+    if avro_schema.type == 'array':
+        return _schema_has_field_path(avro_schema.items, field_path_components)
+    return False
+
+
+# some avro schema types return their (read-only) property mapping from to_json - copy into plain JSON data
+def _get_leaf_schema_json(avro_schema: avro.schema.Schema,
+                          names: avro.schema.Names) -> Any:
+    def copy_json(json_data):
+        if isinstance(json_data, Mapping):
+            return {k: copy_json(v) for k, v in json_data.items()}
+        if isinstance(json_data, list):
+            return [copy_json(x) for x in json_data]
+        return json_data
+    return copy_json(avro_schema.to_json(names))
+
+
+#
+#  JSON of the writer schema cut down to the fields on the given paths.  Records keep their full names so the
+#  avro library resolves them against the writer schema, and keep their fields in writer order; everything not on
+#  a path is left out and so skipped, not decoded, when read.  Leaf types are copied from the writer schema
+#
+def _get_projection_schema_json(avro_schema: avro.schema.Schema,
+                                field_path_components_list: List[Tuple[str, ...]],
+                                names: avro.schema.Names) -> Any:
+    if any(len(x) == 0 for x in field_path_components_list):
+        return _get_leaf_schema_json(avro_schema, names)
+
+    if avro_schema.type in _PROJECTION_RECORD_TYPES:
+        projected_field_list = []
+        for field in avro_schema.fields:
+            field_path_components_for_field = [x[1:] for x in field_path_components_list if x[0] == field.name]
+            if len(field_path_components_for_field) > 0:
+                projected_field_list.append({
+                    'name': field.name,
+                    'type': _get_projection_schema_json(field.type, field_path_components_for_field, names)
+                })
+        return {'type': avro_schema.type, 'name': avro_schema.fullname, 'fields': projected_field_list}
+
+    if avro_schema.type in _PROJECTION_UNION_TYPES:
+        projected_branch_list = []
+        for branch_schema in avro_schema.schemas:
+            if branch_schema.type in _PROJECTION_RECORD_TYPES or branch_schema.type == 'array':
+                branch_field_path_components_list = [x for x in field_path_components_list
+                                                     if _schema_has_field_path(branch_schema, x)]
+                projected_branch_list.append(
+                    _get_projection_schema_json(branch_schema, branch_field_path_components_list, names)
+                    if len(branch_field_path_components_list) > 0 else _get_leaf_schema_json(branch_schema, names))
+            else:
+                projected_branch_list.append(_get_leaf_schema_json(branch_schema, names))
+        return projected_branch_list
+
+    if avro_schema.type == 'array':
+        return {'type': 'array',
+                'items': _get_projection_schema_json(avro_schema.items, field_path_components_list, names)}
+
+    raise EmeraldMessageDeserializationError('Unable to project into schema type "' + str(avro_schema.type) + '"')
+
+
+def get_avro_projection_schema(writer_avro_schema: avro.schema.Schema,
+                               field_paths: Sequence[str]) -> avro.schema.Schema:
+    if isinstance(field_paths, str) or len(field_paths) == 0:
+        raise EmeraldMessageDeserializationError('Provide a non-empty list of field paths to project' +
+                                                 os.linesep + 'Value provided = ' + str(field_paths))
+    field_path_components_list = [_split_field_path(x) for x in field_paths]
+    invalid_field_path_list = [FIELD_PATH_SEPARATOR.join(x) for x in field_path_components_list
+                               if not _schema_has_field_path(writer_avro_schema, x)]
+    if len(invalid_field_path_list) > 0:
+        raise EmeraldMessageDeserializationError('Field path(s) not found in schema ' +
+                                                 str(writer_avro_schema.fullname) + ': ' +
+                                                 ','.join(invalid_field_path_list))
+
+    # the parsed projection is a valid reader schema for data written with writer_avro_schema
+    return avro.schema.SchemaFromJSONData(
+        _get_projection_schema_json(writer_avro_schema, field_path_components_list, avro.schema.Names()),
+        avro.schema.Names())
+
+
+def _get_field_path_value(datum: Any,
+                          field_path_components: Tuple[str, ...]) -> Any:
+    for component_index, component in enumerate(field_path_components):
+        if datum is None:
+            return None
+        if type(datum) is list:
+            return [_get_field_path_value(x, field_path_components[component_index:]) for x in datum]
+        # a union branch without the field (the path was found in another branch)
+        datum = datum.get(component)
+    return datum
+
+
+#
+#  Lazily yields only the requested fields of each datum in an AVRO data file - attachment contents, message
+#  bodies and anything else off the paths are skipped over by schema resolution, never decoded or allocated:
+#       for address_from, sender_ip in iter_avro_projection('/archive/batch.avro',
+#                                                           ['email_envelope.address_from',
+#                                                            'email_message_metadata.email_sender_ip']):
+#           ...
+#  Rows are tuples in field_paths order, or dictionaries keyed by field path with as_dict.  The projection is
+#  built from the schema in the file header, so files of any container version can be read.  skip / limit select a
+#  window of records as for AbstractContainer.iter_from_avro
+#
+def iter_avro_projection(avro_container_uri: str,
+                         field_paths: Sequence[str],
+                         skip: int = 0,
+                         limit: Optional[int] = None,
+                         as_dict: bool = False,
+                         avro_serialization_backend: Optional[AbstractAvroSerializationBackend] = None) \
+        -> Iterator[Union[Tuple, Dict[str, Any]]]:
+    if type(avro_container_uri) is not str or len(avro_container_uri) == 0:
+        raise EmeraldMessageDeserializationError(
+            'Unable to read avro - avro_container_uri parameter' +
+            ' must be a string specifying container location in readable form')
+    if type(skip) is not int or skip < 0:
+        raise EmeraldMessageDeserializationError(
+            'Unable to read avro - skip must be a non-negative integer' +
+            os.linesep + 'Value provided = ' + str(skip))
+    if limit is not None and (type(limit) is not int or limit < 0):
+        raise EmeraldMessageDeserializationError(
+            'Unable to read avro - limit must be None or a non-negative integer' +
+            os.linesep + 'Value provided = ' + str(limit))
+    if avro_serialization_backend is None:
+        # imported here - abstract_container imports this module
+        from emerald_message.containers.abstract_container import AbstractContainer
+        avro_serialization_backend = AbstractContainer.get_serialization_backend()
+
+    field_paths = list(field_paths) if not isinstance(field_paths, str) else field_paths
+    with open(avro_container_uri, "rb") as avro_fp:
+        with DataFileReader(avro_fp, avro_serialization_backend.get_datum_reader()) as reader:
+            reader.datum_reader.reader_schema = get_avro_projection_schema(reader.datum_reader.writer_schema,
+                                                                           field_paths)
+            field_path_components_list = [_split_field_path(x) for x in field_paths]
+            for datum in itertools.islice(reader, skip, None if limit is None else skip + limit):
+                row = tuple(_get_field_path_value(datum, x) for x in field_path_components_list)
+                yield dict(zip(field_paths, row)) if as_dict else row
@@ -0,0 +1,628 @@
+import io
+import json
+import struct
+from abc import ABCMeta, abstractmethod
+from typing import Callable, Dict, Optional, Tuple
+
+import avro.schema
+from avro.io import DatumReader, DatumWriter, AvroTypeException, \
+    INT_MIN_VALUE, INT_MAX_VALUE, LONG_MIN_VALUE, LONG_MAX_VALUE
+
+# fastavro is optional - FastavroSerializationBackend is only available when it is installed
+try:
+    import fastavro
+except ImportError:
+    fastavro = None
+
+
+#
+#  The serialization backend supplies the datum writer and datum reader objects handed to the avro library's
+#  DataFileWriter / DataFileReader, so the file framing (header, blocks, codecs, sync markers) is always done by the
+#  avro library and only the encoding of each datum differs.  Every backend produces byte for byte the same datum
+#  encoding as avro.io.DatumWriter, so files written with one backend are identical to, and readable by, any other
+#
+#   StandardAvroSerializationBackend - avro.io.DatumWriter / DatumReader, which walk the schema for every datum
+#   CompiledAvroSerializationBackend - walks each schema once and builds a tree of closures specialized to it,
+#       cached per schema for the life of the process
+#   FastavroSerializationBackend - fastavro's C encoder and decoder, when fastavro is installed
+#
+#  Select with AbstractContainer.set_serialization_backend - the standard backend is the default
+#
+class AbstractAvroSerializationBackend(metaclass=ABCMeta):
+    @property
+    def backend_name(self) -> str:
+        return type(self).__name__
+
+    @abstractmethod
+    def get_datum_writer(self,
+                         avro_schema: avro.schema.Schema) -> DatumWriter:
+        pass
+
+    # the writer schema is set on the reader by DataFileReader from the file header
+    @abstractmethod
+    def get_datum_reader(self,
+                         reader_avro_schema: Optional[avro.schema.Schema] = None) -> DatumReader:
+        pass
+
+
+class StandardAvroSerializationBackend(AbstractAvroSerializationBackend):
+    def get_datum_writer(self,
+                         avro_schema: avro.schema.Schema) -> DatumWriter:
+        return DatumWriter(avro_schema)
+
+    def get_datum_reader(self,
+                         reader_avro_schema: Optional[avro.schema.Schema] = None) -> DatumReader:
+        return DatumReader(None, reader_avro_schema)
+
+
+###############
+#  Compiled backend
+###############
+
+_STRUCT_FLOAT = struct.Struct('<f')
+_STRUCT_DOUBLE = struct.Struct('<d')
+
+_RECORD_SCHEMA_TYPES = frozenset(['record', 'error', 'request'])
+_UNION_SCHEMA_TYPES = frozenset(['union', 'error_union'])
+
+
+def _encode_long(datum: int, buffer: bytearray):
+    datum = (datum << 1) ^ (datum >> 63)
+    while datum & ~0x7F:
+        buffer.append((datum & 0x7F) | 0x80)
+        datum >>= 7
+    buffer.append(datum)
+
+
+def _decode_long(read) -> int:
+    byte_value = read(1)[0]
+    datum = byte_value & 0x7F
+    shift = 7
+    while byte_value & 0x80:
+        byte_value = read(1)[0]
+        datum |= (byte_value & 0x7F) << shift
+        shift += 7
+    return (datum >> 1) ^ -(datum & 1)
+
+
+def _decode_bytes(read) -> bytes:
+    return read(_decode_long(read))
+
+
+#
+#  The validators mirror avro.io.Validate exactly - including the choice of the last matching branch of a union -
+#  as that decides the branch index written and so the bytes produced
+#
+def _compile_validator(avro_schema: avro.schema.Schema,
+                       compiled_by_name: Dict[str, Callable]) -> Callable:
+    schema_type = avro_schema.type
+    if schema_type == 'null':
+        return lambda datum: datum is None
+    if schema_type == 'boolean':
+        return lambda datum: isinstance(datum, bool)
+    if schema_type == 'string':
+        return lambda datum: isinstance(datum, str)
+    if schema_type == 'bytes':
+        return lambda datum: isinstance(datum, bytes)
+    if schema_type == 'int':
+        return lambda datum: isinstance(datum, int) and INT_MIN_VALUE <= datum <= INT_MAX_VALUE
+    if schema_type == 'long':
+        return lambda datum: isinstance(datum, int) and LONG_MIN_VALUE <= datum <= LONG_MAX_VALUE
+    if schema_type in ('float', 'double'):
+        return lambda datum: isinstance(datum, (int, float))
+    if schema_type == 'fixed':
+        fixed_size = avro_schema.size
+        return lambda datum: isinstance(datum, bytes) and len(datum) == fixed_size
+    if schema_type == 'enum':
+        enum_symbols = frozenset(avro_schema.symbols)
+        return lambda datum: datum in enum_symbols
+    if schema_type == 'array':
+        validate_item = _compile_validator(avro_schema.items, compiled_by_name)
+        return lambda datum: isinstance(datum, list) and all(validate_item(x) for x in datum)
+    if schema_type == 'map':
+        validate_value = _compile_validator(avro_schema.values, compiled_by_name)
+        return lambda datum: isinstance(datum, dict) and \
+            all(isinstance(k, str) for k in datum) and all(validate_value(v) for v in datum.values())
+    if schema_type in _UNION_SCHEMA_TYPES:
+        validate_branch_list = [_compile_validator(x, compiled_by_name) for x in avro_schema.schemas]
+        return lambda datum: any(validate_branch(datum) for validate_branch in validate_branch_list)
+    if schema_type in _RECORD_SCHEMA_TYPES:
+        # named records are registered before their fields are compiled so recursive schemas terminate
+        if avro_schema.fullname in compiled_by_name:
+            return compiled_by_name[avro_schema.fullname]
+        field_validator_list = []
+        field_name_set = frozenset(x.name for x in avro_schema.fields)
+
+        def validate_record(datum):
+            if not isinstance(datum, dict):
+                return False
+            for field_name, validate_field in field_validator_list:
+                if not validate_field(datum.get(field_name)):
+                    return False
+            return field_name_set.issuperset(datum.keys())
+
+        compiled_by_name[avro_schema.fullname] = validate_record
+        field_validator_list.extend((x.name, _compile_validator(x.type, compiled_by_name))
+                                    for x in avro_schema.fields)
+        return validate_record
+    raise avro.schema.AvroException('Unable to compile validator for unknown schema type: ' + str(schema_type))
+
+
+def _compile_encoder(avro_schema: avro.schema.Schema,
+                     compiled_by_name: Dict[str, Callable],
+                     validator_by_name: Dict[str, Callable]) -> Callable:
+    schema_type = avro_schema.type
+    if schema_type == 'null':
+        return lambda datum, buffer: None
+    if schema_type == 'boolean':
+        return lambda datum, buffer: buffer.append(1 if datum else 0)
+    if schema_type in ('int', 'long'):
+        return _encode_long
+    if schema_type == 'float':
+        pack_float = _STRUCT_FLOAT.pack
+        return lambda datum, buffer: buffer.extend(pack_float(datum))
+    if schema_type == 'double':
+        pack_double = _STRUCT_DOUBLE.pack
+        return lambda datum, buffer: buffer.extend(pack_double(datum))
+    if schema_type == 'bytes':
+        def encode_bytes(datum, buffer):
+            _encode_long(len(datum), buffer)
+            buffer.extend(datum)
+        return encode_bytes
+    if schema_type == 'string':
+        def encode_string(datum, buffer):
+            datum = datum.encode('utf-8')
+            _encode_long(len(datum), buffer)
+            buffer.extend(datum)
+        return encode_string
+    if schema_type == 'fixed':
+        return lambda datum, buffer: buffer.extend(datum)
+    if schema_type == 'enum':
+        symbol_index = {x: i for i, x in enumerate(avro_schema.symbols)}
+        return lambda datum, buffer: _encode_long(symbol_index[datum], buffer)
+    if schema_type == 'array':
+        encode_item = _compile_encoder(avro_schema.items, compiled_by_name, validator_by_name)
+
+        def encode_array(datum, buffer):
+            if len(datum) > 0:
+                _encode_long(len(datum), buffer)
+                for item in datum:
+                    encode_item(item, buffer)
+            buffer.append(0)
+        return encode_array
+    if schema_type == 'map':
+        encode_value = _compile_encoder(avro_schema.values, compiled_by_name, validator_by_name)
+
+        def encode_map(datum, buffer):
+            if len(datum) > 0:
+                _encode_long(len(datum), buffer)
+                for key, value in datum.items():
+                    key = key.encode('utf-8')
+                    _encode_long(len(key), buffer)
+                    buffer.extend(key)
+                    encode_value(value, buffer)
+            buffer.append(0)
+        return encode_map
+    if schema_type in _UNION_SCHEMA_TYPES:
+        branch_list = [(i, _compile_validator(x, validator_by_name),
+                        _compile_encoder(x, compiled_by_name, validator_by_name))
+                       for i, x in enumerate(avro_schema.schemas)]
+        # same rule as avro.io.DatumWriter.write_union - the last branch the datum validates against
+        branch_list.reverse()
+
+        def encode_union(datum, buffer):
+            for branch_index, validate_branch, encode_branch in branch_list:
+                if validate_branch(datum):
+                    _encode_long(branch_index, buffer)
+                    encode_branch(datum, buffer)
+                    return
+            raise AvroTypeException(avro_schema, datum)
+        return encode_union
+    if schema_type in _RECORD_SCHEMA_TYPES:
+        if avro_schema.fullname in compiled_by_name:
+            return compiled_by_name[avro_schema.fullname]
+        field_encoder_list = []
+
+        def encode_record(datum, buffer):
+            get_field = datum.get
+            for field_name, encode_field in field_encoder_list:
+                encode_field(get_field(field_name), buffer)
+
+        compiled_by_name[avro_schema.fullname] = encode_record
+        field_encoder_list.extend((x.name, _compile_encoder(x.type, compiled_by_name, validator_by_name))
+                                  for x in avro_schema.fields)
+        return encode_record
+    raise avro.schema.AvroException('Unable to compile encoder for unknown schema type: ' + str(schema_type))
+
+
+def _compile_decoder(avro_schema: avro.schema.Schema,
+                     compiled_by_name: Dict[str, Callable]) -> Callable:
+    schema_type = avro_schema.type
+    if schema_type == 'null':
+        return lambda read: None
+    if schema_type == 'boolean':
+        return lambda read: read(1)[0] == 1
+    if schema_type in ('int', 'long'):
+        return _decode_long
+    if schema_type == 'float':
+        unpack_float = _STRUCT_FLOAT.unpack
+        return lambda read: unpack_float(read(4))[0]
+    if schema_type == 'double':
+        unpack_double = _STRUCT_DOUBLE.unpack
+        return lambda read: unpack_double(read(8))[0]
+    if schema_type == 'bytes':
+        return _decode_bytes
+    if schema_type == 'string':
+        return lambda read: _decode_bytes(read).decode('utf-8')
+    if schema_type == 'fixed':
+        fixed_size = avro_schema.size
+        return lambda read: read(fixed_size)
+    if schema_type == 'enum':
+        enum_symbols = tuple(avro_schema.symbols)
+        return lambda read: enum_symbols[_decode_long(read)]
+    if schema_type in ('array', 'map'):
+        is_map = schema_type == 'map'
+        decode_item = _compile_decoder(avro_schema.values if is_map else avro_schema.items, compiled_by_name)
+
+        def decode_blocks(read):
+            decoded = {} if is_map else []
+            block_count = _decode_long(read)
+            while block_count != 0:
+                if block_count < 0:
+                    # a negative count is followed by the block size in bytes, which we do not need
+                    block_count = -block_count
+                    _decode_long(read)
+                for _ in range(block_count):
+                    if is_map:
+                        key = _decode_bytes(read).decode('utf-8')
+                        decoded[key] = decode_item(read)
+                    else:
+                        decoded.append(decode_item(read))
+                block_count = _decode_long(read)
+            return decoded
+        return decode_blocks
+    if schema_type in _UNION_SCHEMA_TYPES:
+        branch_decoder_list = [_compile_decoder(x, compiled_by_name) for x in avro_schema.schemas]
+        return lambda read: branch_decoder_list[_decode_long(read)](read)
+    if schema_type in _RECORD_SCHEMA_TYPES:
+        if avro_schema.fullname in compiled_by_name:
+            return compiled_by_name[avro_schema.fullname]
+        field_decoder_list = []
+
+        def decode_record(read):
+            return {field_name: decode_field(read) for field_name, decode_field in field_decoder_list}
+
+        compiled_by_name[avro_schema.fullname] = decode_record
+        field_decoder_list.extend((x.name, _compile_decoder(x.type, compiled_by_name)) for x in avro_schema.fields)
+        return decode_record
+    raise avro.schema.AvroException('Unable to compile decoder for unknown schema type: ' + str(schema_type))
+
+
+def _compile_skipper(avro_schema: avro.schema.Schema,
+                     compiled_by_name: Dict[str, Callable]) -> Callable:
+    schema_type = avro_schema.type
+    if schema_type == 'null':
+        return lambda read: None
+    if schema_type == 'boolean':
+        return lambda read: read(1)
+    if schema_type in ('int', 'long', 'enum'):
+        return _decode_long
+    if schema_type == 'float':
+        return lambda read: read(4)
+    if schema_type == 'double':
+        return lambda read: read(8)
+    if schema_type in ('bytes', 'string'):
+        return lambda read: read(_decode_long(read))
+    if schema_type == 'fixed':
+        fixed_size = avro_schema.size
+        return lambda read: read(fixed_size)
+    if schema_type in ('array', 'map'):
+        is_map = schema_type == 'map'
+        skip_item = _compile_skipper(avro_schema.values if is_map else avro_schema.items, compiled_by_name)
+
+        def skip_blocks(read):
+            block_count = _decode_long(read)
+            while block_count != 0:
+                if block_count < 0:
+                    # the block size lets the whole block go in one read
+                    read(_decode_long(read))
+                else:
+                    for _ in range(block_count):
+                        if is_map:
+                            read(_decode_long(read))
+                        skip_item(read)
+                block_count = _decode_long(read)
+        return skip_blocks
+    if schema_type in _UNION_SCHEMA_TYPES:
+        branch_skipper_list = [_compile_skipper(x, compiled_by_name) for x in avro_schema.schemas]
+        return lambda read: branch_skipper_list[_decode_long(read)](read)
+    if schema_type in _RECORD_SCHEMA_TYPES:
+        if avro_schema.fullname in compiled_by_name:
+            return compiled_by_name[avro_schema.fullname]
+        field_skipper_list = []
+
+        def skip_record(read):
+            for skip_field in field_skipper_list:
+                skip_field(read)
+
+        compiled_by_name[avro_schema.fullname] = skip_record
+        field_skipper_list.extend(_compile_skipper(x.type, compiled_by_name) for x in avro_schema.fields)
+        return skip_record
+    raise avro.schema.AvroException('Unable to compile skipper for unknown schema type: ' + str(schema_type))
+
+
+class _NotAProjectionError(Exception):
+    pass
+
+
+def _get_union_branch_key(avro_schema: avro.schema.Schema) -> str:
+    return avro_schema.fullname if avro_schema.type in _RECORD_SCHEMA_TYPES else str(avro_schema)
+
+
+#
+#  Decoder for a reader schema that is a projection of the writer schema - records keep a subset of their fields,
+#  everything kept is identical - so the schema resolution needed is only skipping the fields left out.  Raises
+#  _NotAProjectionError for anything else (defaults, promotions, renamed branches ...)
+#
+def _compile_projection_decoder(writer_avro_schema: avro.schema.Schema,
+                                reader_avro_schema: avro.schema.Schema,
+                                compiled_by_name: Dict[str, Callable],
+                                skipper_by_name: Dict[str, Callable]) -> Callable:
+    schema_type = writer_avro_schema.type
+    if schema_type != reader_avro_schema.type:
+        raise _NotAProjectionError()
+    if schema_type in _RECORD_SCHEMA_TYPES:
+        if writer_avro_schema.fullname != reader_avro_schema.fullname:
+            raise _NotAProjectionError()
+        if writer_avro_schema.fullname in compiled_by_name:
+            return compiled_by_name[writer_avro_schema.fullname]
+        writer_field_by_name = {x.name: x for x in writer_avro_schema.fields}
+        if any(x.name not in writer_field_by_name for x in reader_avro_schema.fields):
+            raise _NotAProjectionError()
+        reader_field_by_name = {x.name: x for x in reader_avro_schema.fields}
+        field_decoder_list = []
+
+        def decode_projected_record(read):
+            decoded = {}
+            for field_name, decode_field in field_decoder_list:
+                if field_name is None:
+                    decode_field(read)
+                else:
+                    decoded[field_name] = decode_field(read)
+            return decoded
+
+        compiled_by_name[writer_avro_schema.fullname] = decode_projected_record
+        for writer_field in writer_avro_schema.fields:
+            reader_field = reader_field_by_name.get(writer_field.name)
+            if reader_field is None:
+                field_decoder_list.append((None, _compile_skipper(writer_field.type, skipper_by_name)))
+            else:
+                field_decoder_list.append((writer_field.name,
+                                           _compile_projection_decoder(writer_field.type, reader_field.type,
+                                                                       compiled_by_name, skipper_by_name)))
+        return decode_projected_record
+    if schema_type in ('array', 'map'):
+        is_map = schema_type == 'map'
+        decode_item = _compile_projection_decoder(
+            writer_avro_schema.values if is_map else writer_avro_schema.items,
+            reader_avro_schema.values if is_map else reader_avro_schema.items,
+            compiled_by_name, skipper_by_name)
+
+        def decode_projected_blocks(read):
+            decoded = {} if is_map else []
+            block_count = _decode_long(read)
+            while block_count != 0:
+                if block_count < 0:
+                    block_count = -block_count
+                    _decode_long(read)
+                for _ in range(block_count):
+                    if is_map:
+                        key = _decode_bytes(read).decode('utf-8')
+                        decoded[key] = decode_item(read)
+                    else:
+                        decoded.append(decode_item(read))
+                block_count = _decode_long(read)
+            return decoded
+        return decode_projected_blocks
+    if schema_type in _UNION_SCHEMA_TYPES:
+        reader_branch_by_key = {_get_union_branch_key(x): x for x in reader_avro_schema.schemas}
+        branch_decoder_list = []
+        for writer_branch in writer_avro_schema.schemas:
+            reader_branch = reader_branch_by_key.get(_get_union_branch_key(writer_branch))
+            if reader_branch is None:
+                raise _NotAProjectionError()
+            branch_decoder_list.append(_compile_projection_decoder(writer_branch, reader_branch,
+                                                                   compiled_by_name, skipper_by_name))
+        return lambda read: branch_decoder_list[_decode_long(read)](read)
+    if str(writer_avro_schema) != str(reader_avro_schema):
+        raise _NotAProjectionError()
+    return _compile_decoder(writer_avro_schema, {})
+
+
+class CompiledAvroSchema:
+    @property
+    def avro_schema(self) -> avro.schema.Schema:
+        return self._avro_schema
+
+    def validate(self, datum) -> bool:
+        return self._validate(datum)
+
+    def encode(self, datum) -> bytearray:
+        buffer = bytearray()
+        self._encode(datum, buffer)
+        return buffer
+
+    def decode(self, read):
+        return self._decode(read)
+
+    def __init__(self,
+                 avro_schema: avro.schema.Schema):
+        self._avro_schema = avro_schema
+        self._validate = _compile_validator(avro_schema, {})
+        self._encode = _compile_encoder(avro_schema, {}, {})
+        self._decode = _compile_decoder(avro_schema, {})
+
+
+# compiled once per schema - keyed by the schema JSON so the schema read back from a file header (a new object)
+#  finds the entry compiled for the registry schema it was written with
+_compiled_avro_schema_by_schema_json: Dict[str, CompiledAvroSchema] = {}
+_compiled_avro_schema_by_schema_id: Dict[int, Tuple[avro.schema.Schema, CompiledAvroSchema]] = {}
+
+
+def get_compiled_avro_schema(avro_schema: avro.schema.Schema) -> CompiledAvroSchema:
+    try:
+        cached_schema, compiled_avro_schema = _compiled_avro_schema_by_schema_id[id(avro_schema)]
+        if cached_schema is avro_schema:
+            return compiled_avro_schema
+    except KeyError:
+        pass
+
+    schema_json = str(avro_schema)
+    compiled_avro_schema = _compiled_avro_schema_by_schema_json.get(schema_json)
+    if compiled_avro_schema is None:
+        compiled_avro_schema = CompiledAvroSchema(avro_schema)
+        _compiled_avro_schema_by_schema_json[schema_json] = compiled_avro_schema
+    # holding the schema keeps its id from being reused while the entry exists
+    _compiled_avro_schema_by_schema_id[id(avro_schema)] = (avro_schema, compiled_avro_schema)
+    return compiled_avro_schema
+
+
+class CompiledDatumWriter(DatumWriter):
+    def write(self, datum, encoder):
+        compiled_avro_schema = get_compiled_avro_schema(self.writer_schema)
+        if not compiled_avro_schema.validate(datum):
+            raise AvroTypeException(self.writer_schema, datum)
+        encoder.writer.write(compiled_avro_schema.encode(datum))
+
+
+# projection decoders (None where the reader schema is not a projection) - keyed by the JSON of both schemas
+_compiled_projection_decoder_by_schema_json: Dict[Tuple[str, str], Optional[Callable]] = {}
+
+
+def get_compiled_projection_decoder(writer_avro_schema: avro.schema.Schema,
+                                    reader_avro_schema: avro.schema.Schema) -> Optional[Callable]:
+    schema_json_key = (str(writer_avro_schema), str(reader_avro_schema))
+    try:
+        return _compiled_projection_decoder_by_schema_json[schema_json_key]
+    except KeyError:
+        pass
+
+    try:
+        projection_decoder = _compile_projection_decoder(writer_avro_schema, reader_avro_schema, {}, {})
+    except _NotAProjectionError:
+        projection_decoder = None
+    _compiled_projection_decoder_by_schema_json[schema_json_key] = projection_decoder
+    return projection_decoder
+
+
+#
+#  Reading with the schema the file was written with, or with a projection of it (a reader schema that keeps a
+#  subset of the record fields - see avro_projection_reader), is compiled.  Any other reader schema needs full
+#  schema resolution, which is left to avro.io.DatumReader.  The choice is made once per writer / reader pair
+#
+class CompiledDatumReader(DatumReader):
+    def _get_compiled_decoder(self) -> Optional[Callable]:
+        if self.reader_schema is None or self.reader_schema is self.writer_schema or \
+                str(self.reader_schema) == str(self.writer_schema):
+            return get_compiled_avro_schema(self.writer_schema).decode
+        return get_compiled_projection_decoder(self.writer_schema, self.reader_schema)
+
+    def read(self, decoder):
+        if self._compiled_decoder_schemas is None or self._compiled_decoder_schemas[0] is not self.writer_schema or \
+                self._compiled_decoder_schemas[1] is not self.reader_schema:
+            self._compiled_decoder = self._get_compiled_decoder()
+            self._compiled_decoder_schemas = (self.writer_schema, self.reader_schema)
+        if self._compiled_decoder is None:
+            return super(CompiledDatumReader, self).read(decoder)
+        return self._compiled_decoder(decoder.reader.read)
+
+    def __init__(self,
+                 writer_schema: Optional[avro.schema.Schema] = None,
+                 reader_schema: Optional[avro.schema.Schema] = None):
+        super(CompiledDatumReader, self).__init__(writer_schema, reader_schema)
+        self._compiled_decoder: Optional[Callable] = None
+        self._compiled_decoder_schemas: Optional[Tuple[avro.schema.Schema, Optional[avro.schema.Schema]]] = None
+
+
+class CompiledAvroSerializationBackend(AbstractAvroSerializationBackend):
+    def get_datum_writer(self,
+                         avro_schema: avro.schema.Schema) -> DatumWriter:
+        # compile now rather than on the first datum
+        get_compiled_avro_schema(avro_schema)
+        return CompiledDatumWriter(avro_schema)
+
+    def get_datum_reader(self,
+                         reader_avro_schema: Optional[avro.schema.Schema] = None) -> DatumReader:
+        return CompiledDatumReader(None, reader_avro_schema)
+
+
+###############
+#  fastavro backend
+###############
+
+_fastavro_schema_by_schema_json: Dict[str, Dict] = {}
+_fastavro_schema_by_schema_id: Dict[int, Tuple[avro.schema.Schema, Dict]] = {}
+
+
+# same two level cache as get_compiled_avro_schema
+def _get_fastavro_schema(avro_schema: avro.schema.Schema) -> Dict:
+    try:
+        cached_schema, fastavro_schema = _fastavro_schema_by_schema_id[id(avro_schema)]
+        if cached_schema is avro_schema:
+            return fastavro_schema
+    except KeyError:
+        pass
+
+    schema_json = str(avro_schema)
+    fastavro_schema = _fastavro_schema_by_schema_json.get(schema_json)
+    if fastavro_schema is None:
+        fastavro_schema = fastavro.parse_schema(json.loads(schema_json))
+        _fastavro_schema_by_schema_json[schema_json] = fastavro_schema
+    _fastavro_schema_by_schema_id[id(avro_schema)] = (avro_schema, fastavro_schema)
+    return fastavro_schema
+
+
+class FastavroDatumWriter(DatumWriter):
+    def write(self, datum, encoder):
+        datum_buffer = io.BytesIO()
+        try:
+            fastavro.schemaless_writer(datum_buffer, _get_fastavro_schema(self.writer_schema), datum)
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise AvroTypeException(self.writer_schema, datum)
+        encoder.writer.write(datum_buffer.getvalue())
+
+
+class FastavroDatumReader(DatumReader):
+    def read(self, decoder):
+        return fastavro.schemaless_reader(decoder.reader,
+                                          _get_fastavro_schema(self.writer_schema),
+                                          None if self.reader_schema is None
+                                          else _get_fastavro_schema(self.reader_schema))
+
+
+#
+#  DET NOTE - fastavro picks union branches by its own rules, which agree with avro.io for every union in our
+#  schemas (no union has two branches that accept the same python value) but may not for arbitrary schemas
+#
+class FastavroSerializationBackend(AbstractAvroSerializationBackend):
+    @staticmethod
+    def is_available() -> bool:
+        return fastavro is not None
+
+    def get_datum_writer(self,
+                         avro_schema: avro.schema.Schema) -> DatumWriter:
+        return FastavroDatumWriter(avro_schema)
+
+    def get_datum_reader(self,
+                         reader_avro_schema: Optional[avro.schema.Schema] = None) -> DatumReader:
+        return FastavroDatumReader(None, reader_avro_schema)
+
+    def __init__(self):
+        if not type(self).is_available():
+            raise ImportError('The fastavro package must be installed to use ' + type(self).__name__)
+
+
+def get_fastest_available_serialization_backend() -> AbstractAvroSerializationBackend:
+    if FastavroSerializationBackend.is_available():
+        return FastavroSerializationBackend()
+    return CompiledAvroSerializationBackend()
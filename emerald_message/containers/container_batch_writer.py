@@ -0,0 +1,200 @@
+import os
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Type
+from avro.datafile import SYNC_INTERVAL
+from avro.io import AvroTypeException
+
+from emerald_message.containers.abstract_container import AbstractContainer
+from emerald_message.containers.avro_data_file_writer import AvroDataFileWriter, AvroCodecConfigurationRecord
+from emerald_message.error import EmeraldMessageSerializationError
+
+
+'''
+Configuration for writing many containers of the same type into AVRO object container files
+    block_size_bytes: target size of each data block (encoded bytes) before a sync marker is written
+    block_record_count: optionally also cut a block after this many records
+    max_records_per_file / max_bytes_per_file: when either is set, output rotates to a new file once the limit
+        is reached.  Rotated files are named <root>-<00000><ext> from the avro_container_uri given to the writer
+        max_bytes_per_file is checked against the uncompressed size of the pending block, so compressed files
+        rotate somewhat early
+    codec_configuration_record: block compression codec and level (None writes uncompressed)
+'''
+
+
+@dataclass(frozen=True)
+class ContainerBatchWriterConfigurationRecord:
+    block_size_bytes: int = SYNC_INTERVAL
+    block_record_count: Optional[int] = None
+    max_records_per_file: Optional[int] = None
+    max_bytes_per_file: Optional[int] = None
+    codec_configuration_record: Optional[AvroCodecConfigurationRecord] = None
+
+
+#
+#  Streams any number of containers of a single type into one AVRO object container file (or a rotating
+#  series of them) so the schema header and sync marker are written once per file rather than once per container
+#
+#  Use as a context manager:
+#       with ContainerBatchWriter(container_class=EmailContainer, avro_container_uri='/data/mail.avro') as writer:
+#           writer.extend(container_iterable)
+#
+class ContainerBatchWriter:
+    @property
+    def container_class(self) -> Type[AbstractContainer]:
+        return self._container_class
+
+    @property
+    def avro_container_uri(self) -> str:
+        return self._avro_container_uri
+
+    @property
+    def configuration_record(self) -> ContainerBatchWriterConfigurationRecord:
+        return self._configuration_record
+
+    @property
+    def rotation_enabled(self) -> bool:
+        return self._configuration_record.max_records_per_file is not None or \
+               self._configuration_record.max_bytes_per_file is not None
+
+    @property
+    def written_avro_container_uri_list(self) -> List[str]:
+        return list(self._written_avro_container_uri_list)
+
+    @property
+    def record_count(self) -> int:
+        return self._record_count
+
+    @property
+    def file_record_count(self) -> int:
+        return self._file_record_count
+
+    def get_avro_container_uri_for_file_index(self,
+                                              file_index: int) -> str:
+        if not self.rotation_enabled:
+            return self._avro_container_uri
+        uri_root, uri_extension = os.path.splitext(self._avro_container_uri)
+        return uri_root + '-' + str(file_index).zfill(5) + uri_extension
+
+    def _open_next_file(self):
+        avro_container_uri = self.get_avro_container_uri_for_file_index(len(self._written_avro_container_uri_list))
+        writer_fp = open(avro_container_uri, 'wb')
+        avro_schema = self._container_class.get_avro_schema_record().avro_schema
+        self._writer = AvroDataFileWriter(writer_fp,
+                                          self._container_class.get_serialization_backend().get_datum_writer(
+                                              avro_schema),
+                                          avro_schema,
+                                          codec_configuration_record=
+                                          self._configuration_record.codec_configuration_record,
+                                          block_size_bytes=self._configuration_record.block_size_bytes)
+        self._written_avro_container_uri_list.append(avro_container_uri)
+        self._file_record_count = 0
+
+    def _close_current_file(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _is_current_file_full(self) -> bool:
+        if self._configuration_record.max_records_per_file is not None and \
+                self._file_record_count >= self._configuration_record.max_records_per_file:
+            return True
+        if self._configuration_record.max_bytes_per_file is not None and \
+                self._writer.estimated_file_size_bytes >= self._configuration_record.max_bytes_per_file:
+            return True
+        return False
+
+    def append(self,
+               container: AbstractContainer):
+        if self._closed:
+            raise EmeraldMessageSerializationError('Unable to write avro - batch writer for "' +
+                                                   self._avro_container_uri + '" has already been closed')
+        if not isinstance(container, self._container_class):
+            raise EmeraldMessageSerializationError(
+                'Unable to write avro - batch writer for ' + self._container_class.__name__ +
+                ' cannot accept object of type "' + type(container).__name__ + '"')
+
+        # files are opened lazily so rotation never leaves an empty trailing file behind
+        if self._writer is None:
+            self._open_next_file()
+
+        try:
+            self._writer.append(container.get_as_dict())
+        except AvroTypeException as iex:
+            raise EmeraldMessageSerializationError(
+                'Unable to serialize object of type ' +
+                type(container).__name__ + ' due to data mismatch in Avro schema' +
+                os.linesep + 'Record number in batch = ' + str(self._record_count + 1) +
+                os.linesep + 'Error info: ' + str(iex.args[0]))
+
+        self._record_count += 1
+        self._file_record_count += 1
+
+        if self._configuration_record.block_record_count is not None and \
+                self._writer.block_count >= self._configuration_record.block_record_count:
+            self._writer.sync()
+
+        if self.rotation_enabled and self._is_current_file_full():
+            self._close_current_file()
+
+    def extend(self,
+               container_iterable: Iterable[AbstractContainer]):
+        for container in container_iterable:
+            self.append(container)
+
+    def close(self):
+        if self._closed:
+            return
+        self._close_current_file()
+        self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # always close so the file handle is released - everything appended before the error is kept
+        self.close()
+
+    def __init__(self,
+                 container_class: Type[AbstractContainer],
+                 avro_container_uri: str,
+                 configuration_record: Optional[ContainerBatchWriterConfigurationRecord] = None):
+        if not isinstance(container_class, type) or not issubclass(container_class, AbstractContainer):
+            raise EmeraldMessageSerializationError(
+                'Unable to write avro - container_class must be a class extending ' + AbstractContainer.__name__ +
+                os.linesep + 'Value provided = ' + str(container_class))
+        if type(avro_container_uri) is not str or len(avro_container_uri) == 0:
+            raise EmeraldMessageSerializationError(
+                'Unable to write avro - avro_container_uri parameter' +
+                ' must be a string specifying container location in writable form')
+        if configuration_record is None:
+            configuration_record = ContainerBatchWriterConfigurationRecord()
+        if not isinstance(configuration_record, ContainerBatchWriterConfigurationRecord):
+            raise EmeraldMessageSerializationError(
+                'Unable to write avro - configuration_record must be of type ' +
+                ContainerBatchWriterConfigurationRecord.__name__ +
+                os.linesep + 'Type provided = ' + type(configuration_record).__name__)
+        if type(configuration_record.block_size_bytes) is not int or configuration_record.block_size_bytes <= 0:
+            raise EmeraldMessageSerializationError(
+                'Unable to write avro - block_size_bytes must be a positive integer' +
+                os.linesep + 'Value provided = ' + str(configuration_record.block_size_bytes))
+        for limit_name in ('block_record_count', 'max_records_per_file', 'max_bytes_per_file'):
+            limit_value = getattr(configuration_record, limit_name)
+            if limit_value is not None and (type(limit_value) is not int or limit_value <= 0):
+                raise EmeraldMessageSerializationError(
+                    'Unable to write avro - ' + limit_name + ' must be None or a positive integer' +
+                    os.linesep + 'Value provided = ' + str(limit_value))
+        if configuration_record.codec_configuration_record is not None:
+            try:
+                AvroDataFileWriter.validate_codec_configuration_record(
+                    configuration_record.codec_configuration_record)
+            except ValueError as vex:
+                raise EmeraldMessageSerializationError('Unable to write avro - ' + str(vex))
+
+        self._container_class = container_class
+        self._avro_container_uri = avro_container_uri
+        self._configuration_record = configuration_record
+        self._written_avro_container_uri_list: List[str] = []
+        self._writer: Optional[AvroDataFileWriter] = None
+        self._record_count = 0
+        self._file_record_count = 0
+        self._closed = False
@@ -0,0 +1,74 @@
+import os
+import struct
+from typing import Tuple
+
+from spooky import hash128
+
+#
+#  A canonical key is a tuple of plain values - str, bytes, int, bool, None and nested tuples - that identifies a
+#  container by content: two containers are equal exactly when their keys are equal, and they sort in key order.
+#  The canonical digest is a 128 bit spooky hash of the key's byte encoding below.  Each value is written with a
+#  type tag and, where variable, its length, so distinct keys never share an encoding - ('ab', 'c') and
+#  ('a', 'bc') encode differently, as do 1, True and '1'
+#
+#  DET NOTE - digests are stable across processes and releases (unlike hash()) and may be stored; never change the
+#  encoding of an existing tag
+#
+_TAG_NONE = b'N'
+_TAG_FALSE = b'F'
+_TAG_TRUE = b'T'
+_TAG_INT = b'I'
+_TAG_STR = b'S'
+_TAG_BYTES = b'B'
+_TAG_TUPLE = b'('
+
+_pack_length = struct.Struct('>Q').pack
+
+
+def _encode_canonical_key_tuple(canonical_key_tuple: tuple,
+                                encoded_parts: list):
+    append = encoded_parts.append
+    append(_TAG_TUPLE)
+    append(_pack_length(len(canonical_key_tuple)))
+    for element in canonical_key_tuple:
+        # type() rather than isinstance - bool is a subclass of int and must keep its own tag
+        element_type = type(element)
+        if element_type is str:
+            # surrogates survive the round trip from some mail headers - keep them rather than fail
+            encoded_element = element.encode('utf-8', 'surrogatepass')
+            append(_TAG_STR)
+            append(_pack_length(len(encoded_element)))
+            append(encoded_element)
+        elif element_type is tuple:
+            _encode_canonical_key_tuple(element, encoded_parts)
+        elif element_type is int:
+            encoded_element = element.to_bytes((element.bit_length() + 8) // 8, byteorder='big', signed=True)
+            append(_TAG_INT)
+            append(_pack_length(len(encoded_element)))
+            append(encoded_element)
+        elif element is None:
+            append(_TAG_NONE)
+        elif element is True:
+            append(_TAG_TRUE)
+        elif element is False:
+            append(_TAG_FALSE)
+        elif element_type is bytes:
+            append(_TAG_BYTES)
+            append(_pack_length(len(element)))
+            append(element)
+        else:
+            raise TypeError('Canonical keys may only hold str, bytes, int, bool, None and tuples of these' +
+                            os.linesep + 'Type provided = ' + element_type.__name__)
+
+
+def encode_canonical_key(canonical_key: Tuple) -> bytes:
+    if type(canonical_key) is not tuple:
+        raise TypeError('Caller must provide the canonical key as a tuple' +
+                        os.linesep + 'Type provided = ' + type(canonical_key).__name__)
+    encoded_parts = []
+    _encode_canonical_key_tuple(canonical_key, encoded_parts)
+    return b''.join(encoded_parts)
+
+
+def compute_canonical_key_digest(canonical_key: Tuple) -> int:
+    return hash128(encode_canonical_key(canonical_key))
@@ -0,0 +1,288 @@
+import os
+import mmap
+import struct
+from enum import Enum, unique
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from emerald_message.avro_schemas.avro_schema_fingerprint import get_avro_schema_fingerprint
+from emerald_message.containers.abstract_container import AbstractContainer
+from emerald_message.containers.avro_block_reader import AvroBlockDataFileReader, AvroRecordLocation
+from emerald_message.containers.avro_message_framing import get_container_class_by_avro_schema_fingerprint
+from emerald_message.containers.avro_projection_reader import get_avro_projection_schema
+from emerald_message.containers.email.email_attachment import EmailAttachment
+from emerald_message.containers.email.email_header_index import EmailHeaderIndex
+from emerald_message.error import EmeraldMessageDeserializationError, EmeraldMessageSerializationError
+
+
+#
+#  What a sidecar index can be keyed on.  The value is the key type byte stored in the index file
+#   ADDRESS_FROM / ADDRESS_TO - envelope sender and each recipient, compared without case
+#   MESSAGE_RX_TIMESTAMP - envelope received timestamp as written (ISO 8601, so range lookups order correctly)
+#   MESSAGE_ID - the Message-ID header, as sent
+#   ATTACHMENT_DIGEST - 128 bit digest of each attachment payload (see email_attachment_digest)
+#
+@unique
+class EmailArchiveIndexKeyType(Enum):
+    ADDRESS_FROM = 1
+    ADDRESS_TO = 2
+    MESSAGE_RX_TIMESTAMP = 3
+    MESSAGE_ID = 4
+    ATTACHMENT_DIGEST = 5
+
+
+# field paths read from the archive to build each key type - everything else is skipped while indexing
+_FIELD_PATH_BY_KEY_TYPE: Dict[EmailArchiveIndexKeyType, str] = {
+    EmailArchiveIndexKeyType.ADDRESS_FROM: 'email_envelope.address_from',
+    EmailArchiveIndexKeyType.ADDRESS_TO: 'email_envelope.address_to_collection',
+    EmailArchiveIndexKeyType.MESSAGE_RX_TIMESTAMP: 'email_envelope.message_rx_timestamp_iso8601',
+    EmailArchiveIndexKeyType.MESSAGE_ID: 'email_message_metadata.email_headers',
+    EmailArchiveIndexKeyType.ATTACHMENT_DIGEST: 'email_attachment_collection'
+}
+
+EMAIL_ARCHIVE_INDEX_EXTENSION = '.idx'
+
+#
+#  Index file layout (little endian) - written once, then only ever memory mapped and binary searched:
+#   header: magic, format version, reserved, entry count, length and sync marker of the indexed AVRO file
+#   entries: one fixed size entry per (key, record), sorted by (key type, key bytes, block offset, record position)
+#       key type, key length, key offset into the key heap, block offset, record position
+#   key heap: the distinct key bytes, each stored once however many records share it
+#
+_INDEX_MAGIC = b'EMAI'
+_INDEX_FORMAT_VERSION = 1
+_INDEX_HEADER_STRUCT = struct.Struct('<4sHHQQ16s')
+_INDEX_ENTRY_STRUCT = struct.Struct('<BIQQI')
+
+
+def get_email_archive_index_uri(avro_container_uri: str) -> str:
+    return avro_container_uri + EMAIL_ARCHIVE_INDEX_EXTENSION
+
+
+def get_email_archive_index_key(key_type: EmailArchiveIndexKeyType,
+                                key_value: Union[str, int, bytes]) -> bytes:
+    if key_type == EmailArchiveIndexKeyType.ATTACHMENT_DIGEST:
+        if type(key_value) is int:
+            return key_value.to_bytes(16, byteorder='big')
+        if isinstance(key_value, bytes) and len(key_value) == 16:
+            return key_value
+        raise EmeraldMessageDeserializationError('Attachment digest keys must be an integer or 16 bytes' +
+                                                 os.linesep + 'Value provided = ' + str(key_value))
+    if type(key_value) is not str:
+        raise EmeraldMessageDeserializationError('Keys of type ' + key_type.name + ' must be strings' +
+                                                 os.linesep + 'Type provided = ' + type(key_value).__name__)
+    if key_type in (EmailArchiveIndexKeyType.ADDRESS_FROM, EmailArchiveIndexKeyType.ADDRESS_TO):
+        return key_value.strip().casefold().encode('utf-8')
+    return key_value.strip().encode('utf-8')
+
+
+def _get_datum_key_values(datum: Dict,
+                          key_type: EmailArchiveIndexKeyType) -> List[Union[str, int]]:
+    if key_type == EmailArchiveIndexKeyType.ADDRESS_FROM:
+        return [datum['email_envelope']['address_from']]
+    if key_type == EmailArchiveIndexKeyType.ADDRESS_TO:
+        return list(datum['email_envelope']['address_to_collection'])
+    if key_type == EmailArchiveIndexKeyType.MESSAGE_RX_TIMESTAMP:
+        return [datum['email_envelope']['message_rx_timestamp_iso8601']]
+    if key_type == EmailArchiveIndexKeyType.MESSAGE_ID:
+        message_id = EmailHeaderIndex.from_email_headers(datum['email_message_metadata']['email_headers']).get(
+            'Message-ID')
+        return [] if message_id is None else [message_id]
+    return [EmailAttachment.get_contents_length_and_digest_from_avro_dict(x)[1]
+            for x in datum['email_attachment_collection']]
+
+
+#
+#  Scans an EmailContainer archive (any container version) once and writes a sidecar index of the chosen keys -
+#  by default every key type - next to it (or to index_uri).  Only the key fields are decoded.  Returns the number
+#  of index entries written.  Rebuild the index whenever the archive is rewritten; stale indexes are refused
+#
+def build_email_archive_index(avro_container_uri: str,
+                              index_uri: Optional[str] = None,
+                              key_types: Optional[Iterable[EmailArchiveIndexKeyType]] = None) -> int:
+    key_types = tuple(EmailArchiveIndexKeyType) if key_types is None else tuple(key_types)
+    if len(key_types) == 0 or not all(isinstance(x, EmailArchiveIndexKeyType) for x in key_types):
+        raise EmeraldMessageSerializationError('Unable to build archive index - key_types must be a non-empty ' +
+                                               'collection of ' + EmailArchiveIndexKeyType.__name__)
+    if index_uri is None:
+        index_uri = get_email_archive_index_uri(avro_container_uri)
+
+    index_entries: List[Tuple[int, bytes, int, int]] = []
+    with open(avro_container_uri, 'rb') as avro_fp:
+        with AvroBlockDataFileReader(avro_fp, AbstractContainer.get_serialization_backend().get_datum_reader()) \
+                as reader:
+            reader.datum_reader.reader_schema = get_avro_projection_schema(
+                reader.datum_reader.writer_schema, sorted(set(_FIELD_PATH_BY_KEY_TYPE[x] for x in key_types)))
+            for record_location, datum in reader.iter_with_locations():
+                for key_type in key_types:
+                    for key_value in _get_datum_key_values(datum, key_type):
+                        index_entries.append((key_type.value,
+                                              get_email_archive_index_key(key_type, key_value),
+                                              record_location.block_offset,
+                                              record_location.record_position))
+            sync_marker = reader.sync_marker
+            avro_container_length = reader.file_length
+    # a key repeated within a record (the same attachment twice) points at the record once
+    index_entries = sorted(set(index_entries))
+
+    key_heap = bytearray()
+    key_offset_by_key: Dict[bytes, int] = {}
+    index_temporary_uri = index_uri + '.tmp'
+    try:
+        with open(index_temporary_uri, 'wb') as index_fp:
+            index_fp.write(_INDEX_HEADER_STRUCT.pack(_INDEX_MAGIC, _INDEX_FORMAT_VERSION, 0, len(index_entries),
+                                                     avro_container_length, sync_marker))
+            for key_type_value, key, block_offset, record_position in index_entries:
+                key_offset = key_offset_by_key.get(key)
+                if key_offset is None:
+                    key_offset = len(key_heap)
+                    key_offset_by_key[key] = key_offset
+                    key_heap.extend(key)
+                index_fp.write(_INDEX_ENTRY_STRUCT.pack(key_type_value, len(key), key_offset, block_offset,
+                                                        record_position))
+            index_fp.write(key_heap)
+        os.replace(index_temporary_uri, index_uri)
+    except BaseException:
+        if os.path.exists(index_temporary_uri):
+            os.remove(index_temporary_uri)
+        raise
+    return len(index_entries)
+
+
+#
+#  Read side of the sidecar index: the file is memory mapped and binary searched in place, so opening it costs
+#  the same whatever its size and lookups touch only a few pages
+#       with EmailArchiveIndex(get_email_archive_index_uri('/archive/batch.avro')) as archive_index:
+#           record_locations = archive_index.lookup(EmailArchiveIndexKeyType.MESSAGE_ID, '<abc@example.com>')
+#
+class EmailArchiveIndex:
+    @property
+    def index_uri(self) -> str:
+        return self._index_uri
+
+    @property
+    def entry_count(self) -> int:
+        return self._entry_count
+
+    @property
+    def sync_marker(self) -> bytes:
+        return self._sync_marker
+
+    @property
+    def avro_container_length(self) -> int:
+        return self._avro_container_length
+
+    def _get_entry(self,
+                   entry_number: int) -> Tuple[int, bytes, int, int]:
+        key_type_value, key_length, key_offset, block_offset, record_position = _INDEX_ENTRY_STRUCT.unpack_from(
+            self._index_map, _INDEX_HEADER_STRUCT.size + entry_number * _INDEX_ENTRY_STRUCT.size)
+        key_start = self._key_heap_offset + key_offset
+        return key_type_value, self._index_map[key_start:key_start + key_length], block_offset, record_position
+
+    # first entry whose (key type, key) is not below the one given
+    def _find_first_entry(self,
+                          key_type_value: int,
+                          key: bytes) -> int:
+        low, high = 0, self._entry_count
+        while low < high:
+            middle = (low + high) // 2
+            entry_key_type_value, entry_key, _, _ = self._get_entry(middle)
+            if (entry_key_type_value, entry_key) < (key_type_value, key):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    # record locations, in file order, for keys from low_key_value (inclusive) to high_key_value (exclusive)
+    def lookup_range(self,
+                     key_type: EmailArchiveIndexKeyType,
+                     low_key_value: Union[str, int, bytes],
+                     high_key_value: Union[str, int, bytes]) -> List[AvroRecordLocation]:
+        high_key = get_email_archive_index_key(key_type, high_key_value)
+        record_locations = []
+        for entry_number in range(self._find_first_entry(key_type.value,
+                                                         get_email_archive_index_key(key_type, low_key_value)),
+                                  self._entry_count):
+            entry_key_type_value, entry_key, block_offset, record_position = self._get_entry(entry_number)
+            if entry_key_type_value != key_type.value or entry_key >= high_key:
+                break
+            record_locations.append(AvroRecordLocation(block_offset=block_offset, record_position=record_position))
+        return sorted(set(record_locations), key=lambda x: (x.block_offset, x.record_position))
+
+    # record locations, in file order, of every record with the key
+    def lookup(self,
+               key_type: EmailArchiveIndexKeyType,
+               key_value: Union[str, int, bytes]) -> List[AvroRecordLocation]:
+        key = get_email_archive_index_key(key_type, key_value)
+        record_locations = []
+        for entry_number in range(self._find_first_entry(key_type.value, key), self._entry_count):
+            entry_key_type_value, entry_key, block_offset, record_position = self._get_entry(entry_number)
+            if entry_key_type_value != key_type.value or entry_key != key:
+                break
+            record_locations.append(AvroRecordLocation(block_offset=block_offset, record_position=record_position))
+        return record_locations
+
+    def close(self):
+        if self._index_map is not None:
+            self._index_map.close()
+            self._index_map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __init__(self,
+                 index_uri: str):
+        self._index_uri = index_uri
+        self._index_map = None
+        with open(index_uri, 'rb') as index_fp:
+            self._index_map = mmap.mmap(index_fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(self._index_map) < _INDEX_HEADER_STRUCT.size:
+                raise EmeraldMessageDeserializationError('Unable to open archive index "' + index_uri +
+                                                         '" - file is too short to be an index')
+            index_magic, index_format_version, _, self._entry_count, self._avro_container_length, \
+                self._sync_marker = _INDEX_HEADER_STRUCT.unpack_from(self._index_map, 0)
+            if index_magic != _INDEX_MAGIC or index_format_version != _INDEX_FORMAT_VERSION:
+                raise EmeraldMessageDeserializationError(
+                    'Unable to open archive index "' + index_uri + '" - not an index of format version ' +
+                    str(_INDEX_FORMAT_VERSION))
+            self._key_heap_offset = _INDEX_HEADER_STRUCT.size + self._entry_count * _INDEX_ENTRY_STRUCT.size
+            if len(self._index_map) < self._key_heap_offset:
+                raise EmeraldMessageDeserializationError('Unable to open archive index "' + index_uri +
+                                                         '" - file is truncated')
+        except BaseException:
+            self.close()
+            raise
+
+
+#
+#  Reads the containers at the given locations - each block is reached by seeking, so nothing before it is read.
+#  The container class follows the schema in the archive header; keyword arguments go to its from_avro_as_dict
+#  (for example attachment_store for EmailContainerV3).  An index built for another version of the archive is
+#  refused:
+#       with EmailArchiveIndex(get_email_archive_index_uri(avro_container_uri)) as archive_index:
+#           for email_container in iter_email_containers_at_locations(
+#                   avro_container_uri,
+#                   archive_index.lookup(EmailArchiveIndexKeyType.ADDRESS_FROM, 'orders@example.com'),
+#                   archive_index=archive_index):
+#               ...
+#
+def iter_email_containers_at_locations(avro_container_uri: str,
+                                       record_locations: Iterable[AvroRecordLocation],
+                                       archive_index: Optional[EmailArchiveIndex] = None,
+                                       **from_avro_as_dict_kwargs) -> Iterator[AbstractContainer]:
+    with open(avro_container_uri, 'rb') as avro_fp:
+        with AvroBlockDataFileReader(avro_fp, AbstractContainer.get_serialization_backend().get_datum_reader()) \
+                as reader:
+            if archive_index is not None and (archive_index.sync_marker != reader.sync_marker or
+                                              archive_index.avro_container_length != reader.file_length):
+                raise EmeraldMessageDeserializationError(
+                    'Archive index "' + archive_index.index_uri + '" was not built from the current "' +
+                    avro_container_uri + '" - rebuild it with build_email_archive_index')
+            container_class = get_container_class_by_avro_schema_fingerprint(
+                get_avro_schema_fingerprint(reader.datum_reader.writer_schema))
+            for record_location in record_locations:
+                yield container_class.from_avro_as_dict(reader.read_record_at(record_location),
+                                                        **from_avro_as_dict_kwargs)
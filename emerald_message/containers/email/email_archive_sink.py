@@ -0,0 +1,502 @@
+import os
+import re
+import uuid
+import queue
+import datetime
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum, unique
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+from avro.datafile import SYNC_INTERVAL
+from avro.io import AvroTypeException
+
+from emerald_message.containers.avro_data_file_writer import AvroDataFileWriter, AvroCodecConfigurationRecord
+from emerald_message.containers.email.email_container import EmailContainer
+from emerald_message.containers.email.email_container_v2 import EmailContainerV2
+from emerald_message.error import EmeraldMessageSerializationError
+from emerald_message.logging.logger import EmeraldLogger
+
+# shared by all sinks - there are normally one or two per process
+_email_archive_sink_logger = EmeraldLogger(logging_module_name='EmailArchiveSink')
+
+
+#
+#  How far written containers are forced to disk:
+#   NEVER - left to the operating system; after a crash even finalized files may be incomplete
+#   ON_FINALIZE - each file is fsynced before it is renamed into place, and its directory after, so a file under
+#       its final name is always complete.  Records in files still open can be lost
+#   ON_GROUP_COMMIT - as ON_FINALIZE, and every open file is also fsynced at each group commit, so a container is on
+#       disk once flush() returns (in the .tmp file - readable up to its last block if the process dies)
+#
+@unique
+class EmailArchiveSinkFsyncPolicy(Enum):
+    NEVER = 1
+    ON_FINALIZE = 2
+    ON_GROUP_COMMIT = 3
+
+
+'''
+Configuration for an EmailArchiveSink
+    container_class: EmailContainer version the archive files are written with - containers of other versions are
+        rebuilt as this one (every version shares the same parameters)
+    max_queue_size: containers accepted but not yet written.  When the queue is full put blocks, so producers are
+        slowed to the speed of the disk rather than memory growing
+    put_timeout_seconds: how long put waits for room before raising a retriable error (None waits indefinitely)
+    group_commit_max_records: the writer thread takes up to this many queued containers, writes them and then
+        commits them together - one flush (and fsync, by policy) per group instead of one per container
+    group_commit_max_delay_seconds: how long the writer waits after the first container of a group for more to
+        arrive before committing.  0 commits whatever is queued at once; containers arriving during a commit
+        still form the next group
+    fsync_policy: see EmailArchiveSinkFsyncPolicy
+    max_records_per_file / max_bytes_per_file / max_file_age_seconds: a partition file is finalized once any limit
+        is reached (None for no limit).  The age limit also finalizes the files of hours that have passed
+    block_size_bytes / codec_configuration_record: as for ContainerBatchWriterConfigurationRecord
+'''
+
+
+@dataclass(frozen=True)
+class EmailArchiveSinkConfigurationRecord:
+    container_class: Type[EmailContainer] = EmailContainerV2
+    max_queue_size: int = 10000
+    put_timeout_seconds: Optional[float] = None
+    group_commit_max_records: int = 1000
+    group_commit_max_delay_seconds: float = 0.0
+    fsync_policy: EmailArchiveSinkFsyncPolicy = EmailArchiveSinkFsyncPolicy.ON_FINALIZE
+    max_records_per_file: Optional[int] = 100000
+    max_bytes_per_file: Optional[int] = 256 * 1024 * 1024
+    max_file_age_seconds: Optional[float] = 300.0
+    block_size_bytes: int = SYNC_INTERVAL
+    codec_configuration_record: Optional[AvroCodecConfigurationRecord] = None
+
+
+AVRO_ARCHIVE_FILE_EXTENSION = '.avro'
+# suffix of files still being written - never read these as archives
+AVRO_ARCHIVE_TEMPORARY_FILE_SUFFIX = '.tmp'
+
+# how often an idle writer thread wakes to finalize files past max_file_age_seconds
+_IDLE_POLL_SECONDS = 1.0
+
+# router source tags become directory names - anything but letters, digits, _ and - is replaced
+_UNSAFE_PATH_CHARACTERS_RE = re.compile(r'[^A-Za-z0-9_\-]')
+
+# format written by EmeraldLogger.get_iso8601_utc_now_string
+_ROUTED_TIMESTAMP_FORMAT = '%Y%m%dT%H:%M:%S%z'
+
+# queued to end the writer thread
+_STOP_WRITER = object()
+
+
+#
+#  (date, hour, router source tag) directory components for a container, from the routed timestamp in UTC:
+#       20240101/10/router-0
+#
+def get_email_archive_partition(email_container: EmailContainer) -> Tuple[str, str, str]:
+    email_message_metadata = email_container.email_message_metadata
+    routed_timestamp_iso8601 = email_message_metadata.routed_timestamp_iso8601
+    try:
+        routed_timestamp = datetime.datetime.strptime(routed_timestamp_iso8601, _ROUTED_TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        try:
+            routed_timestamp = datetime.datetime.fromisoformat(routed_timestamp_iso8601)
+        except (TypeError, ValueError):
+            raise EmeraldMessageSerializationError(
+                'Unable to archive email - routed timestamp is not an ISO 8601 timestamp' +
+                os.linesep + 'Value = ' + str(routed_timestamp_iso8601))
+    # timestamps without a zone are taken to be UTC, as written by the router
+    if routed_timestamp.tzinfo is not None:
+        routed_timestamp = routed_timestamp.astimezone(datetime.timezone.utc)
+
+    router_source_tag = _UNSAFE_PATH_CHARACTERS_RE.sub('_', str(email_message_metadata.router_source_tag))
+    return routed_timestamp.strftime('%Y%m%d'), routed_timestamp.strftime('%H'), \
+        router_source_tag if len(router_source_tag) > 0 else '_'
+
+
+def _fsync_directory(directory: str):
+    # directories cannot be opened for fsync on every platform - the rename is still atomic there
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    directory_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
+
+
+#
+#  One archive file of one partition, written under a temporary name and renamed to its final name by finalize
+#
+class _EmailArchivePartitionFile:
+    @property
+    def avro_container_uri(self) -> str:
+        return self._avro_container_uri
+
+    @property
+    def record_count(self) -> int:
+        return self._record_count
+
+    def append(self,
+               datum: Dict):
+        self._writer.append(datum)
+        self._record_count += 1
+
+    def is_full(self,
+                now_monotonic: float) -> bool:
+        configuration_record = self._configuration_record
+        if configuration_record.max_records_per_file is not None and \
+                self._record_count >= configuration_record.max_records_per_file:
+            return True
+        if configuration_record.max_bytes_per_file is not None and \
+                self._writer.estimated_file_size_bytes >= configuration_record.max_bytes_per_file:
+            return True
+        return configuration_record.max_file_age_seconds is not None and \
+            now_monotonic - self._opened_monotonic >= configuration_record.max_file_age_seconds
+
+    # ends the current block so everything appended is in the file - nothing is done if nothing was appended
+    def commit(self,
+               fsync: bool):
+        if self._committed_record_count == self._record_count:
+            return
+        self._writer.flush()
+        if fsync:
+            os.fsync(self._writer_fp.fileno())
+        self._committed_record_count = self._record_count
+
+    def finalize(self,
+                 fsync: bool) -> str:
+        self._writer.flush()
+        if fsync:
+            os.fsync(self._writer_fp.fileno())
+        self._writer.close()
+        os.replace(self._avro_container_temporary_uri, self._avro_container_uri)
+        if fsync:
+            _fsync_directory(os.path.dirname(self._avro_container_uri))
+        return self._avro_container_uri
+
+    # release the file after a failure - it keeps its temporary name
+    def abandon(self):
+        try:
+            self._writer_fp.close()
+        except OSError:
+            pass
+
+    def __init__(self,
+                 avro_container_uri: str,
+                 configuration_record: EmailArchiveSinkConfigurationRecord):
+        self._avro_container_uri = avro_container_uri
+        self._avro_container_temporary_uri = avro_container_uri + AVRO_ARCHIVE_TEMPORARY_FILE_SUFFIX
+        self._configuration_record = configuration_record
+        self._record_count = 0
+        self._committed_record_count = 0
+        self._opened_monotonic = time.monotonic()
+
+        os.makedirs(os.path.dirname(avro_container_uri), exist_ok=True)
+        container_class = configuration_record.container_class
+        avro_schema = container_class.get_avro_schema_record().avro_schema
+        self._writer_fp = open(self._avro_container_temporary_uri, 'wb')
+        self._writer = AvroDataFileWriter(self._writer_fp,
+                                          container_class.get_serialization_backend().get_datum_writer(avro_schema),
+                                          avro_schema,
+                                          codec_configuration_record=configuration_record.codec_configuration_record,
+                                          block_size_bytes=configuration_record.block_size_bytes)
+
+
+#
+#  Continuously archives EmailContainers from any number of producer threads into AVRO files partitioned by
+#  routed hour and router source tag:
+#       <root_directory>/20240101/10/router-0/<sink id>-000001.avro
+#       with EmailArchiveSink('/var/mail/archive') as archive_sink:
+#           archive_sink.put(parsed_email.email_container)
+#  put only queues the container; one background thread writes the queue out in group commits.  The queue is
+#  bounded, so bursts block producers (or fail put after put_timeout_seconds) instead of growing memory.  Files are
+#  written as <name>.avro.tmp and renamed to <name>.avro when finalized, so anything under the final name is a
+#  complete archive.  flush() waits until everything put before it is committed; close() drains the queue and
+#  finalizes every open file - always close the sink, the writer thread does not keep the process alive.
+#  file_finalized_callback, when given, is called from the writer thread with the path of each finalized file (to
+#  index or upload it, for example)
+#
+class EmailArchiveSink:
+    @property
+    def root_directory(self) -> str:
+        return self._root_directory
+
+    @property
+    def configuration_record(self) -> EmailArchiveSinkConfigurationRecord:
+        return self._configuration_record
+
+    @property
+    def queued_count(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def written_record_count(self) -> int:
+        return self._written_record_count
+
+    # containers that did not match the archive schema - logged and skipped by the writer thread
+    @property
+    def rejected_record_count(self) -> int:
+        return self._rejected_record_count
+
+    @property
+    def finalized_file_count(self) -> int:
+        return self._finalized_file_count
+
+    def _raise_if_writer_failed(self):
+        if self._writer_error is not None:
+            raise EmeraldMessageSerializationError(
+                'Email archive sink for "' + self._root_directory + '" has stopped - the writer thread failed' +
+                os.linesep + 'Error info: ' + str(self._writer_error))
+
+    # the queue is waited on in short steps so a writer thread that has failed is noticed by blocked producers
+    def _put_queue_item(self,
+                        item,
+                        timeout_seconds: Optional[float]):
+        deadline = None if timeout_seconds is None else time.monotonic() + timeout_seconds
+        while True:
+            self._raise_if_writer_failed()
+            wait_seconds = _IDLE_POLL_SECONDS if deadline is None else \
+                min(_IDLE_POLL_SECONDS, max(deadline - time.monotonic(), 0.0))
+            try:
+                self._queue.put(item, timeout=wait_seconds)
+                return
+            except queue.Full:
+                if deadline is not None and time.monotonic() >= deadline:
+                    backpressure_error = EmeraldMessageSerializationError(
+                        'Unable to archive email - the archive sink queue is full (' +
+                        str(self._configuration_record.max_queue_size) + ' containers)' +
+                        os.linesep + 'Retry once the writer has caught up')
+                    backpressure_error.retriable = True
+                    raise backpressure_error
+
+    def put(self,
+            email_container: EmailContainer):
+        if self._closed:
+            raise EmeraldMessageSerializationError('Unable to archive email - archive sink for "' +
+                                                   self._root_directory + '" has already been closed')
+        if not isinstance(email_container, EmailContainer):
+            raise EmeraldMessageSerializationError(
+                'Unable to archive email - the archive sink cannot accept object of type "' +
+                type(email_container).__name__ + '"')
+        # the partition is worked out here so a bad timestamp is reported to the producer, not the writer thread
+        partition = get_email_archive_partition(email_container)
+        self._put_queue_item((partition, email_container),
+                             timeout_seconds=self._configuration_record.put_timeout_seconds)
+
+    # True once everything put before the call is committed, False if timeout_seconds passed first
+    def flush(self,
+              timeout_seconds: Optional[float] = None) -> bool:
+        if self._closed:
+            return True
+        commit_event = threading.Event()
+        self._put_queue_item(commit_event, timeout_seconds=timeout_seconds)
+        committed = commit_event.wait(timeout_seconds)
+        self._raise_if_writer_failed()
+        return committed
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer_thread.is_alive():
+            try:
+                self._put_queue_item(_STOP_WRITER, timeout_seconds=None)
+            except EmeraldMessageSerializationError:
+                pass
+            self._writer_thread.join()
+        self._raise_if_writer_failed()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    ###############
+    #  Writer thread - everything below runs only there
+    ###############
+
+    def _get_partition_file(self,
+                            partition: Tuple[str, str, str]) -> _EmailArchivePartitionFile:
+        partition_file = self._partition_file_by_partition.get(partition)
+        if partition_file is None:
+            self._file_sequence += 1
+            partition_file = _EmailArchivePartitionFile(
+                avro_container_uri=os.path.join(self._root_directory, *partition) + os.sep + self._sink_id + '-' +
+                str(self._file_sequence).zfill(6) + AVRO_ARCHIVE_FILE_EXTENSION,
+                configuration_record=self._configuration_record)
+            self._partition_file_by_partition[partition] = partition_file
+        return partition_file
+
+    def _write_container(self,
+                         partition: Tuple[str, str, str],
+                         email_container: EmailContainer):
+        container_class = self._configuration_record.container_class
+        if type(email_container) is not container_class:
+            email_container = container_class._from_trusted_container_parameters(
+                container_parameters=email_container._get_container_parameters())
+        partition_file = self._get_partition_file(partition)
+        try:
+            partition_file.append(email_container.get_as_dict())
+        except AvroTypeException as iex:
+            # the datum is checked against the schema before anything is encoded, so the file is unharmed
+            self._rejected_record_count += 1
+            _email_archive_sink_logger.logger.error(
+                'Skipping email that does not match the ' + container_class.__name__ + ' schema' +
+                os.linesep + 'Error info: ' + str(iex.args[0]))
+            return
+        self._written_record_count += 1
+        # the limits are checked per container so no file overshoots them by a whole group
+        if partition_file.is_full(time.monotonic()):
+            self._finalize_partition_file(partition)
+
+    def _finalize_partition_file(self,
+                                 partition: Tuple[str, str, str]):
+        partition_file = self._partition_file_by_partition.pop(partition)
+        avro_container_uri = partition_file.finalize(
+            fsync=self._configuration_record.fsync_policy != EmailArchiveSinkFsyncPolicy.NEVER)
+        self._finalized_file_count += 1
+        if self._file_finalized_callback is not None:
+            try:
+                self._file_finalized_callback(avro_container_uri)
+            except Exception as ex:
+                _email_archive_sink_logger.logger.error('File finalized callback failed for "' + avro_container_uri +
+                                                        '"' + os.linesep + 'Error info: ' + str(ex))
+
+    def _commit(self):
+        fsync = self._configuration_record.fsync_policy == EmailArchiveSinkFsyncPolicy.ON_GROUP_COMMIT
+        now_monotonic = time.monotonic()
+        for partition, partition_file in list(self._partition_file_by_partition.items()):
+            if partition_file.is_full(now_monotonic):
+                self._finalize_partition_file(partition)
+            else:
+                partition_file.commit(fsync=fsync)
+
+    # (containers, commit events, stop) - blocks for the first item only up to the idle poll
+    def _take_group(self) -> Tuple[List[Tuple[Tuple[str, str, str], EmailContainer]], List[threading.Event], bool]:
+        group, commit_events = [], []
+        try:
+            item = self._queue.get(timeout=_IDLE_POLL_SECONDS)
+        except queue.Empty:
+            return group, commit_events, False
+        deadline = time.monotonic() + self._configuration_record.group_commit_max_delay_seconds
+        while True:
+            if item is _STOP_WRITER:
+                return group, commit_events, True
+            if isinstance(item, threading.Event):
+                # commit now rather than keep the flushing caller waiting for the group to fill
+                commit_events.append(item)
+                return group, commit_events, False
+            group.append(item)
+            if len(group) >= self._configuration_record.group_commit_max_records:
+                return group, commit_events, False
+            try:
+                remaining_seconds = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining_seconds) if remaining_seconds > 0 else \
+                    self._queue.get_nowait()
+            except queue.Empty:
+                return group, commit_events, False
+
+    def _run_writer(self):
+        commit_events: List[threading.Event] = []
+        try:
+            stop = False
+            while not stop:
+                group, commit_events, stop = self._take_group()
+                for partition, email_container in group:
+                    self._write_container(partition, email_container)
+                # an idle pass still commits, which finalizes files past their age
+                self._commit()
+                for commit_event in commit_events:
+                    commit_event.set()
+            for partition in list(self._partition_file_by_partition.keys()):
+                self._finalize_partition_file(partition)
+        except BaseException as ex:
+            self._writer_error = ex
+            _email_archive_sink_logger.logger.error('Email archive sink writer failed - open files are left with ' +
+                                                    'their temporary names' + os.linesep + 'Error info: ' + str(ex))
+            for partition_file in self._partition_file_by_partition.values():
+                partition_file.abandon()
+            self._partition_file_by_partition.clear()
+            # release anyone waiting in flush - they see the failure
+            for commit_event in commit_events:
+                commit_event.set()
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def __init__(self,
+                 root_directory: str,
+                 configuration_record: Optional[EmailArchiveSinkConfigurationRecord] = None,
+                 file_finalized_callback: Optional[Callable[[str], None]] = None):
+        if type(root_directory) is not str or len(root_directory) == 0:
+            raise EmeraldMessageSerializationError(
+                'Unable to archive email - root_directory must be a non-empty string')
+        if configuration_record is None:
+            configuration_record = EmailArchiveSinkConfigurationRecord()
+        if not isinstance(configuration_record, EmailArchiveSinkConfigurationRecord):
+            raise EmeraldMessageSerializationError(
+                'Unable to archive email - configuration_record must be of type ' +
+                EmailArchiveSinkConfigurationRecord.__name__ +
+                os.linesep + 'Type provided = ' + type(configuration_record).__name__)
+        if not isinstance(configuration_record.container_class, type) or \
+                not issubclass(configuration_record.container_class, EmailContainer):
+            raise EmeraldMessageSerializationError(
+                'Unable to archive email - container_class must be a class extending ' + EmailContainer.__name__ +
+                os.linesep + 'Value provided = ' + str(configuration_record.container_class))
+        if not isinstance(configuration_record.fsync_policy, EmailArchiveSinkFsyncPolicy):
+            raise EmeraldMessageSerializationError(
+                'Unable to archive email - fsync_policy must be an ' + EmailArchiveSinkFsyncPolicy.__name__ +
+                os.linesep + 'Value provided = ' + str(configuration_record.fsync_policy))
+        for limit_name in ('max_queue_size', 'group_commit_max_records', 'block_size_bytes'):
+            limit_value = getattr(configuration_record, limit_name)
+            if type(limit_value) is not int or limit_value <= 0:
+                raise EmeraldMessageSerializationError(
+                    'Unable to archive email - ' + limit_name + ' must be a positive integer' +
+                    os.linesep + 'Value provided = ' + str(limit_value))
+        for limit_name in ('max_records_per_file', 'max_bytes_per_file'):
+            limit_value = getattr(configuration_record, limit_name)
+            if limit_value is not None and (type(limit_value) is not int or limit_value <= 0):
+                raise EmeraldMessageSerializationError(
+                    'Unable to archive email - ' + limit_name + ' must be None or a positive integer' +
+                    os.linesep + 'Value provided = ' + str(limit_value))
+        for limit_name in ('put_timeout_seconds', 'max_file_age_seconds'):
+            limit_value = getattr(configuration_record, limit_name)
+            if limit_value is not None and (not isinstance(limit_value, (int, float)) or limit_value <= 0):
+                raise EmeraldMessageSerializationError(
+                    'Unable to archive email - ' + limit_name + ' must be None or a positive number' +
+                    os.linesep + 'Value provided = ' + str(limit_value))
+        if not isinstance(configuration_record.group_commit_max_delay_seconds, (int, float)) or \
+                configuration_record.group_commit_max_delay_seconds < 0:
+            raise EmeraldMessageSerializationError(
+                'Unable to archive email - group_commit_max_delay_seconds must be a non-negative number' +
+                os.linesep + 'Value provided = ' + str(configuration_record.group_commit_max_delay_seconds))
+        if configuration_record.codec_configuration_record is not None:
+            try:
+                AvroDataFileWriter.validate_codec_configuration_record(
+                    configuration_record.codec_configuration_record)
+            except ValueError as vex:
+                raise EmeraldMessageSerializationError('Unable to archive email - ' + str(vex))
+
+        self._root_directory = root_directory
+        self._configuration_record = configuration_record
+        self._file_finalized_callback = file_finalized_callback
+        self._queue = queue.Queue(maxsize=configuration_record.max_queue_size)
+        self._closed = False
+        self._writer_error: Optional[BaseException] = None
+        self._written_record_count = 0
+        self._rejected_record_count = 0
+        self._finalized_file_count = 0
+
+        # file names start with a per-sink id so sinks in several processes can share a root directory
+        self._sink_id = datetime.datetime.now(tz=datetime.timezone.utc).strftime('%Y%m%dT%H%M%S') + '-' + \
+            uuid.uuid4().hex[:8]
+        self._file_sequence = 0
+        self._partition_file_by_partition: Dict[Tuple[str, str, str], _EmailArchivePartitionFile] = {}
+
+        self._writer_thread = threading.Thread(target=self._run_writer, name='EmailArchiveSinkWriter', daemon=True)
+        self._writer_thread.start()
@@ -1,139 +1,138 @@
 import os
-from spooky import hash128
+import base64
+from enum import Enum, unique
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 
 from emerald_message.containers.abstract_container import AbstractContainer, ContainerSchemaMatchingIdentifier, \
     ContainerParameters
+from emerald_message.containers.avro_data_file_writer import AvroCodecConfigurationRecord
+from emerald_message.containers.email.email_attachment_digest import compute_email_attachment_digest
+from emerald_message.containers.email.email_attachment_store import AbstractEmailAttachmentStore
 from emerald_message.avro_schemas.avro_message_schema_family import AvroMessageSchemaFamily
-from emerald_message.error import EmeraldMessageDeserializationError
+from emerald_message.avro_schemas.avro_message_schemas import AvroMessageSchemaFrozen, AvroMessageSchemaRecord
+from emerald_message.error import EmeraldMessageDeserializationError, EmeraldMessageContainerInitializationError
+
+
+#
+#  How the attachment payload is held (and serialized when written on its own):
+#   BASE64 - contents_base64 holds base64 encoded bytes, written with the EmailAttachment schema
+#   RAW - contents holds the original bytes, written with the EmailAttachmentRaw schema
+#   REFERENCE - the payload lives in an attachment store and only its digest and length are held, written with the
+#       EmailAttachmentReference schema.  The payload is fetched from the store each time contents is read
+#  Any form can be read back in the others through the contents / contents_base64 properties, which convert
+#  on demand
+#
+@unique
+class EmailAttachmentStorageMode(Enum):
+    BASE64 = 'EmailAttachment'
+    RAW = 'EmailAttachmentRaw'
+    REFERENCE = 'EmailAttachmentReference'
 
-
-@dataclass(frozen=True)
+    @property
+    def avro_schema_name(self) -> str:
+        return self.value
+
+
+#
+#  Provide exactly one of contents_base64 (the original layout) or contents (raw bytes), or neither for a reference
+#   into attachment_store, in which case contents_digest and contents_length are required
+#  contents may also be a read-only bytes-like buffer (such as the mmap used when the parser spills a large
+#   attachment to disk) - it is only copied into bytes when serialized
+#  contents_digest is optional - pass it when it was already computed while streaming the payload in so it is
+#   not hashed a second time.  It is not serialized
+#
+@dataclass(frozen=True, slots=True)
 class EmailAttachmentParameters(ContainerParameters):
     filename: str
     mimetype: str
-    contents_base64: str
+    contents_base64: Optional[bytes] = None
+    contents: Optional[bytes] = None
+    contents_digest: Optional[int] = None
+    contents_length: Optional[int] = None
+    attachment_store: Optional[AbstractEmailAttachmentStore] = None
 
 
 class EmailAttachment(AbstractContainer):
+    __slots__ = ('_contents_length', '_contents_digest')
+
     @property
     def filename(self) -> str:
-        return self._get_container_parameters().filename
+        return self._container_parameters.filename
 
     @property
     def mimetype(self) -> str:
-        return self._get_container_parameters().mimetype
+        return self._container_parameters.mimetype
+
+    @property
+    def attachment_storage_mode(self) -> EmailAttachmentStorageMode:
+        if self._container_parameters.contents is not None:
+            return EmailAttachmentStorageMode.RAW
+        if self._container_parameters.contents_base64 is not None:
+            return EmailAttachmentStorageMode.BASE64
+        return EmailAttachmentStorageMode.REFERENCE
+
+    @property
+    def attachment_store(self) -> Optional[AbstractEmailAttachmentStore]:
+        return self._container_parameters.attachment_store
+
+    # base64 is only computed here, on demand, for attachments held as raw bytes
+    @property
+    def contents_base64(self) -> bytes:
+        if self._container_parameters.contents_base64 is not None:
+            return self._container_parameters.contents_base64
+        return base64.b64encode(self.contents)
+
+    @property
+    def contents(self) -> bytes:
+        if self._container_parameters.contents is not None:
+            return self._container_parameters.contents
+        if self._container_parameters.contents_base64 is not None:
+            return base64.b64decode(self._container_parameters.contents_base64)
+
+        # references are resolved lazily and not kept - holding on to them would defeat the store
+        contents = self._container_parameters.attachment_store.get_contents(self._contents_digest)
+        if len(contents) != self._contents_length:
+            raise EmeraldMessageDeserializationError(
+                'Attachment "' + str(self.filename) + '" read from attachment store has length ' +
+                str(len(contents)) + ' but the reference records length ' + str(self._contents_length))
+        return contents
+
+    # computed once in the constructor - the payload is never re-read for length, hashing or comparison
+    @property
+    def contents_length(self) -> int:
+        return self._contents_length
+
+    # 128 bit digest of the raw bytes - see email_attachment_digest for how large payloads are chunked
+    @property
+    def contents_digest(self) -> int:
+        return self._contents_digest
 
+    # filename and mimetype first so sorting stays readable, then size and digest to separate payloads
     @property
-    def contents_base64(self) -> str:
-        return self._get_container_parameters().contents_base64
+    def comparison_key(self) -> Tuple[str, str, int, int]:
+        return self.canonical_key
 
     @classmethod
     def _get_container_parameters_required_subclass_type(cls):
         return EmailAttachmentParameters
 
     def __str__(self):
-        print('The type of content = ' + type(self.contents_base64).__name__ +
-              os.linesep + 'The value = ' + str(self.contents_base64))
+        # never log the payload itself - it can be many megabytes
+        container_logger = type(self).get_logger()
+        if container_logger.is_debug_enabled:
+            container_logger.logger.debug('The storage mode of content = ' + self.attachment_storage_mode.name)
+        # length and hash are always taken over the raw bytes so the same attachment renders the same
+        #  regardless of storage mode
         return 'Filename: "' + str(self.filename) + '"' + os.linesep + \
                'Mimetype: "' + str(self.mimetype) + '"' + os.linesep + \
-               'Content length: "' + str(len(self.contents_base64)) + '"' + os.linesep + \
-               'Content hash128"' + str(hash128(self.contents_base64)).encode('utf-8').hex() + '"'
+               'Content length: "' + str(self.contents_length) + '"' + os.linesep + \
+               'Content hash128"' + str(self.contents_digest).encode('utf-8').hex() + '"'
 
     # use spooky hash in 128 bit length as the attachments could be quite large - no collisions!
-    #  then we can hash the string rendering normally
-    def __hash__(self):
-        return hash(str(self))
-
-    def __eq__(self, other):
-        if not isinstance(other, EmailAttachment):
-            return False
-
-        if self.filename != other.filename:
-            return False
-
-        if self.mimetype != other.mimetype:
-            return False
-
-        # use the hash comparison so we have consistent use of spooky hash
-        if hash128(self.contents_base64) != hash128(other.contents_base64):
-            return False
-
-        return True
-
-    def __ne__(self, other):
-        return not  self.__eq__(other)
-
-    def __lt__(self, other):
-        if not isinstance(other, EmailAttachment):
-            raise TypeError('Cannot compare object of type "' + type(other).__name__ + '" to ' +
-                            EmailAttachment.__name__)
-
-        if self.filename < other.filename:
-            return True
-        elif self.filename > other.filename:
-            return False
-
-        if self.mimetype < other.mimetype:
-            return True
-        elif self.mimetype > other.mimetype:
-            return False
-
-        # first check length of body base64
-        if len(self.contents_base64) < len(other.contents_base64):
-            return True
-        elif len(self.contents_base64) > len(other.contents_base64):
-            return False
-
-        # now if we compare a gigantic attachment literally it will take forever so compare hashes instead
-        hash_self = hash128(self.contents_base64)
-        hash_other = hash128(other.contents_base64)
-        if hash_self < hash_other:
-            return True
-        elif hash_self > hash_other:
-            return False
-
-        # getting here means they are equal
-        return False
-
-    def __gt__(self, other):
-        if not isinstance(other, EmailAttachment):
-            raise TypeError('Cannot compare object of type "' + type(other).__name__ + '" to ' +
-                            EmailAttachment.__name__)
-
-        if self.filename > other.filename:
-            return True
-        elif self.filename < other.filename:
-            return False
-
-        if self.mimetype > other.mimetype:
-            return True
-        elif self.mimetype < other.mimetype:
-            return False
-
-        # first check length of body base64
-        if len(self.contents_base64) > len(other.contents_base64):
-            return True
-        elif len(self.contents_base64) < len(other.contents_base64):
-            return False
-
-        # now if we compare a gigantic attachment literally it will take forever so compare hashes instead
-        hash_self = hash128(self.contents_base64)
-        hash_other = hash128(other.contents_base64)
-        if hash_self > hash_other:
-            return True
-        elif hash_self < hash_other:
-            return False
-
-        # getting here means they are equal
-        return False
-
-    def __ge__(self, other):
-        return not self.__lt__(other)
-
-    def __le__(self, other):
-        return not self.__gt__(other)
+    #  the digest is computed once in the constructor, so the key never touches the payload
+    def _get_canonical_key(self) -> Tuple:
+        return self.filename, self.mimetype, self._contents_length, self._contents_digest
 
     @classmethod
     def get_container_schema_matching_identifier(cls) -> ContainerSchemaMatchingIdentifier:
@@ -142,7 +141,45 @@ class EmailAttachment(AbstractContainer):
             container_avro_schema_name='EmailAttachment'
         )
 
-    def get_as_dict(self) -> Dict:
+    @classmethod
+    def get_avro_schema_record_for_storage_mode(cls,
+                                                attachment_storage_mode: EmailAttachmentStorageMode) \
+            -> AvroMessageSchemaRecord:
+        if attachment_storage_mode == EmailAttachmentStorageMode.BASE64:
+            return cls.get_avro_schema_record()
+        return AvroMessageSchemaFrozen.avro_schema_collection.get_matching_schema_record_by_family_and_name(
+            schema_family=cls.get_container_schema_matching_identifier().container_avro_schema_family_name,
+            schema_name=attachment_storage_mode.avro_schema_name)
+
+    def get_avro_schema_record_for_data(self) -> AvroMessageSchemaRecord:
+        return type(self).get_avro_schema_record_for_storage_mode(self.attachment_storage_mode)
+
+    @classmethod
+    def get_avro_schema_record_candidates(cls) -> List[AvroMessageSchemaRecord]:
+        return [cls.get_avro_schema_record_for_storage_mode(x) for x in EmailAttachmentStorageMode]
+
+    # dictionary in the layout of the schema for the requested storage mode, converting the payload if needed
+    #  a REFERENCE layout can always be produced, but the payload must already be in a store to be resolvable - see
+    #  get_as_reference_dict
+    def get_as_dict_for_storage_mode(self,
+                                     attachment_storage_mode: EmailAttachmentStorageMode) -> Dict:
+        if attachment_storage_mode == EmailAttachmentStorageMode.REFERENCE:
+            return \
+                {
+                    "filename": self.filename,
+                    "mimetype": self.mimetype,
+                    "contents_digest": self._contents_digest.to_bytes(16, byteorder='big'),
+                    "contents_length": self._contents_length
+                }
+        if attachment_storage_mode == EmailAttachmentStorageMode.RAW:
+            contents = self.contents
+            return \
+                {
+                    "filename": self.filename,
+                    "mimetype": self.mimetype,
+                    # avro only encodes bytes objects, so a spilled (memory mapped) payload is copied here
+                    "contents": contents if isinstance(contents, bytes) else bytes(contents)
+                }
         return \
             {
                 "filename": self.filename,
@@ -150,21 +187,78 @@ class EmailAttachment(AbstractContainer):
                 "contents_base64": self.contents_base64
             }
 
+    def get_as_dict(self) -> Dict:
+        return self.get_as_dict_for_storage_mode(attachment_storage_mode=self.attachment_storage_mode)
+
+    # puts the payload into the store (unless the store already holds it) and returns the reference layout
+    def get_as_reference_dict(self,
+                              attachment_store: AbstractEmailAttachmentStore) -> Dict:
+        if not attachment_store.contains(self._contents_digest):
+            contents = self.contents
+            attachment_store.put_contents(contents_digest=self._contents_digest,
+                                          contents=contents if isinstance(contents, bytes) else bytes(contents))
+        return self.get_as_dict_for_storage_mode(attachment_storage_mode=EmailAttachmentStorageMode.REFERENCE)
+
     def write_avro(self,
-                   avro_container_uri: str):
+                   avro_container_uri: str,
+                   codec_configuration_record: Optional[AvroCodecConfigurationRecord] = None):
         type(self)._write_avro_data(self,
                                     avro_container_uri=avro_container_uri,
-                                    data_as_dictionary=self.get_as_dict()
+                                    codec_configuration_record=codec_configuration_record,
+                                    data_as_dictionary=self.get_as_dict(),
+                                    avro_schema_record=
+                                    type(self).get_avro_schema_record_for_storage_mode(self.attachment_storage_mode)
                                     )
 
+    #  (contents_length, contents_digest) straight from the dictionary layout of any storage mode, without building
+    #  an attachment - references carry both, payloads held in the data are measured and hashed
+    @staticmethod
+    def get_contents_length_and_digest_from_avro_dict(avro_parameter_dict: Dict) -> Tuple[int, int]:
+        try:
+            if 'contents_digest' in avro_parameter_dict:
+                return avro_parameter_dict['contents_length'], \
+                    int.from_bytes(avro_parameter_dict['contents_digest'], byteorder='big')
+            if 'contents' in avro_parameter_dict:
+                contents = avro_parameter_dict['contents']
+            else:
+                contents = base64.b64decode(avro_parameter_dict['contents_base64'])
+        except KeyError as kex:
+            raise EmeraldMessageDeserializationError(
+                'Unable to read attachment contents from AVRO dictionary - cannot locate key "' +
+                str(kex.args[0]) + '" in data' +
+                os.linesep + 'Key(s) found: ' + ','.join([str(k) for k in avro_parameter_dict.keys()]))
+        return len(contents), compute_email_attachment_digest(contents)
+
+    # accepts the dictionary layout of any storage mode - the mode of the new attachment follows the data
+    #  references need the attachment_store holding their payloads
     @staticmethod
-    def from_avro_as_dict(avro_parameter_dict: Dict):
+    def from_avro_as_dict(avro_parameter_dict: Dict,
+                          attachment_store: Optional[AbstractEmailAttachmentStore] = None):
         try:
+            if 'contents_digest' in avro_parameter_dict:
+                if attachment_store is None:
+                    raise EmeraldMessageDeserializationError(
+                        'Unable to load attachment "' + str(avro_parameter_dict['filename']) +
+                        '" - it is stored as a reference and no attachment store was provided')
+                email_attachment_parameters = \
+                    EmailAttachmentParameters(filename=avro_parameter_dict['filename'],
+                                              mimetype=avro_parameter_dict['mimetype'],
+                                              contents_digest=int.from_bytes(avro_parameter_dict['contents_digest'],
+                                                                             byteorder='big'),
+                                              contents_length=avro_parameter_dict['contents_length'],
+                                              attachment_store=attachment_store)
+            elif 'contents' in avro_parameter_dict:
+                email_attachment_parameters = \
+                    EmailAttachmentParameters(filename=avro_parameter_dict['filename'],
+                                              mimetype=avro_parameter_dict['mimetype'],
+                                              contents=avro_parameter_dict['contents'])
+            else:
+                email_attachment_parameters = \
+                    EmailAttachmentParameters(filename=avro_parameter_dict['filename'],
+                                              mimetype=avro_parameter_dict['mimetype'],
+                                              contents_base64=avro_parameter_dict['contents_base64'])
             new_email_attachment = \
-                EmailAttachment(container_parameters=
-                                EmailAttachmentParameters(filename=avro_parameter_dict['filename'],
-                                                          mimetype=avro_parameter_dict['mimetype'],
-                                                          contents_base64=avro_parameter_dict['contents_base64']))
+                EmailAttachment._from_trusted_container_parameters(container_parameters=email_attachment_parameters)
         except KeyError as kex:
             raise EmeraldMessageDeserializationError(
                 'Unable to load object from AVRO dictionary ' + os.linesep + str(avro_parameter_dict) +
@@ -176,11 +270,19 @@ class EmailAttachment(AbstractContainer):
         return new_email_attachment
 
     @staticmethod
-    def from_avro(avro_container_uri: str):
+    def from_avro(avro_container_uri: str,
+                  attachment_store: Optional[AbstractEmailAttachmentStore] = None):
         # pass up the exceptions
         datum_to_load = AbstractContainer._from_avro_generic(avro_container_uri=avro_container_uri)
 
-        return EmailAttachment.from_avro_as_dict(datum_to_load)
+        return EmailAttachment.from_avro_as_dict(datum_to_load, attachment_store=attachment_store)
+
+    @staticmethod
+    def from_avro_bytes(avro_bytes,
+                        attachment_store: Optional[AbstractEmailAttachmentStore] = None):
+        datum_to_load = EmailAttachment._from_avro_bytes_generic(avro_bytes)
+
+        return EmailAttachment.from_avro_as_dict(datum_to_load, attachment_store=attachment_store)
 
     #
     #  see design note inside the constructor - the parameters really could have been named tuples just
@@ -194,5 +296,39 @@ class EmailAttachment(AbstractContainer):
         #  otherwise we cannot set other instance parameters in here because without separate
         #  instance parameter "container_parameter" we'd end up setting dataclass to true on this actual class
         #
-        print('initializing with ' + str(container_parameters))
         super(EmailAttachment, self).__init__(container_parameters=container_parameters)
+
+        if container_parameters.contents is not None and container_parameters.contents_base64 is not None:
+            raise EmeraldMessageContainerInitializationError(
+                'Caller must provide exactly one of contents (raw bytes) or contents_base64 ' +
+                'to initialize ' + type(self).__name__)
+        if container_parameters.contents is None and container_parameters.contents_base64 is None:
+            if not isinstance(container_parameters.attachment_store, AbstractEmailAttachmentStore) or \
+                    container_parameters.contents_digest is None or \
+                    type(container_parameters.contents_length) is not int:
+                raise EmeraldMessageContainerInitializationError(
+                    'Caller must provide contents (raw bytes) or contents_base64 to initialize ' +
+                    type(self).__name__ + os.linesep +
+                    'or, for an attachment held in an attachment store, the attachment_store, ' +
+                    'contents_digest and contents_length')
+        if container_parameters.contents_digest is not None and type(container_parameters.contents_digest) is not int:
+            raise EmeraldMessageContainerInitializationError(
+                'Caller must provide contents_digest as None or an integer to initialize ' + type(self).__name__ +
+                os.linesep + 'Type provided = ' + type(container_parameters.contents_digest).__name__)
+
+        self._initialize_derived_state()
+
+    def _initialize_derived_state(self):
+        container_parameters = self._container_parameters
+        if self.attachment_storage_mode == EmailAttachmentStorageMode.REFERENCE:
+            # never touch the store here - that is what makes references lazy
+            self._contents_length = container_parameters.contents_length
+            self._contents_digest = container_parameters.contents_digest
+            return
+
+        # hash the payload exactly once (or not at all when the parser already streamed it through the digest)
+        contents = self.contents
+        self._contents_length = len(contents)
+        self._contents_digest = container_parameters.contents_digest \
+            if container_parameters.contents_digest is not None \
+            else compute_email_attachment_digest(contents)
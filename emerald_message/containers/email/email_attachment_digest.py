@@ -0,0 +1,61 @@
+from spooky import hash128
+
+#
+#  Attachments are identified by a 128 bit spooky hash of their raw bytes.  The spooky library only hashes a
+#  complete bytes object, so to be able to hash attachments as they stream in (without holding the whole payload)
+#  the digest is defined over fixed size chunks: each chunk is hashed with a seed folded from the digest of the
+#  chunks before it.  The first chunk uses seed 0, so for any payload no larger than one chunk the digest is
+#  exactly hash128(contents)
+#
+#  DET NOTE - never change the chunk size; stored digests (attachment store keys, indexes) depend on it
+#
+EMAIL_ATTACHMENT_DIGEST_CHUNK_SIZE = 1024 * 1024
+
+_SEED_MASK_64 = (1 << 64) - 1
+
+
+class EmailAttachmentDigestBuilder:
+    @property
+    def length(self) -> int:
+        return self._length
+
+    def _hash_chunk(self,
+                    chunk: bytes):
+        seed = 0 if self._digest is None else ((self._digest ^ (self._digest >> 64)) & _SEED_MASK_64)
+        self._digest = hash128(chunk, seed)
+
+    # data may arrive in pieces of any size - only whole chunks are hashed until digest() is called
+    def update(self,
+               data):
+        self._length += len(data)
+        if len(self._pending) == 0 and len(data) == EMAIL_ATTACHMENT_DIGEST_CHUNK_SIZE:
+            self._hash_chunk(bytes(data))
+            return
+
+        self._pending.extend(data)
+        while len(self._pending) >= EMAIL_ATTACHMENT_DIGEST_CHUNK_SIZE:
+            self._hash_chunk(bytes(self._pending[:EMAIL_ATTACHMENT_DIGEST_CHUNK_SIZE]))
+            del self._pending[:EMAIL_ATTACHMENT_DIGEST_CHUNK_SIZE]
+
+    def digest(self) -> int:
+        if len(self._pending) > 0 or self._digest is None:
+            self._hash_chunk(bytes(self._pending))
+            self._pending = bytearray()
+        return self._digest
+
+    def __init__(self):
+        self._digest = None
+        self._pending = bytearray()
+        self._length = 0
+
+
+#  contents may be bytes or any bytes-like object (memoryview, mmap) - only one chunk is copied at a time
+def compute_email_attachment_digest(contents) -> int:
+    if isinstance(contents, bytes) and len(contents) <= EMAIL_ATTACHMENT_DIGEST_CHUNK_SIZE:
+        return hash128(contents)
+
+    digest_builder = EmailAttachmentDigestBuilder()
+    contents_view = memoryview(contents)
+    for chunk_start in range(0, len(contents_view), EMAIL_ATTACHMENT_DIGEST_CHUNK_SIZE):
+        digest_builder.update(contents_view[chunk_start:chunk_start + EMAIL_ATTACHMENT_DIGEST_CHUNK_SIZE])
+    return digest_builder.digest()
@@ -0,0 +1,97 @@
+import os
+import tempfile
+from abc import ABCMeta, abstractmethod
+
+from emerald_message.error import EmeraldMessageSerializationError, EmeraldMessageDeserializationError
+
+
+#
+#  Content addressed storage for attachment payloads, keyed by the 128 bit spooky digest EmailAttachment already
+#  keeps for every payload (see email_attachment_digest).  The same logo or PDF attached to thousands of messages is
+#  stored once; containers written with EmailContainerV3 and a store carry only a reference (digest, length,
+#  filename, mimetype) and the payload is fetched from the store the first time a reader asks for it
+#
+class AbstractEmailAttachmentStore(metaclass=ABCMeta):
+    @staticmethod
+    def get_digest_hex(contents_digest: int) -> str:
+        return format(contents_digest, '032x')
+
+    @abstractmethod
+    def contains(self,
+                 contents_digest: int) -> bool:
+        pass
+
+    # store the payload under its digest - a payload already present must be left as it is
+    @abstractmethod
+    def put_contents(self,
+                     contents_digest: int,
+                     contents: bytes):
+        pass
+
+    @abstractmethod
+    def get_contents(self,
+                     contents_digest: int) -> bytes:
+        pass
+
+
+#
+#  One file per payload under root_directory, fanned out over two levels of subdirectories named from the leading
+#  hex digits of the digest:  <root>/ab/cd/abcd....  Files are written to a temporary name and renamed into place
+#  so a concurrent reader never sees a partial payload, and two writers racing on the same payload are harmless
+#
+class FilesystemEmailAttachmentStore(AbstractEmailAttachmentStore):
+    @property
+    def root_directory(self) -> str:
+        return self._root_directory
+
+    def get_contents_path(self,
+                          contents_digest: int) -> str:
+        digest_hex = type(self).get_digest_hex(contents_digest)
+        return os.path.join(self._root_directory, digest_hex[0:2], digest_hex[2:4], digest_hex)
+
+    def contains(self,
+                 contents_digest: int) -> bool:
+        return os.path.isfile(self.get_contents_path(contents_digest))
+
+    def put_contents(self,
+                     contents_digest: int,
+                     contents: bytes):
+        contents_path = self.get_contents_path(contents_digest)
+        if os.path.isfile(contents_path):
+            return
+
+        contents_directory = os.path.dirname(contents_path)
+        temporary_path = None
+        try:
+            os.makedirs(contents_directory, exist_ok=True)
+            temporary_fd, temporary_path = tempfile.mkstemp(dir=contents_directory, suffix='.tmp')
+            with os.fdopen(temporary_fd, 'wb') as temporary_file:
+                temporary_file.write(contents)
+            os.replace(temporary_path, contents_path)
+            temporary_path = None
+        except OSError as oex:
+            raise EmeraldMessageSerializationError(
+                'Unable to write attachment ' + type(self).get_digest_hex(contents_digest) +
+                ' to attachment store at "' + self._root_directory + '"' +
+                os.linesep + 'Exception info: ' + str(oex))
+        finally:
+            if temporary_path is not None and os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def get_contents(self,
+                     contents_digest: int) -> bytes:
+        try:
+            with open(self.get_contents_path(contents_digest), 'rb') as contents_file:
+                return contents_file.read()
+        except OSError as oex:
+            raise EmeraldMessageDeserializationError(
+                'Unable to read attachment ' + type(self).get_digest_hex(contents_digest) +
+                ' from attachment store at "' + self._root_directory + '"' +
+                os.linesep + 'Exception info: ' + str(oex))
+
+    def __init__(self,
+                 root_directory: str):
+        if type(root_directory) is not str or len(root_directory) == 0:
+            raise ValueError('Caller must provide root_directory as a non-empty string' +
+                             ' - value provided = ' + str(root_directory))
+        self._root_directory = root_directory
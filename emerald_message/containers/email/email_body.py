@@ -1,11 +1,11 @@
 import os
 from dataclasses import dataclass
-from typing import Optional, List
-from spooky import hash128
+from typing import Optional, List, Tuple
 from typing import Dict
 
 from emerald_message.containers.abstract_container import AbstractContainer, ContainerSchemaMatchingIdentifier, \
     ContainerParameters
+from emerald_message.containers.avro_data_file_writer import AvroCodecConfigurationRecord
 from emerald_message.avro_schemas.avro_message_schema_family import AvroMessageSchemaFamily
 from emerald_message.error import EmeraldMessageDeserializationError
 
@@ -21,20 +21,22 @@ Use spooky hash v128 for the setup, as the message body could be quite large and
 """
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class EmailBodyParameters(ContainerParameters):
     message_body_text: str
     message_body_html: Optional[str] = None
 
 
 class EmailBody(AbstractContainer):
+    __slots__ = ()
+
     @property
     def message_body_text(self) -> str:
-        return self._get_container_parameters().message_body_text
+        return self._container_parameters.message_body_text
 
     @property
     def message_body_html(self):
-        return self._get_container_parameters().message_body_html
+        return self._container_parameters.message_body_html
 
     @property
     def message_body_as_lines_list(self) -> List[str]:
@@ -61,18 +63,21 @@ class EmailBody(AbstractContainer):
             }
 
     def write_avro(self,
-                   avro_container_uri: str):
+                   avro_container_uri: str,
+                   codec_configuration_record: Optional[AvroCodecConfigurationRecord] = None):
         type(self)._write_avro_data(self,
                                     data_as_dictionary=self.get_as_dict(),
-                                    avro_container_uri=avro_container_uri)
+                                    avro_container_uri=avro_container_uri,
+                                    codec_configuration_record=codec_configuration_record)
 
     @staticmethod
     def from_avro_as_dict(avro_parameter_dict: Dict):
         try:
             new_email_body = \
-                EmailBody(container_parameters=
-                          EmailBodyParameters(message_body_text=avro_parameter_dict['message_body_text'],
-                                              message_body_html=avro_parameter_dict['message_body_html']))
+                EmailBody._from_trusted_container_parameters(
+                    container_parameters=
+                    EmailBodyParameters(message_body_text=avro_parameter_dict['message_body_text'],
+                                        message_body_html=avro_parameter_dict['message_body_html']))
         except KeyError as kex:
             raise EmeraldMessageDeserializationError(
                 'Unable to load object from AVRO dictionary ' + os.linesep + str(avro_parameter_dict) +
@@ -110,7 +115,6 @@ class EmailBody(AbstractContainer):
         #  otherwise we cannot set other instance parameters in here because without separate
         #  instance parameter "container_parameter" we'd end up setting dataclass to true on this actual class
         #
-        print('initializing with ' + str(container_parameters))
         super(EmailBody, self).__init__(container_parameters=container_parameters)
 
     def __len__(self):
@@ -127,92 +131,15 @@ class EmailBody(AbstractContainer):
                'Stripped line(s) (count=' + str(len(self.message_body_as_lines_list)) + ')' + os.linesep + \
                os.linesep.join(str(x) for x in self.message_body_as_lines_list)
 
-    def __hash__(self):
-        # if there is no html, omit from the calculation as you can't take hash of None
-        # the stripped
-        return hash(str(self))
-
-    def __eq__(self, other):
-        if not isinstance(other, EmailBody):
-            return False
-
-        # use spooky hash test here for consistent use of comparisons - body can be quite large
-        if hash128(self.message_body_text) != hash128(other.message_body_text):
-            return False
-
-        if hash128(self.message_body_html) != hash128(other.message_body_html):
-            return False
-
-        return True
-
-    def __ne__(self, other):
-        return not  self.__eq__(other)
-
-    def __lt__(self, other):
-        #  the LT method is needed for sorting message body objects.  In reality, as text blobs
-        #  we should be able to check just one of these three properties since all ultimately arise
-        # from html.  Our convention is as follows:
-        #  If the HTML element is EMPTY or NULL for SELF:
-        #       IF HTML is EMPTY or NULL for OTHER:
-        #           LT = False
-        #       ELSE
-        #           LT = False
-        #  Else
-        #       IF HTML element is empty or null for OTHER:
-        #           LT = False
-        #       ELSE
-        #           Straight comparison of self.html < other.html
-        #
-        if not isinstance(other, EmailBody):
-            raise TypeError('Cannot compare other object of type "' + str(type(other)) + ' to element of ' +
-                            type(self).__name__)
-
-        if self.message_body_html is None or len(self.message_body_html) == 0:
-            if other.message_body_html is None or len(other.message_body_html) == 0:
-                # covers case where we default to text comparison
-                return self.message_body_text < other.message_body_text
-            else:
-                # other has HTML so we will treat as GT (i.e. self LT is true)
-                return True
-        else:
-            if other.message_body_html is None or len(other.message_body_html) == 0:
-                return False
-            else:
-                return self.message_body_text < other.message_body_text
-
-        # suppressing pep warning because I think it is better as a reminder that all paths must exit before
-        #  reaching this point
-        # noinspection PyUnreachableCode
-        raise AssertionError('Unexpected endpoint reached in comparison for type "' + EmailBody.__name__ + '"')
-
-    def __gt__(self, other):
-        #  the GT method is not really needed for sorting, but included so others can do their own comparisons
-        #  See notes on __lt__
-        if not isinstance(other, EmailBody):
-            raise TypeError('Cannot compare other object of type "' + str(type(other)) + ' to element of ' +
-                            type(self).__name__)
-
-        if self.message_body_html is None or len(self.message_body_html) == 0:
-            if other.message_body_html is None or len(other.message_body_html) == 0:
-                # covers case where we default to text comparison
-                return self.message_body_text > other.message_body_text
-            else:
-                # other has HTML so we will treat as GT (i.e. self LT is true)
-                return False
-        else:
-            if other.message_body_html is None or len(other.message_body_html) == 0:
-                return True
-            else:
-                return self.message_body_text > other.message_body_text
-
-        # suppressing pep warning because I think it is better as a reminder that all paths must exit before
-        #  reaching this point
-        # noinspection PyUnreachableCode
-        raise AssertionError('Unexpected endpoint reached in comparison for type "' + EmailBody.__name__ + '"')
-
-    def __ge__(self, other):
-        return not self.__lt__(other)
-
-    def __le__(self, other):
-        return not self.__gt__(other)
+    #
+    #  Bodies without HTML (None or empty) sort ahead of those with it, then by the text, which all renderings
+    #  ultimately arise from.  The HTML itself only separates bodies that tie on both, with None
+    #  ahead of empty
+    #
+    def _get_canonical_key(self) -> Tuple:
+        message_body_html = self.message_body_html
+        return (message_body_html is not None and len(message_body_html) > 0,
+                self.message_body_text,
+                message_body_html is not None,
+                message_body_html if message_body_html is not None else '')
 
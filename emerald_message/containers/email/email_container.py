@@ -1,18 +1,21 @@
 import os
 from dataclasses import dataclass
-from typing import FrozenSet, Dict
+from typing import FrozenSet, Dict, Optional, Tuple
 
 from emerald_message.containers.abstract_container import AbstractContainer, ContainerSchemaMatchingIdentifier, \
     ContainerParameters
+from emerald_message.containers.avro_data_file_writer import AvroCodecConfigurationRecord
+from emerald_message.containers.container_canonical_key import compute_canonical_key_digest
 from emerald_message.avro_schemas.avro_message_schema_family import AvroMessageSchemaFamily
 from emerald_message.error import EmeraldMessageDeserializationError
-from emerald_message.containers.email.email_attachment import EmailAttachment
+from emerald_message.containers.email.email_attachment import EmailAttachment, EmailAttachmentStorageMode
+from emerald_message.containers.email.email_attachment_store import AbstractEmailAttachmentStore
 from emerald_message.containers.email.email_body import EmailBody
 from emerald_message.containers.email.email_envelope import EmailEnvelope
 from emerald_message.containers.email.email_message_metadata import EmailMessageMetadata
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class EmailContainerParameters(ContainerParameters):
     email_message_metadata: EmailMessageMetadata
     email_envelope: EmailEnvelope
@@ -21,21 +24,23 @@ class EmailContainerParameters(ContainerParameters):
 
 
 class EmailContainer(AbstractContainer):
+    __slots__ = ()
+
     @property
     def email_message_metadata(self) -> EmailMessageMetadata:
-        return self._get_container_parameters().email_message_metadata
+        return self._container_parameters.email_message_metadata
 
     @property
     def email_envelope(self) -> EmailEnvelope:
-        return self._get_container_parameters().email_envelope
+        return self._container_parameters.email_envelope
 
     @property
     def email_body(self) -> EmailBody:
-        return self._get_container_parameters().email_body
+        return self._container_parameters.email_body
 
     @property
     def email_attachment_collection(self) -> FrozenSet[EmailAttachment]:
-        return self._get_container_parameters().email_attachment_collection
+        return self._container_parameters.email_attachment_collection
 
     def __str__(self):
         return \
@@ -45,29 +50,25 @@ class EmailContainer(AbstractContainer):
             'Email Message Metadata' + os.linesep + str(self.email_message_metadata) + os.linesep + \
             'Email Attachment Collection' + os.linesep + str(sorted(self.email_attachment_collection))
 
-    def __hash__(self):
-        return hash(str(self))
-
-    def __eq__(self, other):
-        if not isinstance(other, EmailContainer):
-            return False
-
-        if self.email_body != other.email_body:
-            return False
-
-        if self.email_envelope != other.email_envelope:
-            return False
-
-        if self.email_message_metadata != other.email_message_metadata:
-            return False
-
-        if sorted(self.email_attachment_collection) != sorted(other.email_attachment_collection):
-            return False
-
-        return True
-
-    def __ne__(self, other):
-        return not self.__eq__(other)
+    # attachments are sorted so the key does not depend on the order of the frozenset
+    def _get_canonical_key(self) -> Tuple:
+        return (self.email_envelope.canonical_key,
+                self.email_body.canonical_key,
+                self.email_message_metadata.canonical_key,
+                tuple(sorted(x.canonical_key for x in self.email_attachment_collection)))
+
+    # a digest of the children's digests (each cached on the child) - headers and bodies are not encoded again
+    def _compute_canonical_digest(self) -> int:
+        return compute_canonical_key_digest(
+            (self.email_envelope.canonical_digest,
+             self.email_body.canonical_digest,
+             self.email_message_metadata.canonical_digest,
+             tuple(x.canonical_digest for x in sorted(self.email_attachment_collection))))
+
+    # every schema version of the container holds the same content, so they compare with one another
+    @classmethod
+    def _get_canonical_comparison_class(cls) -> type:
+        return EmailContainer
 
     @classmethod
     def get_container_schema_matching_identifier(cls) -> ContainerSchemaMatchingIdentifier:
@@ -80,19 +81,29 @@ class EmailContainer(AbstractContainer):
     def _get_container_parameters_required_subclass_type(cls):
         return EmailContainerParameters
 
+    # the layout attachments take in this container's schema - attachments held in the other mode are converted
+    #  when serialized
+    @classmethod
+    def get_attachment_storage_mode(cls) -> EmailAttachmentStorageMode:
+        return EmailAttachmentStorageMode.BASE64
+
     def get_as_dict(self) -> Dict:
         # notice that since we have an array of attachments, we need to iterate through each,
         #  turning them into dictionaries and building into a list for serialization
+        attachment_storage_mode = type(self).get_attachment_storage_mode()
         return \
             {
                 "email_message_metadata": self.email_message_metadata.get_as_dict(),
                 "email_envelope": self.email_envelope.get_as_dict(),
                 "email_body": self.email_body.get_as_dict(),
-                "email_attachment_collection": sorted([x.get_as_dict() for x in self.email_attachment_collection])
+                "email_attachment_collection":
+                    [x.get_as_dict_for_storage_mode(attachment_storage_mode=attachment_storage_mode)
+                     for x in sorted(self.email_attachment_collection)]
             }
 
     def write_avro(self,
-                   avro_container_uri: str):
+                   avro_container_uri: str,
+                   codec_configuration_record: Optional[AvroCodecConfigurationRecord] = None):
         # remember that the array of addreess_to_collection must go out as a list to be serialized by the python
         #  library for Avro.  In all our comparison code for this class we always convert from frozenset  to list
         #  and sort for purposes of comparison
@@ -103,23 +114,35 @@ class EmailContainer(AbstractContainer):
         #
         type(self)._write_avro_data(self,
                                     data_as_dictionary=self.get_as_dict(),
-                                    avro_container_uri=avro_container_uri)
+                                    avro_container_uri=avro_container_uri,
+                                    codec_configuration_record=codec_configuration_record)
 
     @staticmethod
     def from_avro_as_dict(avro_parameter_dict: Dict):
+        return EmailContainer._from_avro_as_dict_for_class(avro_parameter_dict=avro_parameter_dict)
+
+    # shared with the other container levels, which differ only in the class built
+    @classmethod
+    def _from_avro_as_dict_for_class(cls,
+                                     avro_parameter_dict: Dict,
+                                     attachment_store: Optional[AbstractEmailAttachmentStore] = None):
         # we have a list of dictionaries for the email attachment, so we need to initialize each one before
         #  making a set
+        container_logger = cls.get_logger()
         email_attachment_list = []
         for this_email_attach_as_dict in avro_parameter_dict['email_attachment_collection']:
-            email_attachment = EmailAttachment.from_avro_as_dict(avro_parameter_dict=this_email_attach_as_dict)
-            print('The email attachment = ' + os.linesep + str(email_attachment))
+            email_attachment = EmailAttachment.from_avro_as_dict(avro_parameter_dict=this_email_attach_as_dict,
+                                                                attachment_store=attachment_store)
+            if container_logger.is_debug_enabled:
+                container_logger.logger.debug('The email attachment = ' + os.linesep + str(email_attachment))
             email_attachment_list.append(email_attachment)
 
-        print('The email attachment list = ' + str(email_attachment_list))
+        if container_logger.is_debug_enabled:
+            container_logger.logger.debug('The email attachment list = ' + str(email_attachment_list))
 
         try:
             new_email_container = \
-                EmailContainer(
+                cls._from_trusted_container_parameters(
                     container_parameters=
                     EmailContainerParameters(
                         email_message_metadata=
@@ -160,5 +183,4 @@ class EmailContainer(AbstractContainer):
         #  otherwise we cannot set other instance parameters in here because without separate
         #  instance parameter "container_parameter" we'd end up setting dataclass to true on this actual class
         #
-        print('initializing with ' + str(container_parameters))
         super(EmailContainer, self).__init__(container_parameters=container_parameters)
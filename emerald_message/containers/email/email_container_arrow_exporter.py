@@ -0,0 +1,207 @@
+import os
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from emerald_message.containers.avro_projection_reader import iter_avro_projection
+from emerald_message.containers.email.email_attachment import EmailAttachment
+from emerald_message.error import EmeraldMessageSerializationError
+
+# pyarrow is optional - the exporter is only available when it is installed
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+'''
+Configuration for exporting EmailContainer archives to Arrow / Parquet
+    row_group_size: containers per record batch, and so per Parquet row group - bounds the memory held while
+        exporting, since only the flattened fields of one batch are kept at a time
+    include_email_headers: export the raw header block (the largest metadata field)
+    include_message_bodies: export the text and html bodies
+    parquet_compression: Parquet column compression codec name
+'''
+
+
+@dataclass(frozen=True)
+class EmailContainerArrowExportConfigurationRecord:
+    row_group_size: int = 8192
+    include_email_headers: bool = True
+    include_message_bodies: bool = True
+    parquet_compression: str = 'snappy'
+
+
+# (field path read from the archive, column name, arrow type name) - column names are the AVRO field names, which
+#  are unique across the records of a container
+_EMAIL_METADATA_COLUMNS = (
+    ('email_message_metadata.router_source_tag', 'router_source_tag', 'string'),
+    ('email_message_metadata.routed_timestamp_iso8601', 'routed_timestamp_iso8601', 'string'),
+    ('email_message_metadata.email_sender_ip', 'email_sender_ip', 'string'),
+    ('email_message_metadata.attachment_count', 'attachment_count', 'int32'),
+    ('email_message_metadata.email_spf_sender_passed', 'email_spf_sender_passed', 'bool_'),
+    ('email_message_metadata.email_dkim_sender_passed', 'email_dkim_sender_passed', 'bool_'),
+    ('email_envelope.address_from', 'address_from', 'string'),
+    ('email_envelope.address_to_collection', 'address_to_collection', 'list_string'),
+    ('email_envelope.message_subject', 'message_subject', 'string'),
+    ('email_envelope.message_rx_timestamp_iso8601', 'message_rx_timestamp_iso8601', 'string')
+)
+_EMAIL_HEADERS_COLUMNS = (
+    ('email_message_metadata.email_headers', 'email_headers', 'string'),
+)
+_EMAIL_BODY_COLUMNS = (
+    ('email_body.message_body_text', 'message_body_text', 'string'),
+    ('email_body.message_body_html', 'message_body_html', 'string')
+)
+_EMAIL_ATTACHMENT_FIELD_PATH = 'email_attachment_collection'
+EMAIL_ATTACHMENT_COLUMN_NAME = 'email_attachment_collection'
+
+
+def _check_pyarrow_available():
+    if pyarrow is None:
+        raise ImportError('The pyarrow package must be installed to export email containers to Arrow or Parquet')
+
+
+def _get_arrow_type(arrow_type_name: str):
+    if arrow_type_name == 'list_string':
+        return pyarrow.list_(pyarrow.string())
+    return getattr(pyarrow, arrow_type_name)()
+
+
+def _get_export_columns(configuration_record: EmailContainerArrowExportConfigurationRecord) \
+        -> Tuple[Tuple[str, str, str], ...]:
+    return _EMAIL_METADATA_COLUMNS + \
+        (_EMAIL_HEADERS_COLUMNS if configuration_record.include_email_headers else ()) + \
+        (_EMAIL_BODY_COLUMNS if configuration_record.include_message_bodies else ())
+
+
+def _get_attachment_summary_arrow_type():
+    return pyarrow.struct([pyarrow.field('filename', pyarrow.string()),
+                           pyarrow.field('mimetype', pyarrow.string()),
+                           pyarrow.field('contents_length', pyarrow.int64()),
+                           pyarrow.field('contents_digest', pyarrow.binary(16))])
+
+
+def get_email_container_arrow_schema(configuration_record:
+                                     Optional[EmailContainerArrowExportConfigurationRecord] = None):
+    _check_pyarrow_available()
+    if configuration_record is None:
+        configuration_record = EmailContainerArrowExportConfigurationRecord()
+    return pyarrow.schema([pyarrow.field(column_name, _get_arrow_type(arrow_type_name))
+                           for _, column_name, arrow_type_name in _get_export_columns(configuration_record)] +
+                          [pyarrow.field(EMAIL_ATTACHMENT_COLUMN_NAME,
+                                         pyarrow.list_(_get_attachment_summary_arrow_type()))])
+
+
+#
+#  Values are gathered column by column for a whole batch and each column is converted to Arrow in one call;
+#  the attachment summaries become one list<struct> column built from flat child arrays and list offsets
+#
+class _EmailContainerRecordBatchBuilder:
+    @property
+    def row_count(self) -> int:
+        return len(self._attachment_offsets) - 1
+
+    def add_row(self,
+                row: Tuple):
+        for column_values, value in zip(self._column_values_list, row):
+            column_values.append(value)
+        for attachment_dict in row[-1]:
+            # payloads held in the archive are hashed here and dropped - only the summary is kept
+            contents_length, contents_digest = \
+                EmailAttachment.get_contents_length_and_digest_from_avro_dict(attachment_dict)
+            self._attachment_filenames.append(attachment_dict['filename'])
+            self._attachment_mimetypes.append(attachment_dict['mimetype'])
+            self._attachment_lengths.append(contents_length)
+            self._attachment_digests.append(contents_digest.to_bytes(16, byteorder='big'))
+        self._attachment_offsets.append(len(self._attachment_filenames))
+
+    def build(self):
+        column_arrays = [pyarrow.array(column_values, type=_get_arrow_type(arrow_type_name))
+                         for column_values, (_, _, arrow_type_name) in zip(self._column_values_list, self._columns)]
+        attachment_summary_array = pyarrow.StructArray.from_arrays(
+            [pyarrow.array(self._attachment_filenames, type=pyarrow.string()),
+             pyarrow.array(self._attachment_mimetypes, type=pyarrow.string()),
+             pyarrow.array(self._attachment_lengths, type=pyarrow.int64()),
+             pyarrow.array(self._attachment_digests, type=pyarrow.binary(16))],
+            fields=list(_get_attachment_summary_arrow_type()))
+        column_arrays.append(pyarrow.ListArray.from_arrays(pyarrow.array(self._attachment_offsets,
+                                                                         type=pyarrow.int32()),
+                                                           attachment_summary_array))
+        return pyarrow.RecordBatch.from_arrays(column_arrays, schema=self._arrow_schema)
+
+    def __init__(self,
+                 configuration_record: EmailContainerArrowExportConfigurationRecord):
+        self._columns = _get_export_columns(configuration_record)
+        self._arrow_schema = get_email_container_arrow_schema(configuration_record)
+        self._column_values_list: List[list] = [[] for _ in self._columns]
+        self._attachment_filenames: List[str] = []
+        self._attachment_mimetypes: List[str] = []
+        self._attachment_lengths: List[int] = []
+        self._attachment_digests: List[bytes] = []
+        self._attachment_offsets: List[int] = [0]
+
+
+#
+#  Streams the containers in one or more AVRO archives (any EmailContainer version) into Arrow record batches of
+#  at most row_group_size rows.  No containers are built: only the exported fields are decoded, through the
+#  projection reader, and attachment payloads are reduced to a summary (filename, mimetype, length, digest) as
+#  soon as they are read
+#
+def iter_email_container_record_batches(avro_container_uris: Iterable[str],
+                                        configuration_record:
+                                        Optional[EmailContainerArrowExportConfigurationRecord] = None) -> Iterator:
+    _check_pyarrow_available()
+    if configuration_record is None:
+        configuration_record = EmailContainerArrowExportConfigurationRecord()
+    if not isinstance(configuration_record, EmailContainerArrowExportConfigurationRecord):
+        raise TypeError('Caller must provide configuration_record as None or a valid ' +
+                        EmailContainerArrowExportConfigurationRecord.__name__ + os.linesep +
+                        'Type provided = ' + type(configuration_record).__name__)
+    if type(configuration_record.row_group_size) is not int or configuration_record.row_group_size < 1:
+        raise ValueError('row_group_size must be a positive integer' + os.linesep +
+                         'Value provided = ' + str(configuration_record.row_group_size))
+
+    field_paths = [field_path for field_path, _, _ in _get_export_columns(configuration_record)] + \
+        [_EMAIL_ATTACHMENT_FIELD_PATH]
+    record_batch_builder = _EmailContainerRecordBatchBuilder(configuration_record)
+    for avro_container_uri in avro_container_uris:
+        for row in iter_avro_projection(avro_container_uri=avro_container_uri, field_paths=field_paths):
+            record_batch_builder.add_row(row)
+            if record_batch_builder.row_count >= configuration_record.row_group_size:
+                yield record_batch_builder.build()
+                record_batch_builder = _EmailContainerRecordBatchBuilder(configuration_record)
+    if record_batch_builder.row_count > 0:
+        yield record_batch_builder.build()
+
+
+#
+#  Writes the containers in the archives to one Parquet file, one row group per record batch, and returns the
+#  number of containers written.  The file is written under a temporary name and renamed into place when complete
+#
+def export_email_containers_to_parquet(avro_container_uris: Iterable[str],
+                                       parquet_uri: str,
+                                       configuration_record:
+                                       Optional[EmailContainerArrowExportConfigurationRecord] = None) -> int:
+    _check_pyarrow_available()
+    if configuration_record is None:
+        configuration_record = EmailContainerArrowExportConfigurationRecord()
+    if type(parquet_uri) is not str or len(parquet_uri) == 0:
+        raise EmeraldMessageSerializationError('Unable to export to Parquet - parquet_uri must be a non-empty string')
+
+    parquet_temporary_uri = parquet_uri + '.tmp'
+    row_count = 0
+    try:
+        with pyarrow.parquet.ParquetWriter(parquet_temporary_uri,
+                                           get_email_container_arrow_schema(configuration_record),
+                                           compression=configuration_record.parquet_compression) as parquet_writer:
+            for record_batch in iter_email_container_record_batches(avro_container_uris=avro_container_uris,
+                                                                    configuration_record=configuration_record):
+                parquet_writer.write_table(pyarrow.Table.from_batches([record_batch]),
+                                           row_group_size=configuration_record.row_group_size)
+                row_count += record_batch.num_rows
+        os.replace(parquet_temporary_uri, parquet_uri)
+    except BaseException:
+        if os.path.exists(parquet_temporary_uri):
+            os.remove(parquet_temporary_uri)
+        raise
+    return row_count
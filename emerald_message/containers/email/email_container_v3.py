@@ -0,0 +1,112 @@
+from typing import Dict, Iterator, Optional
+
+from emerald_message.containers.abstract_container import AbstractContainer, ContainerSchemaMatchingIdentifier, \
+    ContainerParameters
+from emerald_message.containers.avro_data_file_writer import AvroCodecConfigurationRecord
+from emerald_message.avro_schemas.avro_message_schema_family import AvroMessageSchemaFamily
+from emerald_message.containers.email.email_attachment import EmailAttachmentStorageMode
+from emerald_message.containers.email.email_attachment_store import AbstractEmailAttachmentStore
+from emerald_message.containers.email.email_container_v2 import EmailContainerV2
+
+
+#
+#  Same content as EmailContainerV2, but serialized with the EmailContainerV3 schema, where each attachment is either
+#  the raw bytes or a reference (digest, length, filename, mimetype) into a content addressed attachment store
+#
+#  Written without a store it is equivalent to EmailContainerV2 (attachments already held as references stay
+#  references).  Written with a store, every payload is put into the store once and only references are written:
+#       email_container.write_avro('/data/mail.avro', attachment_store=FilesystemEmailAttachmentStore('/data/blobs'))
+#       EmailContainerV3.from_avro('/data/mail.avro', attachment_store=FilesystemEmailAttachmentStore('/data/blobs'))
+#  Reading never touches the store - each payload is fetched only when an attachment's contents are asked for
+#
+class EmailContainerV3(EmailContainerV2):
+    __slots__ = ()
+
+    @classmethod
+    def get_container_schema_matching_identifier(cls) -> ContainerSchemaMatchingIdentifier:
+        return ContainerSchemaMatchingIdentifier(
+            container_avro_schema_family_name=AvroMessageSchemaFamily.EMAIL,
+            container_avro_schema_name='EmailContainerV3'
+        )
+
+    def get_as_dict(self) -> Dict:
+        return self.get_as_dict_with_attachment_store(attachment_store=None)
+
+    def get_as_dict_with_attachment_store(self,
+                                          attachment_store: Optional[AbstractEmailAttachmentStore]) -> Dict:
+        email_attachment_dict_list = []
+        for email_attachment in sorted(self.email_attachment_collection):
+            if attachment_store is not None:
+                email_attachment_dict_list.append(
+                    email_attachment.get_as_reference_dict(attachment_store=attachment_store))
+            elif email_attachment.attachment_storage_mode == EmailAttachmentStorageMode.REFERENCE:
+                email_attachment_dict_list.append(email_attachment.get_as_dict())
+            else:
+                email_attachment_dict_list.append(
+                    email_attachment.get_as_dict_for_storage_mode(
+                        attachment_storage_mode=EmailAttachmentStorageMode.RAW))
+        return \
+            {
+                "email_message_metadata": self.email_message_metadata.get_as_dict(),
+                "email_envelope": self.email_envelope.get_as_dict(),
+                "email_body": self.email_body.get_as_dict(),
+                "email_attachment_collection": email_attachment_dict_list
+            }
+
+    #  attachment_store is keyword only so the positional parameters stay those of AbstractContainer.write_avro
+    def write_avro(self,
+                   avro_container_uri: str,
+                   codec_configuration_record: Optional[AvroCodecConfigurationRecord] = None,
+                   *,
+                   attachment_store: Optional[AbstractEmailAttachmentStore] = None):
+        type(self)._write_avro_data(self,
+                                    data_as_dictionary=
+                                    self.get_as_dict_with_attachment_store(attachment_store=attachment_store),
+                                    avro_container_uri=avro_container_uri,
+                                    codec_configuration_record=codec_configuration_record)
+
+    def to_avro_bytes(self,
+                      single_object_encoding: bool = False,
+                      codec_configuration_record: Optional[AvroCodecConfigurationRecord] = None,
+                      *,
+                      attachment_store: Optional[AbstractEmailAttachmentStore] = None) -> bytes:
+        return self._to_avro_bytes_for_data(
+            data_as_dictionary=self.get_as_dict_with_attachment_store(attachment_store=attachment_store),
+            single_object_encoding=single_object_encoding,
+            codec_configuration_record=codec_configuration_record)
+
+    @staticmethod
+    def from_avro_as_dict(avro_parameter_dict: Dict,
+                          attachment_store: Optional[AbstractEmailAttachmentStore] = None):
+        return EmailContainerV3._from_avro_as_dict_for_class(avro_parameter_dict=avro_parameter_dict,
+                                                             attachment_store=attachment_store)
+
+    @staticmethod
+    def from_avro(avro_container_uri: str,
+                  attachment_store: Optional[AbstractEmailAttachmentStore] = None):
+        # pass up the exceptions
+        datum_to_load = AbstractContainer._from_avro_generic(avro_container_uri=avro_container_uri)
+
+        return EmailContainerV3.from_avro_as_dict(datum_to_load, attachment_store=attachment_store)
+
+    @staticmethod
+    def from_avro_bytes(avro_bytes,
+                        attachment_store: Optional[AbstractEmailAttachmentStore] = None):
+        datum_to_load = EmailContainerV3._from_avro_bytes_generic(avro_bytes)
+
+        return EmailContainerV3.from_avro_as_dict(datum_to_load, attachment_store=attachment_store)
+
+    @classmethod
+    def iter_from_avro(cls,
+                       avro_container_uri: str,
+                       skip: int = 0,
+                       limit: Optional[int] = None,
+                       attachment_store: Optional[AbstractEmailAttachmentStore] = None) -> Iterator['EmailContainerV3']:
+        for datum in cls._iter_avro_generic(avro_container_uri=avro_container_uri,
+                                            skip=skip,
+                                            limit=limit):
+            yield cls.from_avro_as_dict(datum, attachment_store=attachment_store)
+
+    def __init__(self,
+                 container_parameters: ContainerParameters):
+        super(EmailContainerV3, self).__init__(container_parameters=container_parameters)
@@ -0,0 +1,55 @@
+from typing import Dict, Optional
+
+from emerald_message.containers.abstract_container import AbstractContainer, ContainerSchemaMatchingIdentifier, \
+    ContainerParameters
+from emerald_message.avro_schemas.avro_message_schema_family import AvroMessageSchemaFamily
+from emerald_message.containers.email.email_attachment_store import AbstractEmailAttachmentStore
+from emerald_message.containers.email.email_container_v3 import EmailContainerV3
+
+
+#
+#  Same content and attachment handling as EmailContainerV3, serialized with the EmailContainerV4 schema, where the
+#  message metadata (EmailMessageMetadataV2) also holds the headers split into (name, value) fields.  Readers get
+#  email_message_metadata.email_header_index straight from the stored fields instead of parsing the header block
+#
+class EmailContainerV4(EmailContainerV3):
+    __slots__ = ()
+
+    @classmethod
+    def get_container_schema_matching_identifier(cls) -> ContainerSchemaMatchingIdentifier:
+        return ContainerSchemaMatchingIdentifier(
+            container_avro_schema_family_name=AvroMessageSchemaFamily.EMAIL,
+            container_avro_schema_name='EmailContainerV4'
+        )
+
+    def get_as_dict_with_attachment_store(self,
+                                          attachment_store: Optional[AbstractEmailAttachmentStore]) -> Dict:
+        email_container_dict = \
+            super(EmailContainerV4, self).get_as_dict_with_attachment_store(attachment_store=attachment_store)
+        email_container_dict["email_message_metadata"] = self.email_message_metadata.get_as_dict_with_header_fields()
+        return email_container_dict
+
+    @staticmethod
+    def from_avro_as_dict(avro_parameter_dict: Dict,
+                          attachment_store: Optional[AbstractEmailAttachmentStore] = None):
+        return EmailContainerV4._from_avro_as_dict_for_class(avro_parameter_dict=avro_parameter_dict,
+                                                             attachment_store=attachment_store)
+
+    @staticmethod
+    def from_avro(avro_container_uri: str,
+                  attachment_store: Optional[AbstractEmailAttachmentStore] = None):
+        # pass up the exceptions
+        datum_to_load = AbstractContainer._from_avro_generic(avro_container_uri=avro_container_uri)
+
+        return EmailContainerV4.from_avro_as_dict(datum_to_load, attachment_store=attachment_store)
+
+    @staticmethod
+    def from_avro_bytes(avro_bytes,
+                        attachment_store: Optional[AbstractEmailAttachmentStore] = None):
+        datum_to_load = EmailContainerV4._from_avro_bytes_generic(avro_bytes)
+
+        return EmailContainerV4.from_avro_as_dict(datum_to_load, attachment_store=attachment_store)
+
+    def __init__(self,
+                 container_parameters: ContainerParameters):
+        super(EmailContainerV4, self).__init__(container_parameters=container_parameters)
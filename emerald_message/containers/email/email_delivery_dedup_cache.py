@@ -0,0 +1,209 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+from emerald_message.containers.container_canonical_key import compute_canonical_key_digest
+from emerald_message.containers.email.email_container import EmailContainer
+from emerald_message.error import EmeraldMessageContainerInitializationError
+
+'''
+Configuration for detecting repeated deliveries of the same inbound email
+    max_entries: fingerprints held in memory - the least recently seen are dropped beyond this
+    ttl_seconds: how long a fingerprint counts as seen, from its first delivery.  SendGrid retries a failed
+        webhook for up to 72 hours, so the default covers the whole retry window
+    sqlite_uri: optional SQLite database file that keeps fingerprints across restarts (None keeps them in memory
+        only).  Created if missing
+    sqlite_prune_interval: expired fingerprints are deleted from the database once per this many new deliveries
+'''
+
+
+@dataclass(frozen=True)
+class EmailDeliveryDedupConfigurationRecord:
+    max_entries: int = 100000
+    ttl_seconds: float = 72 * 3600.0
+    sqlite_uri: Optional[str] = None
+    sqlite_prune_interval: int = 1000
+
+
+_FINGERPRINT_SIZE_BYTES = 16
+
+_SQLITE_CREATE_TABLE = 'CREATE TABLE IF NOT EXISTS email_delivery_fingerprint ' + \
+                       '(fingerprint BLOB PRIMARY KEY, first_seen_timestamp REAL NOT NULL)'
+_SQLITE_SELECT_FIRST_SEEN = 'SELECT first_seen_timestamp FROM email_delivery_fingerprint WHERE fingerprint = ?'
+_SQLITE_INSERT = 'INSERT OR REPLACE INTO email_delivery_fingerprint (fingerprint, first_seen_timestamp) VALUES (?, ?)'
+_SQLITE_DELETE_EXPIRED = 'DELETE FROM email_delivery_fingerprint WHERE first_seen_timestamp <= ?'
+
+
+#
+#  128 bit fingerprint of one delivered email, the same for every retry of the delivery.  Only what the sender
+#  sent is used: the envelope addresses and subject, the Message-ID header, the body (its canonical digest) and the
+#  attachment digests.  The receive and routing timestamps are left out - the parser stamps them on each delivery
+#
+def get_email_delivery_fingerprint(email_container: EmailContainer) -> int:
+    if not isinstance(email_container, EmailContainer):
+        raise TypeError('Caller must provide an ' + EmailContainer.__name__ + ' to fingerprint' +
+                        os.linesep + 'Type provided = ' + type(email_container).__name__)
+    email_envelope = email_container.email_envelope
+    return compute_canonical_key_digest(
+        (email_envelope.address_from,
+         tuple(sorted(email_envelope.address_to_collection)),
+         email_envelope.message_subject,
+         email_container.email_message_metadata.email_header_index.get('Message-ID'),
+         email_container.email_body.canonical_digest,
+         tuple(sorted(x.contents_digest for x in email_container.email_attachment_collection))))
+
+
+#
+#  Remembers the fingerprints of recent deliveries so webhook retries are dropped before they are serialized:
+#       dedup_cache = EmailDeliveryDedupCache(EmailDeliveryDedupConfigurationRecord(sqlite_uri='/var/mail/dedup.db'))
+#       parsed_email = ParsedEmail(request)
+#       if dedup_cache.add_if_new(parsed_email.email_container):
+#           parsed_email.email_container.write_avro(...)
+#  or in front of a batch writer:
+#       writer.extend(dedup_cache.iter_new(email_containers))
+#  Fingerprints are held in a bounded LRU in memory and expire ttl_seconds after their first delivery.  With a
+#  SQLite file they are also written through to it, and a fingerprint not in memory (evicted, or seen before a
+#  restart) is looked up there.  Safe to share between threads
+#
+class EmailDeliveryDedupCache:
+    @property
+    def configuration_record(self) -> EmailDeliveryDedupConfigurationRecord:
+        return self._configuration_record
+
+    # fingerprints held in memory, expired or not
+    def __len__(self) -> int:
+        return len(self._first_seen_timestamp_by_fingerprint)
+
+    def _is_live(self,
+                 first_seen_timestamp: float,
+                 now: float) -> bool:
+        return now - first_seen_timestamp < self._configuration_record.ttl_seconds
+
+    def _remember(self,
+                  fingerprint: int,
+                  first_seen_timestamp: float):
+        self._first_seen_timestamp_by_fingerprint[fingerprint] = first_seen_timestamp
+        self._first_seen_timestamp_by_fingerprint.move_to_end(fingerprint)
+        while len(self._first_seen_timestamp_by_fingerprint) > self._configuration_record.max_entries:
+            self._first_seen_timestamp_by_fingerprint.popitem(last=False)
+
+    # call with the lock held - the first seen time of a live fingerprint, or None
+    def _get_live_first_seen_timestamp(self,
+                                       fingerprint: int,
+                                       now: float) -> Optional[float]:
+        first_seen_timestamp = self._first_seen_timestamp_by_fingerprint.get(fingerprint)
+        if first_seen_timestamp is None and self._sqlite_connection is not None:
+            row = self._sqlite_connection.execute(
+                _SQLITE_SELECT_FIRST_SEEN, (fingerprint.to_bytes(_FINGERPRINT_SIZE_BYTES, byteorder='big'),)
+            ).fetchone()
+            if row is not None:
+                first_seen_timestamp = row[0]
+        if first_seen_timestamp is None:
+            return None
+        if not self._is_live(first_seen_timestamp, now):
+            self._first_seen_timestamp_by_fingerprint.pop(fingerprint, None)
+            return None
+        # a hit counts as use for the LRU - the expiry still runs from the first delivery
+        self._remember(fingerprint, first_seen_timestamp)
+        return first_seen_timestamp
+
+    def contains_fingerprint(self,
+                             fingerprint: int) -> bool:
+        with self._lock:
+            return self._get_live_first_seen_timestamp(fingerprint, time.time()) is not None
+
+    def contains(self,
+                 email_container: EmailContainer) -> bool:
+        return self.contains_fingerprint(get_email_delivery_fingerprint(email_container))
+
+    # True if this is the first delivery of the fingerprint (now recorded), False for a repeat
+    def add_fingerprint_if_new(self,
+                               fingerprint: int) -> bool:
+        with self._lock:
+            now = time.time()
+            if self._get_live_first_seen_timestamp(fingerprint, now) is not None:
+                return False
+            self._remember(fingerprint, now)
+            if self._sqlite_connection is not None:
+                self._sqlite_connection.execute(
+                    _SQLITE_INSERT, (fingerprint.to_bytes(_FINGERPRINT_SIZE_BYTES, byteorder='big'), now))
+                self._sqlite_connection.commit()
+                self._added_since_prune += 1
+                if self._added_since_prune >= self._configuration_record.sqlite_prune_interval:
+                    self._prune_sqlite(now)
+            return True
+
+    def add_if_new(self,
+                   email_container: EmailContainer) -> bool:
+        return self.add_fingerprint_if_new(get_email_delivery_fingerprint(email_container))
+
+    # the containers that are first deliveries, in order - repeats are dropped
+    def iter_new(self,
+                 email_containers: Iterable[EmailContainer]) -> Iterator[EmailContainer]:
+        for email_container in email_containers:
+            if self.add_if_new(email_container):
+                yield email_container
+
+    def _prune_sqlite(self,
+                      now: float):
+        self._sqlite_connection.execute(_SQLITE_DELETE_EXPIRED, (now - self._configuration_record.ttl_seconds,))
+        self._sqlite_connection.commit()
+        self._added_since_prune = 0
+
+    def close(self):
+        with self._lock:
+            if self._sqlite_connection is not None:
+                self._sqlite_connection.close()
+                self._sqlite_connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __init__(self,
+                 configuration_record: Optional[EmailDeliveryDedupConfigurationRecord] = None):
+        if configuration_record is None:
+            configuration_record = EmailDeliveryDedupConfigurationRecord()
+        if not isinstance(configuration_record, EmailDeliveryDedupConfigurationRecord):
+            raise EmeraldMessageContainerInitializationError(
+                'Caller must provide configuration_record as None or a valid ' +
+                EmailDeliveryDedupConfigurationRecord.__name__ +
+                os.linesep + 'Type provided = ' + type(configuration_record).__name__)
+        if type(configuration_record.max_entries) is not int or configuration_record.max_entries < 1:
+            raise EmeraldMessageContainerInitializationError(
+                'max_entries must be a positive integer' +
+                os.linesep + 'Value provided = ' + str(configuration_record.max_entries))
+        if not isinstance(configuration_record.ttl_seconds, (int, float)) or configuration_record.ttl_seconds <= 0:
+            raise EmeraldMessageContainerInitializationError(
+                'ttl_seconds must be a positive number' +
+                os.linesep + 'Value provided = ' + str(configuration_record.ttl_seconds))
+        if configuration_record.sqlite_uri is not None and \
+                (type(configuration_record.sqlite_uri) is not str or len(configuration_record.sqlite_uri) == 0):
+            raise EmeraldMessageContainerInitializationError(
+                'sqlite_uri must be None or the path of the SQLite database file' +
+                os.linesep + 'Value provided = ' + str(configuration_record.sqlite_uri))
+        if type(configuration_record.sqlite_prune_interval) is not int or \
+                configuration_record.sqlite_prune_interval < 1:
+            raise EmeraldMessageContainerInitializationError(
+                'sqlite_prune_interval must be a positive integer' +
+                os.linesep + 'Value provided = ' + str(configuration_record.sqlite_prune_interval))
+
+        self._configuration_record = configuration_record
+        self._lock = threading.Lock()
+        self._first_seen_timestamp_by_fingerprint: OrderedDict = OrderedDict()
+        self._added_since_prune = 0
+        self._sqlite_connection = None
+        if configuration_record.sqlite_uri is not None:
+            # every use is under the lock, so the connection may be shared between threads
+            self._sqlite_connection = sqlite3.connect(configuration_record.sqlite_uri, check_same_thread=False)
+            # WAL with NORMAL sync: a commit per delivery without an fsync per commit
+            self._sqlite_connection.execute('PRAGMA journal_mode=WAL')
+            self._sqlite_connection.execute('PRAGMA synchronous=NORMAL')
+            self._sqlite_connection.execute(_SQLITE_CREATE_TABLE)
+            self._prune_sqlite(time.time())
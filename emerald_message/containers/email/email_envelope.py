@@ -1,14 +1,15 @@
 import os
 from dataclasses import dataclass
-from typing import FrozenSet, Dict
+from typing import FrozenSet, Dict, Optional, Tuple
 
 from emerald_message.containers.abstract_container import AbstractContainer, ContainerSchemaMatchingIdentifier, \
     ContainerParameters
+from emerald_message.containers.avro_data_file_writer import AvroCodecConfigurationRecord
 from emerald_message.avro_schemas.avro_message_schema_family import AvroMessageSchemaFamily
 from emerald_message.error import EmeraldMessageDeserializationError
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class EmailEnvelopeParameters(ContainerParameters):
     address_from: str
     address_to_collection: FrozenSet[str]
@@ -17,21 +18,23 @@ class EmailEnvelopeParameters(ContainerParameters):
 
 
 class EmailEnvelope(AbstractContainer):
+    __slots__ = ()
+
     @property
     def address_from(self) -> str:
-        return self._get_container_parameters().address_from
+        return self._container_parameters.address_from
 
     @property
     def address_to_collection(self) -> FrozenSet[str]:
-        return self._get_container_parameters().address_to_collection
+        return self._container_parameters.address_to_collection
 
     @property
     def message_subject(self) -> str:
-        return self._get_container_parameters().message_subject
+        return self._container_parameters.message_subject
 
     @property
     def message_rx_timestamp_iso8601(self) -> str:
-        return self._get_container_parameters().message_rx_timestamp_iso8601
+        return self._container_parameters.message_rx_timestamp_iso8601
 
     # order doesn't actually matter in the "address_to_collection" but we need to make sure we sort
     #  alphabetically when converting to string so the sort will always work on same order and be idempotent
@@ -43,98 +46,12 @@ class EmailEnvelope(AbstractContainer):
                'SUBJECT: "' + self.message_subject + '"' + os.linesep + \
                'RECEIVED: "' + self.message_rx_timestamp_iso8601 + '"'
 
-    def __hash__(self):
-        return hash(str(self))
-
-    def __eq__(self, other):
-        if not isinstance(other, EmailEnvelope):
-            return False
-
-        if self.address_from != other.address_from:
-            return False
-
-        # as with the string conversion, we need to sort the frozensets when doing < or > tests
-        #  it is ok to skip wnen doing equality tests
-        sorted_self = sorted(self.address_to_collection)
-        sorted_other = sorted(other.address_to_collection)
-        if sorted_self != sorted_other:
-            return False
-
-        if self.message_rx_timestamp_iso8601 != other.message_rx_timestamp_iso8601:
-            return False
-
-        return True
-
-    def __ne__(self, other):
-        return not  self.__eq__(other)
-
-    def __lt__(self, other):
-        if not isinstance(other, EmailEnvelope):
-            raise TypeError('Cannot compare object of type "' + type(other).__name__ + '" to ' +
-                            EmailEnvelope.__name__)
-
-        if self.address_from < other.address_from:
-            return True
-        elif self.address_from > other.address_from:
-            return False
-
-        # as with the string conversion, we need to sort the frozensets when doing < or > tests
-        #  it is ok to skip wnen doing equality tests
-        sorted_self = sorted(self.address_to_collection)
-        sorted_other = sorted(other.address_to_collection)
-        if sorted_self < sorted_other:
-            return True
-        elif sorted_self > sorted_other:
-            return False
-
-        if self.message_subject < other.message_subject:
-            return True
-        elif self.message_subject > other.message_subject:
-            return False
-
-        if self.message_rx_timestamp_iso8601 < other.message_rx_timestamp_iso8601:
-            return True
-        elif self.message_rx_timestamp_iso8601 > other.message_rx_timestamp_iso8601:
-            return False
-
-        return False
-
-    def __gt__(self, other):
-        if not isinstance(other, EmailEnvelope):
-            raise TypeError('Cannot compare object of type "' + type(other).__name__ + '" to ' +
-                            EmailEnvelope.__name__)
-
-        if self.address_from > other.address_from:
-            return True
-        elif self.address_from < other.address_from:
-            return False
-
-        # as with the string conversion, we need to sort the frozensets when doing < or > tests
-        #  it is ok to skip wnen doing equality tests
-        sorted_self = sorted(self.address_to_collection)
-        sorted_other = sorted(other.address_to_collection)
-        if sorted_self > sorted_other:
-            return True
-        elif sorted_self < sorted_other:
-            return False
-
-        if self.message_subject > other.message_subject:
-            return True
-        elif self.message_subject < other.message_subject:
-            return False
-
-        if self.message_rx_timestamp_iso8601 > other.message_rx_timestamp_iso8601:
-            return True
-        elif self.message_rx_timestamp_iso8601 < other.message_rx_timestamp_iso8601:
-            return False
-
-        return False
-
-    def __ge__(self, other):
-        return not self.__lt__(other)
-
-    def __le__(self, other):
-        return not self.__gt__(other)
+    # recipients are sorted so 1,2,3 and 3,2,1 give the same key, as for the string conversion
+    def _get_canonical_key(self) -> Tuple:
+        return (self.address_from,
+                tuple(sorted(self.address_to_collection)),
+                self.message_subject,
+                self.message_rx_timestamp_iso8601)
 
     @classmethod
     def get_container_schema_matching_identifier(cls) -> ContainerSchemaMatchingIdentifier:
@@ -157,19 +74,21 @@ class EmailEnvelope(AbstractContainer):
             }
 
     def write_avro(self,
-                   avro_container_uri: str):
+                   avro_container_uri: str,
+                   codec_configuration_record: Optional[AvroCodecConfigurationRecord] = None):
         # remember that the array of addreess_to_collection must go out as a list to be serialized by the python
         #  library for Avro.  In all our comparison code for this class we always convert from frozenset  to list
         #  and sort for purposes of comparison
         type(self)._write_avro_data(self,
                                     data_as_dictionary=self.get_as_dict(),
-                                    avro_container_uri=avro_container_uri)
+                                    avro_container_uri=avro_container_uri,
+                                    codec_configuration_record=codec_configuration_record)
 
     @staticmethod
     def from_avro_as_dict(avro_parameter_dict: Dict):
         try:
             new_email_envelope = \
-                EmailEnvelope(
+                EmailEnvelope._from_trusted_container_parameters(
                     container_parameters=
                     EmailEnvelopeParameters(
                         address_from=avro_parameter_dict['address_from'],
@@ -209,5 +128,4 @@ class EmailEnvelope(AbstractContainer):
         #  otherwise we cannot set other instance parameters in here because without separate
         #  instance parameter "container_parameter" we'd end up setting dataclass to true on this actual class
         #
-        print('initializing with ' + str(container_parameters))
         super(EmailEnvelope, self).__init__(container_parameters=container_parameters)
@@ -0,0 +1,93 @@
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+_HEADER_LINE_BREAK_RE = re.compile(r'\r\n|\n|\r')
+
+
+#
+#  Splits an RFC 5322 header block into (name, value) fields in the order they appear.  Folded lines (starting with
+#  a space or tab) are unfolded onto the field before them by removing the line break only, then the value is
+#  stripped.  Lines that are neither a field nor a continuation are skipped; a blank line ends the block
+#
+def parse_email_headers(email_headers: str) -> Tuple[Tuple[str, str], ...]:
+    header_fields: List[Tuple[str, str]] = []
+    field_name: Optional[str] = None
+    field_value_parts: List[str] = []
+    for header_line in _HEADER_LINE_BREAK_RE.split(email_headers):
+        if len(header_line) > 0 and header_line[0] in ' \t':
+            if field_name is not None:
+                field_value_parts.append(header_line)
+            continue
+
+        if field_name is not None:
+            header_fields.append((field_name, ''.join(field_value_parts).strip()))
+            field_name = None
+        if len(header_line) == 0:
+            if len(header_fields) > 0:
+                break
+            continue
+
+        colon_position = header_line.find(':')
+        if colon_position > 0:
+            field_name = header_line[:colon_position].rstrip()
+            field_value_parts = [header_line[colon_position + 1:]]
+
+    if field_name is not None:
+        header_fields.append((field_name, ''.join(field_value_parts).strip()))
+    return tuple(header_fields)
+
+
+#
+#  Case-insensitive multi-map over the fields of a header block - names keep the case they were sent in, lookups
+#  ignore it and repeated fields (Received, DKIM-Signature ...) keep their order:
+#       header_index.get('message-id')
+#       header_index.get_all('Received')
+#  Built once from the (name, value) fields; see EmailMessageMetadata.email_header_index
+#
+class EmailHeaderIndex:
+    @property
+    def header_fields(self) -> Tuple[Tuple[str, str], ...]:
+        return self._header_fields
+
+    def get(self,
+            header_name: str,
+            default: Optional[str] = None) -> Optional[str]:
+        header_values = self._header_values_by_name.get(header_name.lower())
+        return default if header_values is None else header_values[0]
+
+    def get_all(self,
+                header_name: str) -> Tuple[str, ...]:
+        return self._header_values_by_name.get(header_name.lower(), ())
+
+    def __getitem__(self, header_name: str) -> str:
+        try:
+            return self._header_values_by_name[header_name.lower()][0]
+        except KeyError:
+            raise KeyError(header_name)
+
+    def __contains__(self, header_name) -> bool:
+        return isinstance(header_name, str) and header_name.lower() in self._header_values_by_name
+
+    # distinct names (lower case) in order of first appearance
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._header_values_by_name)
+
+    def __len__(self) -> int:
+        return len(self._header_values_by_name)
+
+    def __str__(self):
+        return '\r\n'.join([x[0] + ': ' + x[1] for x in self._header_fields])
+
+    @classmethod
+    def from_email_headers(cls,
+                           email_headers: str) -> 'EmailHeaderIndex':
+        return cls(header_fields=parse_email_headers(email_headers))
+
+    def __init__(self,
+                 header_fields: Tuple[Tuple[str, str], ...]):
+        self._header_fields = tuple(header_fields)
+        header_value_lists_by_name: Dict[str, List[str]] = {}
+        for header_name, header_value in self._header_fields:
+            header_value_lists_by_name.setdefault(header_name.lower(), []).append(header_value)
+        self._header_values_by_name: Dict[str, Tuple[str, ...]] = \
+            {k: tuple(v) for k, v in header_value_lists_by_name.items()}
@@ -1,14 +1,37 @@
 import os
 from dataclasses import dataclass
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 from emerald_message.containers.abstract_container import AbstractContainer, ContainerSchemaMatchingIdentifier, \
     ContainerParameters
+from emerald_message.containers.avro_data_file_writer import AvroCodecConfigurationRecord
 from emerald_message.avro_schemas.avro_message_schema_family import AvroMessageSchemaFamily
+from emerald_message.containers.email.email_header_index import EmailHeaderIndex
 from emerald_message.error import EmeraldMessageDeserializationError
 from netaddr import IPAddress
 
+# sort rank of an optional boolean in the canonical key
+_OPTIONAL_BOOLEAN_RANK = {None: 0, False: 1, True: 2}
 
-@dataclass(frozen=True)
+# stored mail comes from a limited set of sender addresses, so each is parsed once when deserializing and copied
+#  from here after (IPAddress is mutable - every container gets its own).  Cleared when full
+_EMAIL_SENDER_IP_CACHE_SIZE = 4096
+_email_sender_ip_by_value: Dict[str, IPAddress] = {}
+
+
+def _get_email_sender_ip(email_sender_ip_value: str) -> IPAddress:
+    try:
+        return IPAddress(_email_sender_ip_by_value[email_sender_ip_value])
+    except KeyError:
+        pass
+
+    email_sender_ip = IPAddress(email_sender_ip_value)
+    if len(_email_sender_ip_by_value) >= _EMAIL_SENDER_IP_CACHE_SIZE:
+        _email_sender_ip_by_value.clear()
+    _email_sender_ip_by_value[email_sender_ip_value] = email_sender_ip
+    return IPAddress(email_sender_ip)
+
+
+@dataclass(frozen=True, slots=True)
 class EmailMessageMetadataParameters(ContainerParameters):
     router_source_tag: str
     routed_timestamp_iso8601: str
@@ -17,36 +40,50 @@ class EmailMessageMetadataParameters(ContainerParameters):
     email_headers: str
     email_spf_sender_passed: Optional[bool] = None
     email_dkim_sender_passed: Optional[bool] = None
+    # the headers already split into (name, value) fields, when read from a schema that stores them - the fields
+    #  must be those of email_headers
+    email_header_fields: Optional[Tuple[Tuple[str, str], ...]] = None
 
 
 class EmailMessageMetadata(AbstractContainer):
+    __slots__ = ('_email_header_index',)
+
     @property
     def router_source_tag(self) -> str:
-        return self._get_container_parameters().router_source_tag
+        return self._container_parameters.router_source_tag
 
     @property
     def routed_timestamp_iso8601(self) -> str:
-        return self._get_container_parameters().routed_timestamp_iso8601
+        return self._container_parameters.routed_timestamp_iso8601
 
     @property
     def email_sender_ip(self) -> IPAddress:
-        return self._get_container_parameters().email_sender_ip
+        return self._container_parameters.email_sender_ip
 
     @property
     def attachment_count(self) -> int:
-        return self._get_container_parameters().attachment_count
+        return self._container_parameters.attachment_count
 
     @property
     def email_headers(self) -> str:
-        return self._get_container_parameters().email_headers
+        return self._container_parameters.email_headers
 
     @property
     def email_spf_sender_passed(self) -> Optional[bool]:
-        return self._get_container_parameters().email_spf_sender_passed
+        return self._container_parameters.email_spf_sender_passed
 
     @property
     def email_dkim_sender_passed(self) -> Optional[bool]:
-        return self._get_container_parameters().email_dkim_sender_passed
+        return self._container_parameters.email_dkim_sender_passed
+
+    # parsed from email_headers on first use (or taken from the stored fields) and kept for the life of the object
+    @property
+    def email_header_index(self) -> EmailHeaderIndex:
+        if self._email_header_index is None:
+            email_header_fields = self._container_parameters.email_header_fields
+            self._email_header_index = EmailHeaderIndex.from_email_headers(self.email_headers) \
+                if email_header_fields is None else EmailHeaderIndex(header_fields=email_header_fields)
+        return self._email_header_index
 
     @property
     def authentication_filters_state(self) -> Optional[bool]:
@@ -58,7 +95,7 @@ class EmailMessageMetadata(AbstractContainer):
         return self.email_spf_sender_passed and self.email_dkim_sender_passed
 
     def __str__(self):
-        # this is not necessarily useful for logging, but is needed for hashing
+        # this is not necessarily useful for logging - hashing and comparison use the canonical key
         return \
             'Router Source Tag: ' + str(self.router_source_tag) + os.linesep + \
             'Routed Timestamp ISO8601: ' + str(self.routed_timestamp_iso8601) + os.linesep + \
@@ -70,179 +107,19 @@ class EmailMessageMetadata(AbstractContainer):
             ('Not Available' if self.email_dkim_sender_passed is None else str(self.email_dkim_sender_passed)) + \
             'Email Headers: ' + os.linesep + str(self.email_headers) + os.linesep
 
-    def __hash__(self):
-        # use a regular hash for this as it is not too long
-        return hash(str(self))
-
-    def __eq__(self, other):
-        if not isinstance(other, EmailMessageMetadata):
-            return False
-
-        if self.router_source_tag != other.router_source_tag:
-            return False
-
-        if self.routed_timestamp_iso8601 != other.routed_timestamp_iso8601:
-            return False
-
-        if self.email_sender_ip != other.email_sender_ip:
-            return False
-
-        if self.attachment_count != other.attachment_count:
-            return False
-
-        if self.email_headers != other.email_headers:
-            return False
-
-        if self.email_spf_sender_passed != other.email_spf_sender_passed:
-            return False
-
-        if self.email_dkim_sender_passed != other.email_dkim_sender_passed:
-            return False
-
-        return True
-
-    def __ne__(self, other):
-        return not self.__eq__(other)
-
-    def __lt__(self, other):
-        if not isinstance(other, EmailMessageMetadata):
-            raise TypeError('Cannot compare object of type "' + type(other).__name__ + '" to ' +
-                            EmailMessageMetadata.__name__)
-
-        if self.router_source_tag < other.router_source_tag:
-            return True
-        elif self.router_source_tag > other.router_source_tag:
-            return False
-
-        if self.routed_timestamp_iso8601 < other.routed_timestamp_iso8601:
-            return True
-        elif self.routed_timestamp_iso8601 > other.routed_timestamp_iso8601:
-            return False
-
-        if self.email_sender_ip < other.email_sender_ip:
-            return True
-        elif self.email_sender_ip > other.email_sender_ip:
-            return False
-
-        if self.attachment_count < other.attachment_count:
-            return True
-        elif self.attachment_count > other.attachment_count:
-            return False
-
-        if self.email_headers < other.email_headers:
-            return True
-        elif self.email_headers > other.email_headers:
-            return False
-
-        try:
-            if self.email_spf_sender_passed < other.email_spf_sender_passed:
-                return True
-            elif self.email_spf_sender_passed > other.email_spf_sender_passed:
-                return False
-        except TypeError:
-            # for optional booleans we have to check for a type error - None cannot be compared
-            #  False < True,  Skip if neither < or <
-            #  We will designate True > False > None to make things idempotent
-            if self.email_spf_sender_passed is None:
-                if other.email_spf_sender_passed is not None:
-                    return True
-            elif other.email_spf_sender_passed is None:
-                if self.email_spf_sender_passed is not None:
-                    return False
-            pass
-
-        try:
-            if self.email_dkim_sender_passed < other.email_dkim_sender_passed:
-                return True
-            elif self.email_dkim_sender_passed > other.email_dkim_sender_passed:
-                return False
-        except TypeError:
-            # for optional booleans we have to check for a type error - None cannot be compared
-            #  False < True,  Skip if neither < or <
-            #  We will designate True > False > None to make things idempotent
-            if self.email_dkim_sender_passed is None:
-                if other.email_dkim_sender_passed is not None:
-                    return True
-            elif other.email_dkim_sender_passed is None:
-                if self.email_dkim_sender_passed is not None:
-                    return False
-            pass
-
-        # all are equal so false
-        return False
-
-    def __gt__(self, other):
-        if not isinstance(other, EmailMessageMetadata):
-            raise TypeError('Cannot compare object of type "' + type(other).__name__ + '" to ' +
-                            EmailMessageMetadata.__name__)
-
-        if self.router_source_tag > other.router_source_tag:
-            return True
-        elif self.router_source_tag < other.router_source_tag:
-            return False
-
-        if self.routed_timestamp_iso8601 > other.routed_timestamp_iso8601:
-            return True
-        elif self.routed_timestamp_iso8601 < other.routed_timestamp_iso8601:
-            return False
-
-        if self.email_sender_ip > other.email_sender_ip:
-            return True
-        elif self.email_sender_ip < other.email_sender_ip:
-            return False
-
-        if self.attachment_count > other.attachment_count:
-            return True
-        elif self.attachment_count < other.attachment_count:
-            return False
-
-        if self.email_headers > other.email_headers:
-            return True
-        elif self.email_headers < other.email_headers:
-            return False
-
-        try:
-            if self.email_spf_sender_passed > other.email_spf_sender_passed:
-                return True
-            elif self.email_spf_sender_passed < other.email_spf_sender_passed:
-                return False
-        except TypeError:
-            # for optional booleans we have to check for a type error - None cannot be compared
-            #  False < True,  Skip if neither < or <
-            #  We will designate True > False > None to make things idempotent
-            if self.email_spf_sender_passed is None:
-                if other.email_spf_sender_passed is not None:
-                    return False
-            elif other.email_spf_sender_passed is None:
-                if self.email_spf_sender_passed is not None:
-                    return True
-            pass
-
-        try:
-            if self.email_dkim_sender_passed > other.email_dkim_sender_passed:
-                return True
-            elif self.email_dkim_sender_passed < other.email_dkim_sender_passed:
-                return False
-        except TypeError:
-            # for optional booleans we have to check for a type error - None cannot be compared
-            #  False < True,  Skip if neither < or <
-            #  We will designate True > False > None to make things idempotent
-            if self.email_dkim_sender_passed is None:
-                if other.email_dkim_sender_passed is not None:
-                    return False
-            elif other.email_dkim_sender_passed is None:
-                if self.email_dkim_sender_passed is not None:
-                    return True
-            pass
-
-        # all are equal so false
-        return False
-
-    def __ge__(self, other):
-        return not self.__lt__(other)
-
-    def __le__(self, other):
-        return not self.__gt__(other)
+    #
+    #  The sender address is keyed as (version, integer value), the order netaddr sorts addresses in.  For the
+    #  optional booleans we designate True > False > None to make things idempotent.  The header fields are left
+    #  out - they are the headers again, split
+    #
+    def _get_canonical_key(self) -> Tuple:
+        return (self.router_source_tag,
+                self.routed_timestamp_iso8601,
+                (self.email_sender_ip.version, int(self.email_sender_ip)),
+                self.attachment_count,
+                self.email_headers,
+                _OPTIONAL_BOOLEAN_RANK[self.email_spf_sender_passed],
+                _OPTIONAL_BOOLEAN_RANK[self.email_dkim_sender_passed])
 
     @classmethod
     def get_container_schema_matching_identifier(cls) -> ContainerSchemaMatchingIdentifier:
@@ -267,31 +144,45 @@ class EmailMessageMetadata(AbstractContainer):
                 "email_dkim_sender_passed": self.email_dkim_sender_passed
             }
 
+    # the EmailMessageMetadataV2 layout, which adds the headers split into fields
+    def get_as_dict_with_header_fields(self) -> Dict:
+        email_metadata_dict = self.get_as_dict()
+        email_metadata_dict["email_header_fields"] = \
+            [{"name": x[0], "value": x[1]} for x in self.email_header_index.header_fields]
+        return email_metadata_dict
+
     def write_avro(self,
-                   avro_container_uri: str):
+                   avro_container_uri: str,
+                   codec_configuration_record: Optional[AvroCodecConfigurationRecord] = None):
         # remember that the array of addreess_to_collection must go out as a list to be serialized by the python
         #  library for Avro.  In all our comparison code for this class we always convert from frozenset  to list
         #  and sort for purposes of comparison
         #  We serialize IP addreess into a string
         type(self)._write_avro_data(self,
                                     data_as_dictionary=self.get_as_dict(),
-                                    avro_container_uri=avro_container_uri)
+                                    avro_container_uri=avro_container_uri,
+                                    codec_configuration_record=codec_configuration_record)
 
+    # accepts either layout - header fields are taken as stored when present (an empty list, as a reader schema
+    #  default gives, means they were not stored)
     @staticmethod
     def from_avro_as_dict(avro_parameter_dict: Dict):
         # we deserialize the IP address from a string
         try:
+            email_header_field_list = avro_parameter_dict.get('email_header_fields')
             new_email_message_metadata = \
-                EmailMessageMetadata(
+                EmailMessageMetadata._from_trusted_container_parameters(
                     container_parameters=
                     EmailMessageMetadataParameters(
                         router_source_tag=avro_parameter_dict['router_source_tag'],
                         routed_timestamp_iso8601=avro_parameter_dict['routed_timestamp_iso8601'],
-                        email_sender_ip=IPAddress(avro_parameter_dict['email_sender_ip']),
+                        email_sender_ip=_get_email_sender_ip(avro_parameter_dict['email_sender_ip']),
                         attachment_count=avro_parameter_dict['attachment_count'],
                         email_headers=avro_parameter_dict['email_headers'],
                         email_spf_sender_passed=avro_parameter_dict['email_spf_sender_passed'],
-                        email_dkim_sender_passed=avro_parameter_dict['email_dkim_sender_passed']
+                        email_dkim_sender_passed=avro_parameter_dict['email_dkim_sender_passed'],
+                        email_header_fields=None if not email_header_field_list else
+                        tuple([(x['name'], x['value']) for x in email_header_field_list])
                     )
                 )
         except KeyError as kex:
@@ -324,5 +215,8 @@ class EmailMessageMetadata(AbstractContainer):
         #  otherwise we cannot set other instance parameters in here because without separate
         #  instance parameter "container_parameter" we'd end up setting dataclass to true on this actual class
         #
-        print('initializing with ' + str(container_parameters))
         super(EmailMessageMetadata, self).__init__(container_parameters=container_parameters)
+        self._initialize_derived_state()
+
+    def _initialize_derived_state(self):
+        self._email_header_index: Optional[EmailHeaderIndex] = None
@@ -10,10 +10,11 @@ from netaddr import IPAddress
 from werkzeug.datastructures import ImmutableList
 
 from emerald_message.exitcode import ExitCode
-from emerald_message.error import EmeraldMessageContainerInitializationError
+from emerald_message.error import EmeraldMessageContainerInitializationError, EmeraldSchemaParsingException
 from emerald_message.logging.logger import EmeraldLogger
 from emerald_message.version import __version__
-from emerald_message.avro_schemas.avro_message_schemas import AvroMessageSchemaFrozen
+from emerald_message.avro_schemas.avro_message_schemas import AvroMessageSchemaFrozen, AvroMessageSchemas, \
+    AvroMessageSchemaConfigurationRecord, AVRO_SCHEMA_BUNDLE_ENVIRONMENT_VARIABLE
 from emerald_message.containers.email.email_body import EmailBody, EmailBodyParameters
 from emerald_message.containers.email.email_attachment import EmailAttachment, EmailAttachmentParameters
 from emerald_message.containers.email.email_envelope import EmailEnvelope, EmailEnvelopeParameters
@@ -63,6 +64,11 @@ def emerald_message_launcher(argv):
                         action='store',
                         help='Parse an AVRO file using specific schema. Format is <datafilepath>:<schemaname>' +
                              os.linesep + 'TODO ADD ENUMERATION HERE')
+    parser.add_argument('--compile_avro_schema_bundle',
+                        action='store',
+                        help='Scan the packaged AVRO schemas and write them to a precompiled bundle file' +
+                             os.linesep + 'Set ' + AVRO_SCHEMA_BUNDLE_ENVIRONMENT_VARIABLE +
+                             ' to the bundle path to load schemas from it at runtime')
 
     args = parser.parse_args(None if argv[0:] else ['--help'])
 
@@ -77,6 +83,20 @@ def emerald_message_launcher(argv):
     # Commands should not block for long periods of time - this is designed for simple requests
     #  Use the library from other packages to implement long running tasks
 
+    if args.compile_avro_schema_bundle is not None:
+        logger.logger.info('Writing precompiled AVRO schema bundle to ' + args.compile_avro_schema_bundle)
+        try:
+            AvroMessageSchemas(AvroMessageSchemaConfigurationRecord(
+                schema_subfolders=None,
+                debug=False,
+                schema_extension='.avsc')
+            ).write_schema_bundle(schema_bundle_uri=args.compile_avro_schema_bundle)
+        except (EmeraldSchemaParsingException, OSError) as sex:
+            logger.logger.critical('Unable to write AVRO schema bundle' + os.linesep +
+                                   'Error details: ' + str(sex.args))
+            return ExitCode.CodeError
+        return ExitCode.Success
+
     if args.list_avro_schemas is True:
         logger.logger.info('Running list avro schema_email')
 
@@ -94,6 +114,11 @@ def emerald_message_launcher(argv):
         logger.logger.info('AVRO schema namespaces: ' + os.linesep +
                            os.linesep.join([x for x in sorted(
                                AvroMessageSchemaFrozen.avro_schema_collection.avro_schema_namespaces)]))
+        logger.logger.info('AVRO schema fingerprints (CRC-64-AVRO): ' + os.linesep +
+                           os.linesep.join(sorted([
+                               x.hex() + ' ' + AvroMessageSchemaFrozen.avro_schema_collection.
+                               get_matching_schema_record_by_fingerprint(x).avro_schema.fullname
+                               for x in AvroMessageSchemaFrozen.avro_schema_collection.avro_schema_fingerprints])))
         # now write
         the_email_body.write_avro('/Users/davidthompson/Documents/hello.avro')
 
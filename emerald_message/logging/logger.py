@@ -40,6 +40,12 @@ class EmeraldLogger:
     def logger(self):
         return self._logger
 
+    #  use this to guard debug messages that are expensive to build (large payloads, str() of containers)
+    #  so none of the formatting work is done unless DEBUG output is actually enabled
+    @property
+    def is_debug_enabled(self) -> bool:
+        return self._logger.isEnabledFor(logging.DEBUG)
+
     @staticmethod
     def get_iso8601_utc_now_string() -> str:
         return datetime.datetime.strftime(
@@ -70,8 +76,17 @@ class EmeraldLogger:
         self._logger.propagate = propagate
         self._logger.setLevel(self._global_logging_level)
 
-        # build console logger
-        logger_console_handler = logging.StreamHandler(stream=sys.stdout)
+        # build console logger - loggers are shared by name, so reuse the console handler we attached
+        #  previously rather than adding another one (which would duplicate every message)
+        logger_console_handler = None
+        for this_handler in self._logger.handlers:
+            if getattr(this_handler, '_emerald_console_handler', False):
+                logger_console_handler = this_handler
+                break
+        if logger_console_handler is None:
+            logger_console_handler = logging.StreamHandler(stream=sys.stdout)
+            logger_console_handler._emerald_console_handler = True
+            self._logger.addHandler(logger_console_handler)
 
         logger_console_fmt = logging.Formatter(fmt='%(asctime)s::%(name)s::%(levelname)s::%(message)s',
                                                datefmt='%Y-%m-%d:%H:%M:%S%z',
@@ -81,5 +96,3 @@ class EmeraldLogger:
 
         logger_console_handler.setLevel(self._console_logging_level)
         logger_console_handler.setFormatter(logger_console_fmt)
-
-        self._logger.addHandler(logger_console_handler)
@@ -0,0 +1,298 @@
+import os
+import mmap
+import asyncio
+import tempfile
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import AsyncIterable, Awaitable, Callable, Dict, List, Optional
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import MultipartDecoder, NeedData, Field, File, Data, Epilogue
+from werkzeug.utils import secure_filename
+
+from emerald_message.containers.email.email_attachment import EmailAttachment, EmailAttachmentParameters
+from emerald_message.containers.email.email_attachment_digest import EmailAttachmentDigestBuilder
+from emerald_message.parsers.email.sendgrid_email_parser import ParsedEmail
+from emerald_message.parsers.email.streaming_attachment_reader import StreamingAttachmentConfigurationRecord, \
+    StreamingAttachmentReader
+from emerald_message.error import EmeraldEmailParsingError
+
+'''
+Configuration for parsing inbound SendGrid posts on an event loop
+    streaming_configuration_record: chunk_size_bytes is how much attachment data is gathered before it is handed to
+        the executor to be hashed (and written, once spilled); spill_threshold_bytes and spill_directory are as for
+        StreamingAttachmentReader
+    max_form_memory_size_bytes: largest non-file form field (headers, text, html) accepted
+    max_request_size_bytes: largest request body accepted (None for no limit)
+'''
+
+
+@dataclass(frozen=True)
+class AsyncSendGridParserConfigurationRecord:
+    streaming_configuration_record: StreamingAttachmentConfigurationRecord = StreamingAttachmentConfigurationRecord()
+    max_form_memory_size_bytes: int = 16 * 1024 * 1024
+    max_request_size_bytes: Optional[int] = None
+
+
+#
+#  Collects one attachment part as it arrives.  The event loop only appends to a small pending buffer; every
+#  chunk_size_bytes the buffer goes to the executor, where it is hashed and either kept in memory or - past the
+#  spill threshold - written to an anonymous temporary file that is memory mapped when the part ends.
+#  Blocks of one attachment are awaited in turn so the digest sees them in order
+#
+class _AsyncAttachmentAccumulator:
+    def _consume_block(self,
+                       block: bytes):
+        self._digest_builder.update(block)
+        if self._spill_file is None and \
+                len(self._contents) + len(block) > self._configuration_record.spill_threshold_bytes:
+            self._spill_file = tempfile.TemporaryFile(dir=self._configuration_record.spill_directory)
+            self._spill_file.write(self._contents)
+            self._contents = bytearray()
+        if self._spill_file is not None:
+            self._spill_file.write(block)
+        else:
+            self._contents.extend(block)
+
+    def _get_attachment(self) -> EmailAttachment:
+        if self._spill_file is None:
+            contents = bytes(self._contents)
+        else:
+            try:
+                self._spill_file.flush()
+                contents = mmap.mmap(self._spill_file.fileno(), 0, access=mmap.ACCESS_READ)
+            finally:
+                self._spill_file.close()
+        return EmailAttachment(container_parameters=EmailAttachmentParameters(
+            filename=self._filename,
+            mimetype=self._mimetype,
+            contents=contents,
+            contents_digest=self._digest_builder.digest()
+        ))
+
+    async def add(self,
+                  data: bytes):
+        self._pending.extend(data)
+        if len(self._pending) >= self._configuration_record.chunk_size_bytes:
+            block = bytes(self._pending)
+            self._pending = bytearray()
+            await self._loop.run_in_executor(self._executor, self._consume_block, block)
+
+    async def finish(self) -> EmailAttachment:
+        if len(self._pending) > 0:
+            await self._loop.run_in_executor(self._executor, self._consume_block, bytes(self._pending))
+            self._pending = bytearray()
+        return await self._loop.run_in_executor(self._executor, self._get_attachment)
+
+    def close(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+
+    def __init__(self,
+                 filename: str,
+                 mimetype: Optional[str],
+                 configuration_record: StreamingAttachmentConfigurationRecord,
+                 loop: asyncio.AbstractEventLoop,
+                 executor: Optional[Executor]):
+        self._filename = filename
+        self._mimetype = mimetype
+        self._configuration_record = configuration_record
+        self._loop = loop
+        self._executor = executor
+        self._digest_builder = EmailAttachmentDigestBuilder()
+        self._pending = bytearray()
+        self._contents = bytearray()
+        self._spill_file = None
+
+
+#
+#  asyncio counterpart to ParsedEmail: the multipart body is decoded incrementally as it arrives (werkzeug's sans-io
+#  decoder), so no request is buffered whole and no thread is held while the client uploads.  Hashing, spill
+#  writes, building the containers and AVRO encoding run in the executor (None is the loop's default thread pool):
+#       parsed_email = await AsyncParsedEmail.from_body_stream(body_chunks, content_type)
+#       avro_bytes = await parsed_email.get_email_container_avro_bytes(single_object_encoding=True)
+#  Everything else - the properties, email_container - is the same as ParsedEmail
+#
+class AsyncParsedEmail(ParsedEmail):
+    @classmethod
+    async def from_body_stream(cls,
+                               body_chunks: AsyncIterable[bytes],
+                               content_type: str,
+                               configuration_record: Optional[AsyncSendGridParserConfigurationRecord] = None,
+                               executor: Optional[Executor] = None) -> 'AsyncParsedEmail':
+        if configuration_record is None:
+            configuration_record = AsyncSendGridParserConfigurationRecord()
+        if not isinstance(configuration_record, AsyncSendGridParserConfigurationRecord):
+            raise EmeraldEmailParsingError('Async parser configuration must be of type ' +
+                                           AsyncSendGridParserConfigurationRecord.__name__ +
+                                           os.linesep + 'Type provided = ' + type(configuration_record).__name__)
+        # validates the streaming settings the same way the synchronous reader does
+        streaming_configuration_record = StreamingAttachmentReader(
+            configuration_record=configuration_record.streaming_configuration_record).configuration_record
+
+        mimetype, content_type_options = parse_options_header(content_type)
+        boundary = content_type_options.get('boundary')
+        if mimetype != 'multipart/form-data' or not boundary:
+            raise EmeraldEmailParsingError('Inbound email must be posted as multipart/form-data with a boundary' +
+                                           os.linesep + 'Content type sent is ' + str(content_type))
+
+        loop = asyncio.get_running_loop()
+        decoder = MultipartDecoder(boundary.encode('latin-1'),
+                                   max_form_memory_size=configuration_record.max_form_memory_size_bytes)
+        form: Dict[str, str] = {}
+        email_attachments: List[EmailAttachment] = []
+        field_name: Optional[str] = None
+        field_data = bytearray()
+        attachment_accumulator: Optional[_AsyncAttachmentAccumulator] = None
+        epilogue_reached = False
+        received_size_bytes = 0
+
+        async def drain_events():
+            nonlocal field_name, field_data, attachment_accumulator, epilogue_reached
+            while True:
+                event = decoder.next_event()
+                if isinstance(event, NeedData):
+                    return
+                if isinstance(event, Epilogue):
+                    epilogue_reached = True
+                    return
+                if isinstance(event, File):
+                    field_name = None
+                    # the synchronous parser skips these placeholder uploads as well
+                    if event.filename in (None, '', 'fdopen', '<fdopen>'):
+                        attachment_accumulator = None
+                    else:
+                        attachment_accumulator = _AsyncAttachmentAccumulator(
+                            filename=secure_filename(event.filename),
+                            mimetype=event.headers.get('Content-Type'),
+                            configuration_record=streaming_configuration_record,
+                            loop=loop,
+                            executor=executor)
+                elif isinstance(event, Field):
+                    field_name = event.name
+                    field_data = bytearray()
+                    attachment_accumulator = None
+                elif isinstance(event, Data):
+                    if attachment_accumulator is not None:
+                        await attachment_accumulator.add(event.data)
+                        if not event.more_data:
+                            email_attachments.append(await attachment_accumulator.finish())
+                            attachment_accumulator = None
+                    elif field_name is not None:
+                        field_data.extend(event.data)
+                        if not event.more_data:
+                            form[field_name] = field_data.decode('utf-8', errors='replace')
+                            field_name = None
+
+        try:
+            async for chunk in body_chunks:
+                received_size_bytes += len(chunk)
+                if configuration_record.max_request_size_bytes is not None and \
+                        received_size_bytes > configuration_record.max_request_size_bytes:
+                    raise RequestEntityTooLarge()
+                decoder.receive_data(chunk)
+                await drain_events()
+            decoder.receive_data(None)
+            await drain_events()
+        except ValueError as vex:
+            raise EmeraldEmailParsingError('Unable to decode the multipart body of the inbound email' +
+                                           os.linesep + 'Exception info: ' + str(vex))
+        finally:
+            if attachment_accumulator is not None:
+                attachment_accumulator.close()
+        if not epilogue_reached:
+            raise EmeraldEmailParsingError('Inbound email multipart body ended before its closing boundary' +
+                                           os.linesep + 'Bytes received = ' + str(received_size_bytes))
+
+        parsed_email = cls.__new__(cls)
+        parsed_email._executor = executor
+        await loop.run_in_executor(executor,
+                                   lambda: parsed_email._parse_sendgrid_payload(
+                                       sendgrid_payload=form,
+                                       files={},
+                                       streaming_configuration_record=streaming_configuration_record,
+                                       email_attachments=email_attachments))
+        return parsed_email
+
+    async def get_email_container_avro_bytes(self,
+                                             single_object_encoding: bool = False) -> bytes:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            lambda: self.email_container.to_avro_bytes(single_object_encoding=single_object_encoding))
+
+
+#
+#  Minimal ASGI application for the SendGrid inbound parse webhook.  Each POST is parsed with AsyncParsedEmail and
+#  handed to the handler coroutine; the response is 200 once the handler returns, 400 for a post that cannot be
+#  parsed and 413 for one over the configured limits.  Serve it with any ASGI server, for example
+#       application = SendGridInboundParseApplication(email_handler=store_email)
+#       uvicorn my_module:application
+#
+class SendGridInboundParseApplication:
+    @staticmethod
+    async def _send_response(send,
+                             status: int,
+                             response_text: str):
+        response_body = response_text.encode('utf-8')
+        await send({'type': 'http.response.start',
+                    'status': status,
+                    'headers': [(b'content-type', b'text/plain; charset=utf-8'),
+                                (b'content-length', str(len(response_body)).encode('ascii'))]})
+        await send({'type': 'http.response.body', 'body': response_body})
+
+    @staticmethod
+    async def _iter_request_body(receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise EmeraldEmailParsingError('Client disconnected before the inbound email was received')
+            body_chunk = message.get('body', b'')
+            if len(body_chunk) > 0:
+                yield body_chunk
+            if not message.get('more_body', False):
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+        if scope['method'] != 'POST':
+            await self._send_response(send, 405, 'Method not allowed')
+            return
+
+        content_type = ''
+        for header_name, header_value in scope.get('headers', []):
+            if header_name.lower() == b'content-type':
+                content_type = header_value.decode('latin-1')
+
+        try:
+            parsed_email = await AsyncParsedEmail.from_body_stream(
+                body_chunks=self._iter_request_body(receive),
+                content_type=content_type,
+                configuration_record=self._configuration_record,
+                executor=self._executor)
+        except RequestEntityTooLarge:
+            await self._send_response(send, 413, 'Request too large')
+            return
+        except EmeraldEmailParsingError as eex:
+            await self._send_response(send, 400, 'Unable to parse inbound email' + os.linesep + str(eex.args[0]))
+            return
+
+        await self._email_handler(parsed_email)
+        await self._send_response(send, 200, 'OK')
+
+    def __init__(self,
+                 email_handler: Callable[[AsyncParsedEmail], Awaitable[None]],
+                 configuration_record: Optional[AsyncSendGridParserConfigurationRecord] = None,
+                 executor: Optional[Executor] = None):
+        self._email_handler = email_handler
+        self._configuration_record = configuration_record
+        self._executor = executor
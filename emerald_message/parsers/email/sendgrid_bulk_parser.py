@@ -0,0 +1,164 @@
+import os
+import json
+import base64
+import collections
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+from werkzeug.datastructures import FileStorage
+
+from emerald_message.containers.email.email_container import EmailContainer
+from emerald_message.containers.email.email_container_v2 import EmailContainerV2
+from emerald_message.parsers.email.sendgrid_email_parser import ParsedEmail
+from emerald_message.parsers.email.streaming_attachment_reader import StreamingAttachmentConfigurationRecord
+from emerald_message.logging.logger import EmeraldLogger
+from emerald_message.error import EmeraldEmailParsingError, EmeraldError
+
+'''
+A captured SendGrid webhook post is one JSON object:
+    {"form": {"headers": "...", "envelope": "...", "attachments": "1", ...},
+     "files": {"attachment1": {"filename": "a.pdf", "content_type": "application/pdf", "contents_base64": "..."}}}
+"files" may be left out when the post had no attachments
+'''
+CAPTURED_SENDGRID_PAYLOAD_EXTENSION = '.json'
+
+'''
+Configuration for the bulk parser
+    max_workers: parser processes (None uses the processor count)
+    payloads_per_task: captured payloads parsed by a worker in one task - larger values cut the inter-process
+        overhead, smaller ones spread uneven work more evenly
+    max_pending_tasks: tasks submitted ahead of the consumer (None is two per worker) - bounds the memory held for
+        payloads read but not yet parsed and containers parsed but not yet consumed
+    skip_unparseable: log and skip payloads that fail to parse instead of raising
+    streaming_configuration_record: passed to ParsedEmail in the workers (see StreamingAttachmentReader)
+'''
+
+
+@dataclass(frozen=True)
+class SendGridBulkParserConfigurationRecord:
+    max_workers: Optional[int] = None
+    payloads_per_task: int = 32
+    max_pending_tasks: Optional[int] = None
+    skip_unparseable: bool = False
+    streaming_configuration_record: Optional[StreamingAttachmentConfigurationRecord] = None
+
+
+_sendgrid_bulk_parser_logger = EmeraldLogger(logging_module_name='SendGridBulkParser')
+
+
+def parse_captured_sendgrid_payload(captured_payload_json: str,
+                                    streaming_configuration_record:
+                                    Optional[StreamingAttachmentConfigurationRecord] = None) -> ParsedEmail:
+    try:
+        captured_payload = json.loads(captured_payload_json)
+        form = captured_payload['form']
+        files = {field_name: FileStorage(stream=BytesIO(base64.b64decode(file_entry['contents_base64'])),
+                                         filename=file_entry.get('filename'),
+                                         name=field_name,
+                                         content_type=file_entry.get('content_type'))
+                 for field_name, file_entry in captured_payload.get('files', {}).items()}
+    except (json.JSONDecodeError, KeyError, TypeError, AttributeError, ValueError) as pex:
+        raise EmeraldEmailParsingError('Unable to read captured SendGrid payload - expected a JSON object with ' +
+                                       '"form" and optional "files"' + os.linesep +
+                                       'Exception info: ' + type(pex).__name__ + ': ' + str(pex))
+
+    return ParsedEmail.from_form_data(form=form,
+                                      files=files,
+                                      streaming_configuration_record=streaming_configuration_record)
+
+
+#
+#  Worker side of a task.  Containers go back to the parent as single object encoded AVRO - compact, and spilled
+#  (memory mapped) attachments cannot be pickled
+#
+def _parse_captured_sendgrid_payload_batch(captured_payload_batch: List[Tuple[str, str]],
+                                           skip_unparseable: bool,
+                                           streaming_configuration_record:
+                                           Optional[StreamingAttachmentConfigurationRecord]) -> List[bytes]:
+    email_container_bytes_list = []
+    for payload_source, captured_payload_json in captured_payload_batch:
+        try:
+            parsed_email = parse_captured_sendgrid_payload(
+                captured_payload_json=captured_payload_json,
+                streaming_configuration_record=streaming_configuration_record)
+        except EmeraldError as eex:
+            if not skip_unparseable:
+                raise EmeraldEmailParsingError('Unable to parse captured payload ' + payload_source +
+                                               os.linesep + str(eex.args[0] if len(eex.args) > 0 else eex))
+            _sendgrid_bulk_parser_logger.logger.warning('Skipping captured payload ' + payload_source +
+                                                        ' - unable to parse' + os.linesep + str(eex))
+            continue
+        email_container_bytes_list.append(parsed_email.email_container.to_avro_bytes(single_object_encoding=True))
+    return email_container_bytes_list
+
+
+def iter_captured_sendgrid_payloads_from_directory(captured_payload_directory: str) -> Iterator[Tuple[str, str]]:
+    for entry_name in sorted(os.listdir(captured_payload_directory)):
+        if os.path.splitext(entry_name)[1] != CAPTURED_SENDGRID_PAYLOAD_EXTENSION:
+            continue
+        entry_path = os.path.join(captured_payload_directory, entry_name)
+        if os.path.isfile(entry_path):
+            with open(entry_path, encoding='utf-8', mode='r') as captured_payload_fp:
+                yield entry_path, captured_payload_fp.read()
+
+
+def iter_captured_sendgrid_payloads_from_jsonl(captured_payload_lines: Iterable[str],
+                                               source_name: str = '<jsonl>') -> Iterator[Tuple[str, str]]:
+    for line_number, captured_payload_line in enumerate(captured_payload_lines, start=1):
+        if len(captured_payload_line.strip()) > 0:
+            yield source_name + ':' + str(line_number), captured_payload_line
+
+
+#
+#  Re-parses captured webhook posts through a process pool, yielding EmailContainerV2 in input order.
+#  captured_payloads yields (source, payload JSON) - see the iter_captured_sendgrid_payloads_from_* helpers:
+#       with open('/archive/posts.jsonl', encoding='utf-8') as jsonl_fp:
+#           for email_container in parse_captured_sendgrid_payloads(
+#                   iter_captured_sendgrid_payloads_from_jsonl(jsonl_fp, source_name='posts.jsonl')):
+#               ...
+#  Only a bounded number of tasks is in flight, so input larger than memory streams through
+#
+def parse_captured_sendgrid_payloads(captured_payloads: Iterable[Tuple[str, str]],
+                                     bulk_parser_configuration_record:
+                                     Optional[SendGridBulkParserConfigurationRecord] = None) \
+        -> Iterator[EmailContainer]:
+    if bulk_parser_configuration_record is None:
+        bulk_parser_configuration_record = SendGridBulkParserConfigurationRecord()
+    if not isinstance(bulk_parser_configuration_record, SendGridBulkParserConfigurationRecord):
+        raise TypeError('Caller must provide bulk_parser_configuration_record as None or a valid ' +
+                        SendGridBulkParserConfigurationRecord.__name__ + os.linesep +
+                        'Type provided = ' + type(bulk_parser_configuration_record).__name__)
+    if bulk_parser_configuration_record.payloads_per_task < 1:
+        raise ValueError('payloads_per_task must be at least 1' + os.linesep +
+                         'Value provided = ' + str(bulk_parser_configuration_record.payloads_per_task))
+
+    max_pending_tasks = bulk_parser_configuration_record.max_pending_tasks
+    if max_pending_tasks is None:
+        max_pending_tasks = 2 * (bulk_parser_configuration_record.max_workers or os.cpu_count() or 1)
+
+    with ProcessPoolExecutor(max_workers=bulk_parser_configuration_record.max_workers) as executor:
+        pending_task_queue: Deque = collections.deque()
+        captured_payload_batch: List[Tuple[str, str]] = []
+        captured_payload_iterator = iter(captured_payloads)
+        input_exhausted = False
+
+        while not input_exhausted or len(pending_task_queue) > 0:
+            while not input_exhausted and len(pending_task_queue) < max_pending_tasks:
+                captured_payload = next(captured_payload_iterator, None)
+                if captured_payload is not None:
+                    captured_payload_batch.append(captured_payload)
+                else:
+                    input_exhausted = True
+                if len(captured_payload_batch) >= bulk_parser_configuration_record.payloads_per_task or \
+                        (input_exhausted and len(captured_payload_batch) > 0):
+                    pending_task_queue.append(executor.submit(
+                        _parse_captured_sendgrid_payload_batch,
+                        captured_payload_batch,
+                        bulk_parser_configuration_record.skip_unparseable,
+                        bulk_parser_configuration_record.streaming_configuration_record))
+                    captured_payload_batch = []
+
+            if len(pending_task_queue) > 0:
+                for email_container_bytes in pending_task_queue.popleft().result():
+                    yield EmailContainerV2.from_avro_bytes(email_container_bytes)
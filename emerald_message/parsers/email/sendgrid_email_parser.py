@@ -2,32 +2,48 @@ import os
 import json
 import mimetypes
 import datetime
-import base64
 
-from typing import List, Optional, FrozenSet
-from flask import request
+from typing import Any, Dict, List, Mapping, Optional, FrozenSet, Tuple
+from werkzeug.datastructures import FileStorage
 from werkzeug.local import LocalProxy
 from werkzeug.utils import secure_filename
-from werkzeug.datastructures import ImmutableList
 from six import iteritems
-from io import StringIO
-
-from emerald_message.containers.email.email_container import EmailContainer
-from emerald_message.containers.email.email_envelope import EmailEnvelope
-from emerald_message.containers.email.email_body import EmailBody
-from emerald_message.containers.email.email_message_metadata import EmailMessageMetadata
-from emerald_message.containers.email.email_attachment import EmailAttachment
+from io import StringIO, BytesIO
+
+from emerald_message.containers.email.email_container import EmailContainer, EmailContainerParameters
+from emerald_message.containers.email.email_container_v2 import EmailContainerV2
+from emerald_message.containers.email.email_envelope import EmailEnvelope, EmailEnvelopeParameters
+from emerald_message.containers.email.email_body import EmailBody, EmailBodyParameters
+from emerald_message.containers.email.email_message_metadata import EmailMessageMetadata, \
+    EmailMessageMetadataParameters
+from emerald_message.containers.email.email_attachment import EmailAttachment, EmailAttachmentParameters
+from emerald_message.parsers.email.sendgrid_metadata_parser import parse_sendgrid_form
+from emerald_message.parsers.email.streaming_attachment_reader import StreamingAttachmentReader, \
+    StreamingAttachmentConfigurationRecord
 
 from emerald_message.logging.logger import EmeraldLogger
 
 from emerald_message.error import EmeraldEmailParsingError
 
+# shared by all ParsedEmail instances - one is built per inbound request
+_parsed_email_logger = EmeraldLogger(logging_module_name='ParsedEmail')
+
 
 class ParsedEmail:
     @property
     def sendgrid_payload(self):
         return self._sendgrid_payload
 
+    # character set of each field from the charsets JSON sent by SendGrid
+    @property
+    def charsets(self) -> Dict[str, str]:
+        return self._charsets
+
+    # (signing identity, result) for each DKIM signature - email_dkim_sender_passed is True only if all passed
+    @property
+    def dkim_results(self) -> Tuple[Tuple[str, str], ...]:
+        return self._dkim_results
+
     @property
     def logger(self) -> EmeraldLogger:
         return self._logger
@@ -59,132 +75,118 @@ class ParsedEmail:
         return self._email_container.email_body.message_body_html
 
 
+    # files may hold plain binary file objects or bytes - name and type come from attachment-info when present
+    @staticmethod
+    def _get_file_storage(field_name: str,
+                          file_object: Any,
+                          attachment_info: Mapping) -> FileStorage:
+        if isinstance(file_object, FileStorage):
+            return file_object
+        field_attachment_info = attachment_info.get(field_name) if isinstance(attachment_info, dict) else None
+        if not isinstance(field_attachment_info, dict):
+            field_attachment_info = {}
+        filename = field_attachment_info.get('filename',
+                                             os.path.basename(str(getattr(file_object, 'name', field_name))))
+        content_type = field_attachment_info.get('type', mimetypes.guess_type(filename)[0])
+        return FileStorage(stream=BytesIO(file_object) if isinstance(file_object, (bytes, bytearray)) else file_object,
+                           filename=filename,
+                           name=field_name,
+                           content_type=content_type)
+
+    #
+    #  Build from a captured webhook post rather than a live request - form is the mapping of SendGrid form fields
+    #  and files maps each attachment field name ("attachment1" ...) to a FileStorage, a binary file object or bytes
+    #
+    @classmethod
+    def from_form_data(cls,
+                       form: Mapping[str, str],
+                       files: Optional[Mapping[str, Any]] = None,
+                       streaming_configuration_record: Optional[StreamingAttachmentConfigurationRecord] = None) \
+            -> 'ParsedEmail':
+        if files is None:
+            files = {}
+        try:
+            attachment_info = json.loads(form.get('attachment-info', '{}'))
+        except (json.JSONDecodeError, TypeError):
+            # reported with the detail when the attachments are parsed
+            attachment_info = {}
+
+        parsed_email = cls.__new__(cls)
+        parsed_email._parse_sendgrid_payload(
+            sendgrid_payload=form,
+            files={k: cls._get_file_storage(field_name=k, file_object=v, attachment_info=attachment_info)
+                   for k, v in files.items()},
+            streaming_configuration_record=streaming_configuration_record)
+        return parsed_email
+
+    #
+    #  Pass streaming_configuration_record to enable streaming ingestion: the request body is not buffered
+    #  as text up front and attachments are read in chunks and hashed as they arrive, with large ones spilled to
+    #  memory mapped temporary files (see StreamingAttachmentReader)
+    #
     def __init__(self,
-                 inbound_request: LocalProxy):
-        inbound_request.get_data(as_text=True)
+                 inbound_request: LocalProxy,
+                 streaming_configuration_record: Optional[StreamingAttachmentConfigurationRecord] = None):
+        if streaming_configuration_record is None:
+            inbound_request.get_data(as_text=True)
+
+        if _parsed_email_logger.is_debug_enabled:
+            _parsed_email_logger.logger.debug('The type of request is ' + str(type(inbound_request)))
+        self._parse_sendgrid_payload(sendgrid_payload=inbound_request.form,
+                                     files=inbound_request.files,
+                                     streaming_configuration_record=streaming_configuration_record)
+
+    # email_attachments, when given, are attachments already read by the caller and replace reading files
+    def _parse_sendgrid_payload(self,
+                                sendgrid_payload: Mapping[str, str],
+                                files: Mapping[str, FileStorage],
+                                streaming_configuration_record: Optional[StreamingAttachmentConfigurationRecord],
+                                email_attachments: Optional[List[EmailAttachment]] = None):
+        if streaming_configuration_record is None:
+            streaming_attachment_reader = None
+        else:
+            streaming_attachment_reader = StreamingAttachmentReader(
+                configuration_record=streaming_configuration_record)
 
-        self._logger = EmeraldLogger(logging_module_name=type(self).__name__)
+        self._logger = _parsed_email_logger
+        debug_enabled = self._logger.is_debug_enabled
 
-        print('The type of request is ' + str(type(inbound_request)))
-        self._sendgrid_payload = inbound_request.form
-        print('the type of payload is ' + str(type(self._sendgrid_payload)))
+        self._sendgrid_payload = sendgrid_payload
+        if debug_enabled:
+            self._logger.logger.debug('the type of payload is ' + str(type(self._sendgrid_payload)))
 
         # The type of request is <class 'werkzeug.local.LocalProxy'>
         # the type of payload is <class 'werkzeug.datastructures.ImmutableMultiDict'>
 
-        # run through the tuples that represent key value pairs
-        email_data_dictionary = dict()
-        for kvcount, kvpair in enumerate(self.sendgrid_payload.items(), start=1):
-            print('Pair #' + str(kvcount) + ': ' + str(kvpair))
-            email_data_dictionary[kvpair[0]] = kvpair[1]
+        if debug_enabled:
+            for kvcount, kvpair in enumerate(self.sendgrid_payload.items(), start=1):
+                self._logger.logger.debug('Pair #' + str(kvcount) + ': ' + str(kvpair))
 
-        # get the charsets
+        # one pass over the form for every field used below - reports all missing required fields at once
         #   ('charsets', '{"to":"UTF-8","html":"UTF-8","subject":"UTF-8","from":"UTF-8","text":"UTF-8"}')
-        try:
-            self._charsets = self.sendgrid_payload['charsets']
-        except KeyError:
-            raise EmeraldEmailParsingError('Unable to find charsets in key list for inbound email' +
-                                           os.linesep + 'Keys found: ' +
-                                           ','.join([str(x) for x in email_data_dictionary.keys()]))
+        #   ('dkim', '{@cottonfields.us : pass}')
+        #   ('SPF', 'pass')
+        sendgrid_form_record = parse_sendgrid_form(self.sendgrid_payload)
+        self._charsets = sendgrid_form_record.charsets
+        self._dkim_results = sendgrid_form_record.dkim_results
+        attachment_count = sendgrid_form_record.attachment_count
+        if debug_enabled and sendgrid_form_record.email_dkim_sender_passed is not True:
+            self._logger.logger.debug('DKIM did not pass for every signature - value is "' +
+                                      str(self.sendgrid_payload.get('dkim')) + '"')
 
         ###############
         #  Email Container Element: METADATA
         ###############
 
-        #  DET FIXME TODO - get DKIM and SPF
-        #   ('dkim', '{david@cottonfields.us : pass}')
-        #   ('SPF', 'pass')
-        #
-
-        # get the headers
-        try:
-            email_message_headers = self.sendgrid_payload['headers']
-        except KeyError:
-            raise EmeraldEmailParsingError('Unable to find email headers in key list for inbound email' +
-                                           os.linesep + 'Keys found: ' +
-                                           ','.join([str(x) for x in email_data_dictionary.keys()]))
-
-        # get the sender ip
-        #   ('sender_ip', '136.143.188.19')
-        try:
-            sender_ip = self.sendgrid_payload['sender_ip']
-        except KeyError:
-            raise EmeraldEmailParsingError('Unable to find sender_ip in key list for inbound email' +
-                                           os.linesep + 'Keys found: ' +
-                                           ','.join([str(x) for x in email_data_dictionary.keys()]))
-
-        # get attachment count and then we can decide if attachment parsing needed
-        #       ('attachments', '0')
-        try:
-            attachment_count = int(self.sendgrid_payload['attachments'])
-        except KeyError:
-            raise EmeraldEmailParsingError('Unable to find attachments (the count) in key list for inbound email' +
-                                           os.linesep + 'Keys found: ' +
-                                           ','.join([str(x) for x in email_data_dictionary.keys()]))
-        except (TypeError, ValueError):
-            raise EmeraldEmailParsingError('Unable to parse the attachment count as integer' +
-                                           os.linesep + 'Value sent is ' + str(self.sendgrid_payload['attachments']))
-
-        #
-        #  SPF is a single check but we get as a string "pass"
-        #
-        try:
-            email_spf_passed: Optional[bool] = True if self.sendgrid_payload['spf'].casefold() == 'pass' else False
-        except KeyError:
-            email_spf_passed: Optional[bool] = None
-
-        #
-        #  DKIM arrives as a dictionary keyed by email address - set TRUE only if all say pass
-        #
-        email_dkim_passed: Optional[bool] = None
-        try:
-            email_dkim_passed_dict_string: str = self.sendgrid_payload['dkim']
-            #  unfortunately it comes like this: "{ myemail@mydomain.com: pass}" which because there are no quotes
-            #  means you can't read with json.loads.  We need JSON.stringify as in javascript
-            #  Just split the string on commas, then colons
-            if not email_dkim_passed_dict_string.startswith('{'):
-                raise ValueError('Expected DKIM string to begin with { character')
-            if not email_dkim_passed_dict_string.endswith('}'):
-                raise ValueError('Expected DKIM string to end with } character')
-            # now strip braces and leading and trailing spaces
-            email_dkim_passed_dict_string = email_dkim_passed_dict_string.lstrip('{').rstrip('}').lstrip().rstrip()
-            email_dkim_entries = email_dkim_passed_dict_string.split(',')
-            for entry_counter, this_entry in enumerate(email_dkim_entries, start=1):
-                # split on colon to get key value and throw error if not two elements
-                this_entry_kv_pair = this_entry.split(':')
-                if len(this_entry_kv_pair) != 2:
-                    raise ValueError('DKIM entry #' + str(entry_counter) + ' is not valid - expected format ' +
-                                     '<key>:<value>' + os.linesep + '\tValue provided = ' +
-                                     email_dkim_passed_dict_string)
-                dkim_status_this_entry_string = this_entry_kv_pair[1].rstrip().lstrip().casefold()
-                if dkim_status_this_entry_string != 'pass':
-                    print('DKIM entry #' + str(entry_counter) + ' does not have pass value ' +
-                          '<key>:<value>' + os.linesep + '\tValue provided = ' +
-                          email_dkim_passed_dict_string + os.linesep +
-                          '\tValue = ' + dkim_status_this_entry_string)
-                    email_dkim_passed = False
-                    break
-
-            email_dkim_passed: Optional[bool] = True
-        except KeyError:
-            # Not found
-            print('No DKIM status info passed for email')
-            pass
-        except ValueError as vex:
-            print('Unable to parse expected pseudo-JSON DKIM dictionary - value is "' + str(
-                self.sendgrid_payload['dkim']) +
-                  '"' + os.linesep + 'Exception: ' + str(vex))
-            pass
-
-        email_container_metadata = EmailMessageMetadata(
+        email_container_metadata = EmailMessageMetadata(container_parameters=EmailMessageMetadataParameters(
             router_source_tag='self',
             routed_timestamp_iso8601=EmeraldLogger.get_iso8601_utc_now_string(),
-            email_sender_ip=sender_ip,
+            email_sender_ip=sendgrid_form_record.email_sender_ip,
             attachment_count=attachment_count,
-            email_headers=email_message_headers,
-            email_spf_sender_passed=email_spf_passed,
-            email_dkim_sender_passed=email_dkim_passed
-        )
+            email_headers=sendgrid_form_record.email_headers,
+            email_spf_sender_passed=sendgrid_form_record.email_spf_sender_passed,
+            email_dkim_sender_passed=sendgrid_form_record.email_dkim_sender_passed
+        ))
 
         ###############
         #  Email Container Element: ENVELOPE
@@ -194,23 +196,13 @@ class ParsedEmail:
         #   ('to', '"test1" <test1@ingestion.dynastyse.com>')
         #   ('from', 'David Thompson <david@cottonfields.us>')
         #   ('envelope', '{"to":["test1@ingestion.dynastyse.com"],"from":"david@cottonfields.us"}')
-        try:
-            envelope_json = self.sendgrid_payload['envelope']
-        except KeyError:
-            raise EmeraldEmailParsingError('Unable to find envelope in key list for inbound email' +
-                                           os.linesep + 'Keys found: ' +
-                                           ','.join([str(x) for x in email_data_dictionary.keys()]))
+        envelope_json = sendgrid_form_record.envelope_json
 
         #
         # Subject is in text form
         #   ('subject', 'with at')
         #
-        try:
-            email_subject = self.sendgrid_payload['subject']
-        except KeyError:
-            raise EmeraldEmailParsingError('Unable to parse subject in key list for inbound email' +
-                                           os.linesep + 'Keys found: ' +
-                                           ','.join([str(x) for x in email_data_dictionary.keys()]))
+        email_subject = sendgrid_form_record.subject
 
         # SendGrid envelop contains only the from and to - we add subject
         try:
@@ -221,14 +213,22 @@ class ParsedEmail:
                                            str(envelope_json) + os.linesep +
                                            'Exception info: ' + str(jdex))
         else:
+            # a well formed envelope is an object with the sender as a string and the recipients as a list of them
+            if not isinstance(envelope, dict) or \
+                    not isinstance(envelope.get('from'), str) or \
+                    not isinstance(envelope.get('to'), list) or \
+                    not all(isinstance(x, str) for x in envelope['to']):
+                raise EmeraldEmailParsingError('Envelope json must be an object with "from" as a string and ' +
+                                               '"to" as a list of strings' +
+                                               os.linesep + 'Value of text = ' + os.linesep + str(envelope_json))
             #
             #  Now initialize the email envelop
             #
-            email_container_envelope = EmailEnvelope(
+            email_container_envelope = EmailEnvelope(container_parameters=EmailEnvelopeParameters(
                 address_from=envelope['from'],
                 address_to_collection=frozenset(envelope['to']),
                 message_subject=email_subject,
-                message_rx_timestamp_iso8601=EmeraldLogger.get_iso8601_utc_now_string())
+                message_rx_timestamp_iso8601=EmeraldLogger.get_iso8601_utc_now_string()))
 
         ###############
         #  Email Container Element: BODY
@@ -238,12 +238,7 @@ class ParsedEmail:
         #  Use the charsets to know the encoding
         #
         #  ('text', '')
-        try:
-            message_body_text = self.sendgrid_payload['text']
-        except KeyError:
-            raise EmeraldEmailParsingError('Unable to find text (message body) in key list for inbound email' +
-                                           os.linesep + 'Keys found: ' +
-                                           ','.join([str(x) for x in email_data_dictionary.keys()]))
+        message_body_text = sendgrid_form_record.message_body_text
         # and look for html as contents are there
         # Pair #4: ('html', '<!DOCTYPE html PUBLIC "-//W3C//DTD HTML 4.01 Transitional//EN">
         # <html><head><meta content="text/html;charset=UTF-8" http-equiv="Content-Type"></head>
@@ -253,15 +248,14 @@ class ParsedEmail:
         # <div><br></div><div class="align-left" style="text-align: left;">Because<u> I marked it up</u></div><
         # /div><br></body></html>')
 
-        try:
-            message_body_html = self.sendgrid_payload['html']
-        except KeyError:
-            print('No HTML element in payload')
-            message_body_html = None
+        message_body_html = sendgrid_form_record.message_body_html
+        if debug_enabled and message_body_html is None:
+            self._logger.logger.debug('No HTML element in payload')
 
         # DET TODO handle HTML and text encoding cases later
-        email_container_body = EmailBody(message_body_text=message_body_text,
-                                         message_body_html=message_body_html)
+        email_container_body = EmailBody(container_parameters=EmailBodyParameters(
+            message_body_text=message_body_text,
+            message_body_html=message_body_html))
 
         ###############
         #  Email Container Element: ATTACHMENT COLLECTION
@@ -270,15 +264,15 @@ class ParsedEmail:
         # if attachment count > 0 we need attachment-info
         attachments: List[EmailAttachment] = []
         if attachment_count > 0:
-            print('Attachment count: ' + str(attachment_count))
+            if debug_enabled:
+                self._logger.logger.debug('Attachment count: ' + str(attachment_count))
 
-            try:
-                attachment_info_json = self.sendgrid_payload['attachment-info']
-            except KeyError:
+            attachment_info_json = sendgrid_form_record.attachment_info_json
+            if attachment_info_json is None:
                 raise EmeraldEmailParsingError('Unable to find attachment-info in key list for inbound email' +
                                                os.linesep + 'Attachment count shows as ' + str(attachment_count) +
                                                os.linesep + 'Keys found: ' +
-                                               ','.join([str(x) for x in email_data_dictionary.keys()]))
+                                               ','.join([str(x) for x in self.sendgrid_payload.keys()]))
             try:
                 attachment_info = json.loads(attachment_info_json)
             except json.JSONDecodeError as jdex:
@@ -286,33 +280,45 @@ class ParsedEmail:
                                                os.linesep + 'Value of text = ' + os.linesep +
                                                str(attachment_info_json) + os.linesep)
 
-            self.logger.logger.info('Attachment info: ' + str(attachment_info))
-
-            print('Now get attachments - files type = ' + str(type(request.files)))
+            if debug_enabled:
+                self._logger.logger.debug('Attachment info: ' + str(attachment_info))
+                self._logger.logger.debug('Now get attachments - files type = ' + str(type(files)))
             # Now get attachments - files type = <class 'werkzeug.datastructures.ImmutableMultiDict'>
 
-            for _, filestorage in iteritems(request.files):
+            if email_attachments is not None:
+                attachments.extend(email_attachments)
+                files = {}
+            for _, filestorage in iteritems(files):
                 if filestorage.filename not in (None, 'fdopen', '<fdopen>'):
                     filename = secure_filename(filestorage.filename)
-                    attachment = EmailAttachment(
-                        filename=filename,
-                        mimetype=filestorage.content_type,
-                        contents_base64=base64.b64encode(filestorage.read())
-                    )
+                    if streaming_attachment_reader is not None:
+                        attachment = streaming_attachment_reader.read_attachment(filestorage=filestorage,
+                                                                                 filename=filename)
+                    else:
+                        # keep the raw bytes - base64 is only produced if a consumer asks for it
+                        attachment = EmailAttachment(container_parameters=EmailAttachmentParameters(
+                            filename=filename,
+                            mimetype=filestorage.content_type,
+                            contents=filestorage.read()
+                        ))
                     attachments.append(attachment)
                 else:
-                    print('Found attachment filename as unsupported value "' + str(filestorage.filename))
+                    if debug_enabled:
+                        self._logger.logger.debug('Found attachment filename as unsupported value "' +
+                                                  str(filestorage.filename))
 
-            print('Total attachment count = ' + str(len(attachments)))
-            print('Total specified count = ' + str(attachment_count))
+            if debug_enabled:
+                self._logger.logger.debug('Total attachment count = ' + str(len(attachments)))
+                self._logger.logger.debug('Total specified count = ' + str(attachment_count))
 
-        # Now build overall container
-        self._email_container = EmailContainer(
-            email_container_metadata=email_container_metadata,
+        # Now build overall container - the V2 level stores the attachments as raw bytes
+        self._email_container = EmailContainerV2(container_parameters=EmailContainerParameters(
+            email_message_metadata=email_container_metadata,
             email_envelope=email_container_envelope,
             email_body=email_container_body,
-            email_attachment_collection=ImmutableList(attachments)
-        )
+            email_attachment_collection=frozenset(attachments)
+        ))
 
-        print('Info on the email: ' + os.linesep + self._email_container.get_info())
+        if debug_enabled:
+            self._logger.logger.debug('Info on the email: ' + os.linesep + str(self._email_container))
         return
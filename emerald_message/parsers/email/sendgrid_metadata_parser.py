@@ -0,0 +1,157 @@
+import os
+import json
+from typing import Dict, Mapping, NamedTuple, Optional, Tuple
+from netaddr import IPAddress, AddrFormatError
+
+from emerald_message.error import EmeraldEmailParsingError
+
+_REQUIRED_FIELD_NAMES = ('charsets', 'headers', 'sender_ip', 'attachments', 'envelope', 'subject', 'text')
+
+# the dkim and charsets values repeat across mail from the same senders, so their parsed forms are kept by value
+#  (results are immutable tuples; the charsets dictionary is copied on the way out).  Cleared when full
+_PARSED_VALUE_CACHE_SIZE = 4096
+_parsed_dkim_by_value: Dict[str, Tuple[Optional[bool], Tuple[Tuple[str, str], ...]]] = {}
+_parsed_charsets_by_value: Dict[str, Dict[str, str]] = {}
+
+'''
+The SendGrid inbound parse form fields used to build an email container, read and checked in a single pass
+    dkim_results: (signing identity, result) per DKIM signature, in the order sent
+    email_dkim_sender_passed: True only if there is at least one signature and every one passed, None if SendGrid
+        sent no DKIM field or it could not be read
+    charsets: character set of each field as sent in the charsets JSON (empty if it could not be read)
+A named tuple rather than a frozen dataclass - one is built per inbound email and its construction is cheaper
+'''
+
+
+class SendGridFormRecord(NamedTuple):
+    email_headers: str
+    email_sender_ip: IPAddress
+    attachment_count: int
+    charsets: Dict[str, str]
+    email_spf_sender_passed: Optional[bool]
+    email_dkim_sender_passed: Optional[bool]
+    dkim_results: Tuple[Tuple[str, str], ...]
+    envelope_json: str
+    subject: str
+    message_body_text: str
+    message_body_html: Optional[str] = None
+    attachment_info_json: Optional[str] = None
+
+
+#
+#  SendGrid sends DKIM results as pseudo-JSON keyed by signing identity, with no quotes:
+#       {@example.com : pass}
+#       {@example.com : pass, @mailer.example.net : fail}
+#  An identity may hold inner spaces but no ':', ',' or braces; a result is a single word
+#
+def _parse_sendgrid_dkim_uncached(dkim_value: str) -> Tuple[Optional[bool], Tuple[Tuple[str, str], ...]]:
+    dkim_value = dkim_value.strip()
+    if len(dkim_value) < 2 or dkim_value[0] != '{' or dkim_value[-1] != '}':
+        return None, ()
+    dkim_entries_value = dkim_value[1:-1]
+    if '{' in dkim_entries_value or '}' in dkim_entries_value:
+        return None, ()
+
+    dkim_results = []
+    for dkim_entry in dkim_entries_value.split(','):
+        identity, separator, result = dkim_entry.partition(':')
+        identity = identity.strip()
+        result = result.strip()
+        if len(separator) == 0 or len(identity) == 0 or len(result) == 0 or ':' in result or \
+                len(result.split()) != 1:
+            return None, ()
+        dkim_results.append((identity, result.casefold()))
+    return all(result == 'pass' for _, result in dkim_results), tuple(dkim_results)
+
+
+# returns (all passed, per identity results) - (None, ()) if the value is not in the expected form
+def parse_sendgrid_dkim(dkim_value: str) -> Tuple[Optional[bool], Tuple[Tuple[str, str], ...]]:
+    if type(dkim_value) is not str:
+        return None, ()
+    try:
+        return _parsed_dkim_by_value[dkim_value]
+    except KeyError:
+        pass
+
+    parsed_dkim = _parse_sendgrid_dkim_uncached(dkim_value)
+    if len(_parsed_dkim_by_value) >= _PARSED_VALUE_CACHE_SIZE:
+        _parsed_dkim_by_value.clear()
+    _parsed_dkim_by_value[dkim_value] = parsed_dkim
+    return parsed_dkim
+
+
+#  ('charsets', '{"to":"UTF-8","html":"UTF-8","subject":"UTF-8","from":"UTF-8","text":"UTF-8"}')
+def parse_sendgrid_charsets(charsets_value: str) -> Dict[str, str]:
+    if type(charsets_value) is not str:
+        return {}
+    try:
+        return dict(_parsed_charsets_by_value[charsets_value])
+    except KeyError:
+        pass
+
+    try:
+        charsets = json.loads(charsets_value)
+    except json.JSONDecodeError:
+        charsets = {}
+    charsets = {str(k): str(v) for k, v in charsets.items()} if isinstance(charsets, dict) else {}
+    if len(_parsed_charsets_by_value) >= _PARSED_VALUE_CACHE_SIZE:
+        _parsed_charsets_by_value.clear()
+    _parsed_charsets_by_value[charsets_value] = charsets
+    return dict(charsets)
+
+
+def parse_sendgrid_form(sendgrid_payload: Mapping[str, str]) -> SendGridFormRecord:
+    try:
+        email_headers = sendgrid_payload['headers']
+        sender_ip_value = sendgrid_payload['sender_ip']
+        attachments_value = sendgrid_payload['attachments']
+        charsets_value = sendgrid_payload['charsets']
+        envelope_json = sendgrid_payload['envelope']
+        subject = sendgrid_payload['subject']
+        message_body_text = sendgrid_payload['text']
+    except KeyError:
+        # the key list is only built when reporting - all missing fields are reported together
+        missing_field_names = [x for x in _REQUIRED_FIELD_NAMES if x not in sendgrid_payload]
+        raise EmeraldEmailParsingError('Unable to find ' + ','.join(missing_field_names) +
+                                       ' in key list for inbound email' +
+                                       os.linesep + 'Keys found: ' +
+                                       ','.join([str(x) for x in sendgrid_payload.keys()]))
+
+    #       ('attachments', '0')
+    try:
+        attachment_count = int(attachments_value)
+    except (TypeError, ValueError):
+        raise EmeraldEmailParsingError('Unable to parse the attachment count as integer' +
+                                       os.linesep + 'Value sent is ' + str(attachments_value))
+
+    #   ('sender_ip', '136.143.188.19')
+    try:
+        email_sender_ip = IPAddress(sender_ip_value)
+    except (AddrFormatError, TypeError, ValueError):
+        raise EmeraldEmailParsingError('Unable to parse the sender_ip as an IP address' +
+                                       os.linesep + 'Value sent is ' + str(sender_ip_value))
+
+    #  SPF is a single check but we get as a string "pass" - SendGrid has sent it under both spellings
+    spf_value = sendgrid_payload.get('spf')
+    if spf_value is None:
+        spf_value = sendgrid_payload.get('SPF')
+    email_spf_sender_passed = None if spf_value is None else spf_value.strip().casefold() == 'pass'
+
+    dkim_value = sendgrid_payload.get('dkim')
+    if dkim_value is None:
+        email_dkim_sender_passed, dkim_results = None, ()
+    else:
+        email_dkim_sender_passed, dkim_results = parse_sendgrid_dkim(dkim_value)
+
+    return SendGridFormRecord(email_headers,
+                              email_sender_ip,
+                              attachment_count,
+                              parse_sendgrid_charsets(charsets_value),
+                              email_spf_sender_passed,
+                              email_dkim_sender_passed,
+                              dkim_results,
+                              envelope_json,
+                              subject,
+                              message_body_text,
+                              sendgrid_payload.get('html'),
+                              sendgrid_payload.get('attachment-info'))
@@ -0,0 +1,108 @@
+import os
+import mmap
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+
+from werkzeug.datastructures import FileStorage
+
+from emerald_message.containers.email.email_attachment import EmailAttachment, EmailAttachmentParameters
+from emerald_message.containers.email.email_attachment_digest import EmailAttachmentDigestBuilder, \
+    EMAIL_ATTACHMENT_DIGEST_CHUNK_SIZE
+from emerald_message.error import EmeraldEmailParsingError
+
+
+'''
+Configuration for reading inbound attachments in streaming mode
+    chunk_size_bytes: size of each read from the uploaded file stream
+    spill_threshold_bytes: attachments larger than this are written to a temporary file and held as a read-only
+        memory map instead of in process memory
+    spill_directory: where temporary files are created (None uses the system default temporary directory)
+'''
+
+
+@dataclass(frozen=True)
+class StreamingAttachmentConfigurationRecord:
+    chunk_size_bytes: int = 64 * 1024
+    spill_threshold_bytes: int = 4 * EMAIL_ATTACHMENT_DIGEST_CHUNK_SIZE
+    spill_directory: Optional[str] = None
+
+
+#
+#  Reads a single uploaded attachment in chunks, hashing as it goes so the payload is never hashed a second time.
+#  Small attachments are accumulated in memory; once the size passes the spill threshold everything read so far
+#  and the remainder go to an anonymous temporary file, which is then memory mapped.  The temporary file is
+#  unlinked on creation so the operating system reclaims it when the map is released with the attachment
+#
+class StreamingAttachmentReader:
+    @property
+    def configuration_record(self) -> StreamingAttachmentConfigurationRecord:
+        return self._configuration_record
+
+    def _read_spilled_remainder(self,
+                                file_stream,
+                                buffered_contents: bytearray,
+                                digest_builder: EmailAttachmentDigestBuilder):
+        spill_file = tempfile.TemporaryFile(dir=self._configuration_record.spill_directory)
+        try:
+            spill_file.write(buffered_contents)
+            del buffered_contents[:]
+            while True:
+                chunk = file_stream.read(self._configuration_record.chunk_size_bytes)
+                if not chunk:
+                    break
+                digest_builder.update(chunk)
+                spill_file.write(chunk)
+            spill_file.flush()
+            # the map holds its own reference to the file data so the descriptor can be closed straight away
+            return mmap.mmap(spill_file.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            spill_file.close()
+
+    def read_attachment(self,
+                        filestorage: FileStorage,
+                        filename: str) -> EmailAttachment:
+        digest_builder = EmailAttachmentDigestBuilder()
+        buffered_contents = bytearray()
+        contents = None
+        try:
+            while True:
+                chunk = filestorage.stream.read(self._configuration_record.chunk_size_bytes)
+                if not chunk:
+                    break
+                digest_builder.update(chunk)
+                buffered_contents.extend(chunk)
+                if len(buffered_contents) > self._configuration_record.spill_threshold_bytes:
+                    contents = self._read_spilled_remainder(file_stream=filestorage.stream,
+                                                            buffered_contents=buffered_contents,
+                                                            digest_builder=digest_builder)
+                    break
+        except OSError as oex:
+            raise EmeraldEmailParsingError('Unable to read attachment "' + str(filename) + '" from inbound email' +
+                                           os.linesep + 'Exception info: ' + str(oex))
+
+        if contents is None:
+            contents = bytes(buffered_contents)
+
+        return EmailAttachment(container_parameters=EmailAttachmentParameters(
+            filename=filename,
+            mimetype=filestorage.content_type,
+            contents=contents,
+            contents_digest=digest_builder.digest()
+        ))
+
+    def __init__(self,
+                 configuration_record: Optional[StreamingAttachmentConfigurationRecord] = None):
+        if configuration_record is None:
+            configuration_record = StreamingAttachmentConfigurationRecord()
+        if not isinstance(configuration_record, StreamingAttachmentConfigurationRecord):
+            raise EmeraldEmailParsingError('Streaming configuration must be of type ' +
+                                           StreamingAttachmentConfigurationRecord.__name__ +
+                                           os.linesep + 'Type provided = ' + type(configuration_record).__name__)
+        for size_name in ('chunk_size_bytes', 'spill_threshold_bytes'):
+            size_value = getattr(configuration_record, size_name)
+            if type(size_value) is not int or size_value <= 0:
+                raise EmeraldEmailParsingError('Streaming configuration ' + size_name +
+                                               ' must be a positive integer' +
+                                               os.linesep + 'Value provided = ' + str(size_value))
+        self._configuration_record = configuration_record
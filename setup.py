@@ -28,11 +28,13 @@ setup(
     name='emerald_message',
     packages=find_packages(),
     version=VERSION,
+    # slotted dataclasses need 3.10
+    python_requires='>=3.10',
     description='Handler library and delivery tool for Emerald messages captured from email, SMS and other sources',
     author='Dave Thompson',
     author_email='dthompson@dynastyse.com',
     install_requires=[
-        'avro-python3>=1.9.0',
+        'avro-python3>=1.10.0',
         'azure-mgmt-storage>=4.0.0',
         'netaddr>=0.7.19',
         'pytz>=2019.1',
@@ -40,8 +42,13 @@ setup(
         'spooky>=2.0.0',
         'tzlocal>=2.0.0',
         'twine>=1.13.0',
-        'werkzeug>=0.15.5'
+        'werkzeug>=2.0.0'
     ],
+    # optional - fastavro enables FastavroSerializationBackend, pyarrow the Arrow / Parquet exporter
+    extras_require={
+        'fastavro': ['fastavro>=1.0.0'],
+        'arrow': ['pyarrow>=4.0.0']
+    },
     include_package_data=True,
     zip_safe=True,
     url='http://www.dynastyse.com',
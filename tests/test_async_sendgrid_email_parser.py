@@ -0,0 +1,71 @@
+import asyncio
+
+from emerald_message.parsers.email.async_sendgrid_email_parser import SendGridInboundParseApplication
+
+_BOUNDARY = 'xYzZY'
+
+
+def _make_multipart_body(form: dict) -> bytes:
+    body_parts = []
+    for field_name, field_value in form.items():
+        body_parts.append('--' + _BOUNDARY + '\r\n' +
+                          'Content-Disposition: form-data; name="' + field_name + '"' + '\r\n\r\n' +
+                          field_value + '\r\n')
+    body_parts.append('--' + _BOUNDARY + '--' + '\r\n')
+    return ''.join(body_parts).encode('utf-8')
+
+
+def _make_form(envelope_json: str) -> dict:
+    return {'headers': 'Received: by mx.example.com' + '\r\n' + 'Subject: test',
+            'envelope': envelope_json,
+            'sender_ip': '10.0.0.1',
+            'attachments': '0',
+            'charsets': '{"to": "UTF-8", "subject": "UTF-8", "text": "UTF-8"}',
+            'subject': 'test',
+            'text': 'body',
+            'spf': 'pass',
+            'dkim': '{@example.com : pass}'}
+
+
+def _post(application: SendGridInboundParseApplication,
+          request_body: bytes) -> tuple:
+    scope = {'type': 'http',
+             'method': 'POST',
+             'headers': [(b'content-type', ('multipart/form-data; boundary=' + _BOUNDARY).encode('ascii'))]}
+    request_messages = [{'type': 'http.request', 'body': request_body, 'more_body': False}]
+    sent_messages = []
+
+    async def receive():
+        return request_messages.pop(0)
+
+    async def send(message):
+        sent_messages.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    return sent_messages[0]['status'], sent_messages[1]['body']
+
+
+def test_well_formed_post_is_handled():
+    handled_emails = []
+
+    async def email_handler(parsed_email):
+        handled_emails.append(parsed_email)
+
+    status, _ = _post(SendGridInboundParseApplication(email_handler=email_handler),
+                      _make_multipart_body(_make_form('{"to": ["test1@example.com"], "from": "sender@example.com"}')))
+    assert status == 200
+    assert len(handled_emails) == 1
+    assert handled_emails[0].email_container.email_envelope.address_from == 'sender@example.com'
+
+
+def test_malformed_envelope_returns_400():
+    handled_emails = []
+
+    async def email_handler(parsed_email):
+        handled_emails.append(parsed_email)
+
+    status, response_body = _post(SendGridInboundParseApplication(email_handler=email_handler),
+                                  _make_multipart_body(_make_form('{"to": ["test1@example.com"]}')))
+    assert status == 400
+    assert response_body.startswith(b'Unable to parse inbound email')
+    assert len(handled_emails) == 0
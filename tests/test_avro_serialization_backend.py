@@ -0,0 +1,189 @@
+import dataclasses
+import io
+
+import pytest
+from avro.io import BinaryDecoder, BinaryEncoder, DatumReader, DatumWriter
+
+from emerald_message.containers.abstract_container import AbstractContainer
+from emerald_message.containers.avro_projection_reader import get_avro_projection_schema
+from emerald_message.containers.avro_serialization_backend import CompiledAvroSerializationBackend, \
+    FastavroSerializationBackend, StandardAvroSerializationBackend, _compile_skipper, \
+    get_compiled_projection_decoder
+from emerald_message.containers.email.email_attachment_store import FilesystemEmailAttachmentStore
+from emerald_message.containers.email.email_body import EmailBody
+from emerald_message.containers.email.email_container import EmailContainer
+from emerald_message.containers.email.email_container_v2 import EmailContainerV2
+from emerald_message.containers.email.email_container_v3 import EmailContainerV3
+from emerald_message.containers.email.email_container_v4 import EmailContainerV4
+from emerald_message.containers.email.email_message_metadata import EmailMessageMetadata
+
+from benchmarks.synthetic_email_corpus import make_email_container
+
+_EMAIL_CONTAINER_CLASS_LIST = [EmailContainer, EmailContainerV2, EmailContainerV3, EmailContainerV4]
+
+_SERIALIZATION_BACKEND_LIST = [StandardAvroSerializationBackend(), CompiledAvroSerializationBackend()]
+if FastavroSerializationBackend.is_available():
+    _SERIALIZATION_BACKEND_LIST.append(FastavroSerializationBackend())
+
+
+# the synthetic corpus, with the optional fields (the null branches of the schema unions) left out on some messages
+def _make_email_container_list():
+    email_container_list = []
+    for message_number in range(12):
+        email_container = make_email_container(message_number=message_number,
+                                               attachment_count=message_number % 3,
+                                               attachment_size_bytes=512,
+                                               body_word_count=40)
+        email_container_parameters = email_container._container_parameters
+        email_message_metadata_parameters = email_container.email_message_metadata._container_parameters
+        email_body_parameters = email_container.email_body._container_parameters
+        if message_number % 2 == 1:
+            email_body_parameters = dataclasses.replace(email_body_parameters, message_body_html=None)
+        if message_number % 4 >= 2:
+            email_message_metadata_parameters = dataclasses.replace(email_message_metadata_parameters,
+                                                                    email_spf_sender_passed=None,
+                                                                    email_dkim_sender_passed=False)
+        email_container_list.append(EmailContainer(container_parameters=dataclasses.replace(
+            email_container_parameters,
+            email_message_metadata=EmailMessageMetadata(container_parameters=email_message_metadata_parameters),
+            email_body=EmailBody(container_parameters=email_body_parameters))))
+    return email_container_list
+
+
+# V3 and V4 datums with every attachment array holding both union branches - references (read back from a store)
+#  alongside raw attachments
+def _get_datum_list(email_container_class, attachment_store):
+    datum_list = []
+    for email_container in _make_email_container_list():
+        email_container = email_container_class(container_parameters=email_container._container_parameters)
+        if email_container_class in (EmailContainerV3, EmailContainerV4) and \
+                len(email_container.email_attachment_collection) > 0:
+            email_container_with_references = email_container_class.from_avro_as_dict(
+                email_container.get_as_dict_with_attachment_store(attachment_store=attachment_store),
+                attachment_store=attachment_store)
+            raw_email_attachment_collection = make_email_container(
+                message_number=100, attachment_count=1, attachment_size_bytes=256).email_attachment_collection
+            email_container = email_container_class(container_parameters=dataclasses.replace(
+                email_container._container_parameters,
+                email_attachment_collection=
+                email_container_with_references.email_attachment_collection | raw_email_attachment_collection))
+        datum_list.append(email_container.get_as_dict())
+    return datum_list
+
+
+def _get_avro_schema(email_container_class):
+    return email_container_class.get_avro_schema_record().avro_schema
+
+
+def _encode(serialization_backend, avro_schema, datum_list) -> bytes:
+    datum_buffer = io.BytesIO()
+    datum_writer = serialization_backend.get_datum_writer(avro_schema)
+    binary_encoder = BinaryEncoder(datum_buffer)
+    for datum in datum_list:
+        datum_writer.write(datum, binary_encoder)
+    return datum_buffer.getvalue()
+
+
+def _decode(serialization_backend, avro_schema, datum_bytes, datum_count, reader_avro_schema=None):
+    datum_buffer = io.BytesIO(datum_bytes)
+    datum_reader = serialization_backend.get_datum_reader(reader_avro_schema)
+    datum_reader.writer_schema = avro_schema
+    binary_decoder = BinaryDecoder(datum_buffer)
+    decoded_datum_list = [datum_reader.read(binary_decoder) for _ in range(datum_count)]
+    assert datum_buffer.tell() == len(datum_bytes)
+    return decoded_datum_list
+
+
+@pytest.fixture
+def attachment_store(tmp_path):
+    return FilesystemEmailAttachmentStore(str(tmp_path / 'blobs'))
+
+
+@pytest.fixture
+def restore_serialization_backend():
+    serialization_backend = AbstractContainer.get_serialization_backend()
+    yield
+    AbstractContainer.set_serialization_backend(serialization_backend)
+
+
+@pytest.mark.parametrize('email_container_class', _EMAIL_CONTAINER_CLASS_LIST)
+def test_backends_encode_identical_bytes(email_container_class, attachment_store):
+    avro_schema = _get_avro_schema(email_container_class)
+    datum_list = _get_datum_list(email_container_class, attachment_store)
+    reference_datum_buffer = io.BytesIO()
+    reference_datum_writer = DatumWriter(avro_schema)
+    for datum in datum_list:
+        reference_datum_writer.write(datum, BinaryEncoder(reference_datum_buffer))
+
+    for serialization_backend in _SERIALIZATION_BACKEND_LIST:
+        assert _encode(serialization_backend, avro_schema, datum_list) == reference_datum_buffer.getvalue(), \
+            serialization_backend.backend_name
+
+
+@pytest.mark.parametrize('email_container_class', _EMAIL_CONTAINER_CLASS_LIST)
+def test_backends_decode_each_other(email_container_class, attachment_store):
+    avro_schema = _get_avro_schema(email_container_class)
+    datum_list = _get_datum_list(email_container_class, attachment_store)
+    reference_datum_list = _decode(StandardAvroSerializationBackend(), avro_schema,
+                                   _encode(StandardAvroSerializationBackend(), avro_schema, datum_list),
+                                   len(datum_list))
+
+    for writer_serialization_backend in _SERIALIZATION_BACKEND_LIST:
+        datum_bytes = _encode(writer_serialization_backend, avro_schema, datum_list)
+        for reader_serialization_backend in _SERIALIZATION_BACKEND_LIST:
+            assert _decode(reader_serialization_backend, avro_schema, datum_bytes, len(datum_list)) == \
+                reference_datum_list, \
+                writer_serialization_backend.backend_name + ' -> ' + reader_serialization_backend.backend_name
+
+
+# the whole path through AbstractContainer - single object encoding, schema fingerprint and the container built back
+@pytest.mark.parametrize('email_container_class', _EMAIL_CONTAINER_CLASS_LIST)
+def test_containers_round_trip_through_every_backend(email_container_class, restore_serialization_backend):
+    email_container_list = [email_container_class(container_parameters=x._container_parameters)
+                            for x in _make_email_container_list()]
+    avro_bytes_by_backend_name = {}
+    for serialization_backend in _SERIALIZATION_BACKEND_LIST:
+        AbstractContainer.set_serialization_backend(serialization_backend)
+        avro_bytes_by_backend_name[serialization_backend.backend_name] = \
+            [x.to_avro_bytes(single_object_encoding=True) for x in email_container_list]
+    assert len(set(tuple(x) for x in avro_bytes_by_backend_name.values())) == 1
+
+    for serialization_backend in _SERIALIZATION_BACKEND_LIST:
+        AbstractContainer.set_serialization_backend(serialization_backend)
+        for avro_bytes_list in avro_bytes_by_backend_name.values():
+            assert [email_container_class.from_avro_bytes(x) for x in avro_bytes_list] == email_container_list
+
+
+@pytest.mark.parametrize('email_container_class', [EmailContainerV3, EmailContainerV4])
+def test_skipper_consumes_whole_datums(email_container_class, attachment_store):
+    avro_schema = _get_avro_schema(email_container_class)
+    datum_list = _get_datum_list(email_container_class, attachment_store)
+    datum_bytes = _encode(StandardAvroSerializationBackend(), avro_schema, datum_list)
+
+    skip_datum = _compile_skipper(avro_schema, {})
+    datum_buffer = io.BytesIO(datum_bytes)
+    for _ in datum_list:
+        skip_datum(datum_buffer.read)
+    assert datum_buffer.tell() == len(datum_bytes)
+
+
+# the first projection skips the attachment union array whole, the others project through its branches
+@pytest.mark.parametrize('field_paths', [['email_envelope.address_from'],
+                                         ['email_attachment_collection.filename'],
+                                         ['email_attachment_collection.contents_length',
+                                          'email_body.message_body_html']])
+def test_projection_decoder_matches_schema_resolution(field_paths, attachment_store):
+    avro_schema = _get_avro_schema(EmailContainerV3)
+    datum_list = _get_datum_list(EmailContainerV3, attachment_store)
+    datum_bytes = _encode(StandardAvroSerializationBackend(), avro_schema, datum_list)
+    projection_avro_schema = get_avro_projection_schema(avro_schema, field_paths)
+    assert get_compiled_projection_decoder(avro_schema, projection_avro_schema) is not None
+
+    datum_buffer = io.BytesIO(datum_bytes)
+    binary_decoder = BinaryDecoder(datum_buffer)
+    reference_datum_list = [DatumReader(avro_schema, projection_avro_schema).read(binary_decoder)
+                            for _ in datum_list]
+    for serialization_backend in _SERIALIZATION_BACKEND_LIST:
+        assert _decode(serialization_backend, avro_schema, datum_bytes, len(datum_list),
+                       reader_avro_schema=projection_avro_schema) == reference_datum_list, \
+            serialization_backend.backend_name
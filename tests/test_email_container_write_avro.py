@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from emerald_message.containers.avro_data_file_writer import AvroCodecConfigurationRecord
+from emerald_message.containers.email.email_attachment_store import FilesystemEmailAttachmentStore
+from emerald_message.containers.email.email_container_v3 import EmailContainerV3
+from emerald_message.containers.email.email_container_v4 import EmailContainerV4
+
+from benchmarks.synthetic_email_corpus import make_email_container
+
+
+def _make_versioned_email_container(email_container_class):
+    email_container = make_email_container(message_number=7, attachment_count=2, attachment_size_bytes=2048)
+    return email_container_class(container_parameters=email_container._container_parameters)
+
+
+# the codec is the second positional parameter, as in AbstractContainer.write_avro
+@pytest.mark.parametrize('email_container_class', [EmailContainerV3, EmailContainerV4])
+def test_write_avro_with_positional_codec(tmp_path, email_container_class):
+    email_container = _make_versioned_email_container(email_container_class)
+    avro_container_uri = str(tmp_path / 'mail.avro')
+    email_container.write_avro(avro_container_uri, AvroCodecConfigurationRecord('deflate'))
+
+    with open(avro_container_uri, 'rb') as avro_file:
+        assert b'deflate' in avro_file.read(256)
+    assert email_container_class.from_avro(avro_container_uri) == email_container
+
+
+@pytest.mark.parametrize('email_container_class', [EmailContainerV3, EmailContainerV4])
+def test_to_avro_bytes_with_positional_codec(email_container_class):
+    email_container = _make_versioned_email_container(email_container_class)
+    avro_bytes = email_container.to_avro_bytes(False, AvroCodecConfigurationRecord('deflate'))
+    assert email_container_class.from_avro_bytes(avro_bytes) == email_container
+
+
+@pytest.mark.parametrize('email_container_class', [EmailContainerV3, EmailContainerV4])
+def test_write_avro_with_attachment_store(tmp_path, email_container_class):
+    email_container = _make_versioned_email_container(email_container_class)
+    attachment_store = FilesystemEmailAttachmentStore(str(tmp_path / 'blobs'))
+    avro_container_uri = str(tmp_path / 'mail.avro')
+    email_container.write_avro(avro_container_uri, AvroCodecConfigurationRecord('deflate'),
+                               attachment_store=attachment_store)
+
+    assert len(os.listdir(str(tmp_path / 'blobs'))) > 0
+    email_container_read = email_container_class.from_avro(avro_container_uri, attachment_store=attachment_store)
+    assert sorted((x.filename, x.contents) for x in email_container_read.email_attachment_collection) == \
+        sorted((x.filename, x.contents) for x in email_container.email_attachment_collection)
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from emerald_message.error import EmeraldEmailParsingError
+from emerald_message.parsers.email.sendgrid_bulk_parser import SendGridBulkParserConfigurationRecord, \
+    iter_captured_sendgrid_payloads_from_jsonl, parse_captured_sendgrid_payloads
+
+
+def _make_captured_payload_json(message_index: int,
+                                envelope_json: str = '{"to": ["test1@example.com"], "from": "sender@example.com"}') \
+        -> str:
+    return json.dumps({'form': {'headers': 'Received: by mx.example.com' + '\r\n' + 'Subject: test',
+                                'envelope': envelope_json,
+                                'sender_ip': '10.0.0.1',
+                                'attachments': '0',
+                                'charsets': '{"to": "UTF-8", "subject": "UTF-8", "text": "UTF-8"}',
+                                'subject': 'message ' + str(message_index),
+                                'text': 'body of message ' + str(message_index),
+                                'spf': 'pass',
+                                'dkim': '{@example.com : pass}'},
+                       'files': {}})
+
+
+_MALFORMED_ENVELOPE_JSON_LIST = ['{"to": ["test1@example.com"]}',
+                                 '{"to": "test1@example.com", "from": "sender@example.com"}',
+                                 '["test1@example.com", "sender@example.com"]']
+
+
+@pytest.mark.parametrize('envelope_json', _MALFORMED_ENVELOPE_JSON_LIST)
+def test_malformed_envelope_is_skipped_when_skip_unparseable(envelope_json):
+    captured_payload_lines = [_make_captured_payload_json(0),
+                              _make_captured_payload_json(1, envelope_json=envelope_json),
+                              _make_captured_payload_json(2)]
+    email_containers = list(parse_captured_sendgrid_payloads(
+        iter_captured_sendgrid_payloads_from_jsonl(captured_payload_lines),
+        SendGridBulkParserConfigurationRecord(max_workers=1, payloads_per_task=2, skip_unparseable=True)))
+    assert [x.email_envelope.message_subject for x in email_containers] == ['message 0', 'message 2']
+
+
+@pytest.mark.parametrize('envelope_json', _MALFORMED_ENVELOPE_JSON_LIST)
+def test_malformed_envelope_raises_parsing_error(envelope_json):
+    captured_payload_lines = [_make_captured_payload_json(0),
+                              _make_captured_payload_json(1, envelope_json=envelope_json)]
+    with pytest.raises(EmeraldEmailParsingError):
+        list(parse_captured_sendgrid_payloads(
+            iter_captured_sendgrid_payloads_from_jsonl(captured_payload_lines),
+            SendGridBulkParserConfigurationRecord(max_workers=1, payloads_per_task=2)))